@@ -1,5 +1,4 @@
 from fastapi import APIRouter, HTTPException, Response, Request, Depends
-from pydantic import ValidationError
 from schemas.auth_schemas import UserRegistrationRequest, UserRegistrationResponse, UserLoginRequest, UserLoginResponse
 from schemas.user_schemas import UserResponse
 from services.auth_service import AuthService
@@ -9,11 +8,8 @@ from utils.token_utils import verify_token, generate_tokens
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/register", response_model=UserRegistrationResponse)
-async def register_user(request: Request, response: Response):
+async def register_user(user_data: UserRegistrationRequest, response: Response):
     try:
-        body = await request.json()
-        user_data = UserRegistrationRequest(**body)
-        
         # Call service layer
         user_response, tokens = await AuthService.register_user(user_data)
         
@@ -38,23 +34,14 @@ async def register_user(request: Request, response: Response):
         
         return user_response
         
-    except ValidationError as e:
-        errors = {}
-        for error in e.errors():
-            field_name = error['loc'][-1] if error['loc'] else 'unknown'
-            errors[field_name] = error['msg']
-        raise HTTPException(status_code=400, detail={"errors": errors})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/login", response_model=UserLoginResponse)
-async def login_user(request: Request, response: Response):
+async def login_user(user_data: UserLoginRequest, response: Response):
     try:
-        body = await request.json()
-        user_data = UserLoginRequest(**body)
-        
         # Call service layer
         user_response, tokens = await AuthService.login_user(user_data)
         
@@ -79,12 +66,6 @@ async def login_user(request: Request, response: Response):
         
         return user_response
         
-    except ValidationError as e:
-        errors = {}
-        for error in e.errors():
-            field_name = error['loc'][-1] if error['loc'] else 'unknown'
-            errors[field_name] = error['msg']
-        raise HTTPException(status_code=400, detail={"errors": errors})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -1,18 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, Query
-from pydantic import ValidationError
-from schemas.user_schemas import FollowRequest, UnfollowRequest, PaginatedUsersResponse, FollowersResponse, FollowingResponse
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request, Query
+from schemas.user_schemas import FollowRequest, UnfollowRequest, BulkFollowRequest, BulkUnfollowRequest, BulkFollowResponse, BulkUnfollowResponse, PaginatedUsersResponse, FollowersResponse, FollowingResponse
 from services.connections_service import ConnectionsService
+from services.discovery_service import discovery_service
 from utils.auth_middleware import get_current_user
+from utils.responses import FastJSONResponse
+from utils.http_cache import conditional_response
+from utils.notification_utils import send_notifications_batch
 from typing import Dict, Optional
 
 router = APIRouter(prefix="/user/connections", tags=["User relations"])
 
 @router.post("/follow")
-async def follow_user(request: Request, current_user: Dict = Depends(get_current_user)):
+async def follow_user(follow_data: FollowRequest, current_user: Dict = Depends(get_current_user)):
     try:
-        body = await request.json()
-        follow_data = FollowRequest(**body)
-
         # Call service layer with authenticated user ID
         result = await ConnectionsService.follow_user(
             follower_id=current_user["id"],
@@ -22,23 +22,14 @@ async def follow_user(request: Request, current_user: Dict = Depends(get_current
 
         return result
 
-    except ValidationError as e:
-        errors = {}
-        for error in e.errors():
-            field_name = error['loc'][-1] if error['loc'] else 'unknown'
-            errors[field_name] = error['msg']
-        raise HTTPException(status_code=400, detail={"errors": errors})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/unfollow")
-async def unfollow_user(request: Request, current_user: Dict = Depends(get_current_user)):
+async def unfollow_user(unfollow_data: UnfollowRequest, current_user: Dict = Depends(get_current_user)):
     try:
-        body = await request.json()
-        unfollow_data = UnfollowRequest(**body)
-
         # Call service layer with authenticated user ID
         result = await ConnectionsService.unfollow_user(
             follower_id=current_user["id"],
@@ -47,45 +38,98 @@ async def unfollow_user(request: Request, current_user: Dict = Depends(get_curre
 
         return result
 
-    except ValidationError as e:
-        errors = {}
-        for error in e.errors():
-            field_name = error['loc'][-1] if error['loc'] else 'unknown'
-            errors[field_name] = error['msg']
-        raise HTTPException(status_code=400, detail={"errors": errors})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/follow/bulk", response_model=BulkFollowResponse)
+async def follow_users(follow_data: BulkFollowRequest, background_tasks: BackgroundTasks, current_user: Dict = Depends(get_current_user)):
+    try:
+        result = await ConnectionsService.follow_users(
+            follower_id=current_user["id"],
+            following_ids=follow_data.to_follow
+        )
+
+        if result["followed"]:
+            # Suggestions computed before these follows are now stale
+            await discovery_service.invalidate(current_user["id"])
+            # Notified after the response is sent, a failure there cannot fail the committed follows
+            background_tasks.add_task(
+                send_notifications_batch,
+                result["followed"],
+                message=f"{current_user['username']} is now following you!"
+            )
+
+        return FastJSONResponse(content=result)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/unfollow/bulk", response_model=BulkUnfollowResponse)
+async def unfollow_users(unfollow_data: BulkUnfollowRequest, current_user: Dict = Depends(get_current_user)):
+    try:
+        result = await ConnectionsService.unfollow_users(
+            follower_id=current_user["id"],
+            following_ids=unfollow_data.to_unfollow
+        )
+
+        return FastJSONResponse(content=result)
+
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/people", response_model=PaginatedUsersResponse)
-async def get_users(page: Optional[int] = Query(1, ge=1), current_user: Dict = Depends(get_current_user)):
+async def get_users(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100, description="Number of users per page"),
+    current_user: Dict = Depends(get_current_user)
+):
     try:
-        result = await ConnectionsService.get_users_paginated(
+        result = await discovery_service.get_people(
             current_user_id=current_user["id"],
-            page=page if page is not None else 1
+            cursor=cursor,
+            limit=limit
         )
-        return result
+        return FastJSONResponse(content=result)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/followers", response_model=FollowersResponse)
-async def get_followers(current_user: Dict = Depends(get_current_user)):
+async def get_followers(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100, description="Number of users per page"),
+    current_user: Dict = Depends(get_current_user)
+):
     try:
-        result = await ConnectionsService.get_followers(current_user["id"])
-        return result
+        # Follow-back flags depend on who the user follows as well
+        return await conditional_response(
+            request,
+            scope=f"followers:{current_user['id']}:{cursor}:{limit}",
+            version_names=[f"followers:{current_user['id']}", f"following:{current_user['id']}"],
+            build=lambda: ConnectionsService.get_followers(current_user["id"], cursor=cursor, limit=limit)
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/following", response_model=FollowingResponse)
-async def get_following(current_user: Dict = Depends(get_current_user)):
+async def get_following(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100, description="Number of users per page"),
+    current_user: Dict = Depends(get_current_user)
+):
     try:
-        result = await ConnectionsService.get_following(current_user["id"])
-        return result
+        result = await ConnectionsService.get_following(current_user["id"], cursor=cursor, limit=limit)
+        return FastJSONResponse(content=result)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
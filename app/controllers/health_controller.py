@@ -0,0 +1,52 @@
+from fastapi import APIRouter
+from database.connection import ping_db
+from services.websocket_manager import websocket_manager
+from utils.readiness import readiness
+from utils.responses import FastJSONResponse
+import asyncio
+import os
+
+# Seconds a readiness probe waits on each dependency
+READINESS_CHECK_TIMEOUT = float(os.getenv("READINESS_CHECK_TIMEOUT", "2"))
+
+router = APIRouter(tags=["Health"])
+
+@router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop is answering"""
+    return FastJSONResponse(content={"status": "ok"})
+
+@router.get("/readyz")
+async def readyz():
+    """Readiness: startup finished and PostgreSQL answers. Redis is reported but optional."""
+    if not readiness.ready:
+        return FastJSONResponse(status_code=503, content={"status": "unavailable", "checks": {}})
+
+    checks = {}
+    try:
+        await asyncio.wait_for(ping_db(), READINESS_CHECK_TIMEOUT)
+        checks["database"] = "ok"
+    except Exception as e:
+        print(f"❌ [HEALTH] Database readiness check failed: {e}")
+        checks["database"] = "error"
+
+    if websocket_manager.redis_client is None:
+        checks["redis"] = "disabled"
+    else:
+        try:
+            await asyncio.wait_for(websocket_manager.redis_client.ping(), READINESS_CHECK_TIMEOUT)
+            checks["redis"] = "ok"
+        except Exception as e:
+            print(f"❌ [HEALTH] Redis readiness check failed: {e}")
+            checks["redis"] = "error"
+
+    ready = checks["database"] == "ok"
+    return FastJSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "unavailable",
+            "checks": checks,
+            "startup_seconds": readiness.startup_seconds,
+            "startup_phases": readiness.phases
+        }
+    )
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from controllers.room_controller import active_connections as room_connections
+from database.connection import engine
+from services.websocket_manager import websocket_manager
+from utils.metrics import metrics
+from utils.rate_limiter import throttle_metrics
+from typing import Optional
+import hmac
+import os
+
+# Bearer token a scraper must send, /metrics is open when unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter(tags=["Metrics"])
+
+metrics.gauge(
+    "websocket_connections",
+    "Open WebSocket connections",
+    lambda: {
+        ("room",): sum(len(users) for users in room_connections.values()),
+        ("notifications",): len(websocket_manager.active_connections),
+    },
+    ("socket",),
+)
+metrics.gauge(
+    "db_pool_connections",
+    "Database pool connections by state",
+    lambda: {
+        ("checked_out",): engine.pool.checkedout(),
+        ("idle",): engine.pool.checkedin(),
+        ("overflow",): max(engine.pool.overflow(), 0),
+    },
+    ("state",),
+)
+metrics.gauge(
+    "websocket_throttled_frames_total",
+    "WebSocket frames rejected by rate limits and size caps",
+    lambda: dict(throttle_metrics.counters),
+    ("socket", "reason"),
+    kind="counter",
+)
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus text format, summed over every worker process"""
+    if METRICS_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(await metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
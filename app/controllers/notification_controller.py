@@ -7,13 +7,22 @@ from services.notification_service import NotificationService
 from services.websocket_manager import websocket_manager
 from utils.token_utils import verify_token
 from utils.auth_middleware import get_current_user
+from utils.rate_limiter import TokenBucket, throttle_metrics
+from utils.ws_transport import receive_frame, decode_frame, frame_exceeds
+from utils.responses import FastJSONResponse
+from utils.http_cache import conditional_response
 from schemas.notification_schemas import NotificationResponse, WebSocketMessage, PaginatedNotificationsResponse
-import json
+import os
 import uuid
 from typing import List, Dict
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+# Clients only send heartbeats, so frames are small and infrequent
+NOTIFICATION_MAX_FRAME_BYTES = int(os.getenv("NOTIFICATION_MAX_FRAME_BYTES", "4096"))
+NOTIFICATION_RATE_PER_CONNECTION = float(os.getenv("NOTIFICATION_RATE_PER_CONNECTION", "2"))
+NOTIFICATION_BURST_PER_CONNECTION = float(os.getenv("NOTIFICATION_BURST_PER_CONNECTION", "5"))
+
 async def get_user_from_token(token: str) -> str:
     try:
         payload = await verify_token(token)
@@ -41,7 +50,7 @@ async def websocket_endpoint(
 
         # Initialize Redis if needed
         if websocket_manager.redis_client is None:
-            await websocket_manager.init_redis()
+            await websocket_manager.init_redis(timeout=0)
 
         # Use the websocket_manager connect method
         connection_id = await websocket_manager.connect(websocket, user_id)
@@ -71,12 +80,24 @@ async def websocket_endpoint(
         await websocket_manager.send_message(connection_id, welcome_message)
         print(f"📋 [WEBSOCKET] Sent {len(notifications_data)} unread notifications to user {user_id}")
 
+        message_limit = TokenBucket(NOTIFICATION_RATE_PER_CONNECTION, NOTIFICATION_BURST_PER_CONNECTION)
+
         # Keep connection alive by listening for messages
         while True:
             try:
                 # Wait for client messages (heartbeat, etc.)
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                data = await receive_frame(websocket)
+
+                if frame_exceeds(data, NOTIFICATION_MAX_FRAME_BYTES):
+                    throttle_metrics.record("notifications", "frame_too_large")
+                    print(f"⚠️ [WEBSOCKET] Dropped oversized frame from user {user_id}")
+                    continue
+
+                if not message_limit.consume():
+                    throttle_metrics.record("notifications", "rate_limited")
+                    continue
+
+                message = decode_frame(data)
                 print(f"📨 [WEBSOCKET] Received message from user {user_id}: {message}")
                 
                 # Handle different message types if needed
@@ -86,8 +107,9 @@ async def websocket_endpoint(
             except WebSocketDisconnect:
                 print(f"🔌 [WEBSOCKET] User {user_id} disconnected")
                 break
-            except json.JSONDecodeError:
-                print(f"⚠️ [WEBSOCKET] Invalid JSON from user {user_id}")
+            except ValueError:
+                # JSON and MessagePack decode errors are both ValueErrors
+                print(f"⚠️ [WEBSOCKET] Invalid frame from user {user_id}")
             except Exception as e:
                 print(f"❌ [WEBSOCKET] Error handling message from user {user_id}: {e}")
                 break
@@ -110,19 +132,28 @@ async def websocket_endpoint(
 
 @router.get("/", response_model=PaginatedNotificationsResponse)
 async def get_notifications(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number starting from 1"),
     limit: int = Query(10, ge=1, le=100, description="Number of notifications per page"),
     current_user: Dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    try:
+    async def build():
         notifications, has_more = await NotificationService.get_paginated_notifications(
             db, current_user["id"], page, limit
         )
-        return PaginatedNotificationsResponse(
-            data=notifications,
-            page=page,
-            has_more=has_more
+        return {
+            "data": [NotificationService.to_dict(notif) for notif in notifications],
+            "page": page,
+            "has_more": has_more
+        }
+
+    try:
+        return await conditional_response(
+            request,
+            scope=f"notifications:{current_user['id']}:{page}:{limit}",
+            version_names=[f"notifications:{current_user['id']}"],
+            build=build
         )
     except ValidationError as e:
         errors = {}
@@ -142,7 +173,7 @@ async def get_unread_notifications(
 ):
     try:
         notifications = await NotificationService.get_unread_notifications(db, current_user["id"])
-        return notifications
+        return FastJSONResponse(content=[NotificationService.to_dict(notif) for notif in notifications])
     except ValidationError as e:
         errors = {}
         for error in e.errors():
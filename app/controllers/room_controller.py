@@ -3,16 +3,17 @@ from fastapi.responses import JSONResponse
 from sqlalchemy import select, and_
 from sqlalchemy.orm import selectinload
 from database.connection import AsyncSessionLocal, get_db
-from database.models import Room, Participant, User
+from database.models import Room, User
 from utils.auth_middleware import get_current_user
 from utils.token_utils import verify_token
+from services.room_history import room_history_manager, ROOM_CHAT_REPLAY_SIZE, ROOM_CHAT_MAX_MESSAGE_LENGTH
+from services.room_lifecycle import room_lifecycle_manager
+from services.fanout import worker_fanout
+from utils.rate_limiter import TokenBucket, throttle_metrics
+from utils.ws_transport import negotiate_codec, get_codec, send_frame, send_encoded, receive_frame, decode_frame, frame_exceeds
 from pydantic import BaseModel
 from typing import List, Dict, Set
-import json
-import hashlib
-import hmac
-import base64
-import time
+import asyncio
 import os
 from typing import Optional
 
@@ -22,6 +23,18 @@ router = APIRouter(prefix="/api/rooms", tags=["rooms"])
 # room_id -> {user_id: websocket}
 active_connections: Dict[str, Dict[str, WebSocket]] = {}
 
+# Frame size and rate limits for the room socket, WS_MAX_SIZE in server.py caps frames for every socket
+ROOM_MAX_FRAME_BYTES = int(os.getenv("ROOM_MAX_FRAME_BYTES", str(64 * 1024)))
+CHAT_RATE_PER_CONNECTION = float(os.getenv("CHAT_RATE_PER_CONNECTION", "5"))
+CHAT_BURST_PER_CONNECTION = float(os.getenv("CHAT_BURST_PER_CONNECTION", "10"))
+SIGNAL_RATE_PER_CONNECTION = float(os.getenv("SIGNAL_RATE_PER_CONNECTION", "50"))
+SIGNAL_BURST_PER_CONNECTION = float(os.getenv("SIGNAL_BURST_PER_CONNECTION", "100"))
+CHAT_RATE_PER_ROOM = float(os.getenv("CHAT_RATE_PER_ROOM", "20"))
+CHAT_BURST_PER_ROOM = float(os.getenv("CHAT_BURST_PER_ROOM", "40"))
+
+# room_id -> shared chat bucket for everyone in the room
+room_chat_limits: Dict[str, TokenBucket] = {}
+
 # Pydantic models
 class CreateRoomRequest(BaseModel):
     title: str
@@ -95,16 +108,20 @@ async def get_active_rooms(db: AsyncSessionLocal = Depends(get_db)):
     try:
         result = await db.execute(
             select(Room)
-            .options(selectinload(Room.host), selectinload(Room.participants).selectinload(Participant.user))
+            .options(selectinload(Room.host))
             .where(Room.is_live == True)
             .order_by(Room.created_at.desc())
         )
         rooms = result.scalars().all()
 
+        # Count active WebSocket connections for each room, on every worker
+        active_counts = await room_lifecycle_manager.member_counts({
+            str(room.id): len(active_connections.get(str(room.id), {})) for room in rooms
+        })
+
         rooms_data = []
         for room in rooms:
-            # Count active WebSocket connections for this room
-            active_count = len(active_connections.get(str(room.id), {}))
+            active_count = active_counts[str(room.id)]
 
             rooms_data.append({
                 "id": str(room.id),
@@ -139,7 +156,7 @@ async def get_room(room_id: str, db: AsyncSessionLocal = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Room not found")
 
         # Get active participants from WebSocket connections
-        active_users = list(active_connections.get(room_id, {}).keys())
+        active_users = await room_lifecycle_manager.member_ids(room_id, active_connections.get(room_id, {}).keys())
 
         return {
             "id": str(room.id),
@@ -176,18 +193,15 @@ async def delete_room(
         if str(room.host_id) != current_user["id"]:
             raise HTTPException(status_code=403, detail="Only the room host can delete the room")
 
-        # Disconnect all users from the room
-        if room_id in active_connections:
-            for user_id, websocket in active_connections[room_id].items():
-                try:
-                    await websocket.send_text(json.dumps({
-                        "type": "room_deleted",
-                        "message": "Room has been deleted by the host"
-                    }))
-                    await websocket.close()
-                except:
-                    pass
-            del active_connections[room_id]
+        # Disconnect all users from the room, other workers close their sockets too
+        room_deleted = {
+            "type": "room_deleted",
+            "message": "Room has been deleted by the host"
+        }
+        await worker_fanout.publish_room(room_id, {"message": room_deleted, "close": True})
+        await close_room_connections(room_id, room_deleted)
+
+        await room_history_manager.clear(room_id)
 
         await db.delete(room)
         await db.commit()
@@ -231,44 +245,134 @@ async def authenticate_websocket(websocket: WebSocket) -> dict:
         return None
 
 # WebSocket Helper Functions
-async def broadcast_to_room(room_id: str, message: dict, exclude_user_id: str = None):
-    """Broadcast message to all users in a room"""
+async def load_participants(user_ids: List[str]) -> List[dict]:
+    """Profiles of room members in one query, in the order given"""
+    if not user_ids:
+        return []
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.id, User.username, User.fullName, User.email).where(User.id.in_(user_ids))
+        )
+        rows = {str(row.id): row for row in result.all()}
+
+    return [{
+        "id": user_id,
+        "username": rows[user_id].username,
+        "fullName": rows[user_id].fullName,
+        "email": rows[user_id].email
+    } for user_id in user_ids if user_id in rows]
+
+async def release_room(room_id: str):
+    """Forget a room this worker no longer has sockets in"""
+    active_connections.pop(room_id, None)
+    room_chat_limits.pop(room_id, None)
+    await worker_fanout.leave_room(room_id)
+    # Other workers may keep writing to the room, reload its history from Redis if it comes back here
+    room_history_manager.evict(room_id)
+
+async def close_room_connections(room_id: str, message: dict, code: int = 1000):
+    """Send a final message to every local socket in the room and close them"""
+    for websocket in list(active_connections.get(room_id, {}).values()):
+        try:
+            await send_frame(websocket, message)
+            await websocket.close(code=code)
+        except:
+            pass
+    await release_room(room_id)
+
+async def drain_room_connections():
+    """Graceful shutdown: tell every local room peer the server is restarting, then close with 1012"""
+    room_ids = list(active_connections.keys())
+    await asyncio.gather(*(
+        close_room_connections(room_id, {
+            "type": "server_restart",
+            "room_id": room_id,
+            "message": "Server is restarting, reconnect to rejoin the room",
+            "code": "SERVER_RESTART"
+        }, code=1012)
+        for room_id in room_ids
+    ))
+    if room_ids:
+        print(f"🔌 [SHUTDOWN] Drained room connections in {len(room_ids)} rooms")
+
+async def relay_room_event(room_id: str, event: dict):
+    """Deliver a room event another worker published to this worker's sockets"""
+    if event.get("history"):
+        room_history_manager.ingest(room_id, event["history"])
+
+    if event.get("close"):
+        await close_room_connections(room_id, event["message"])
+        return
+
+    target_user_id = event.get("target_user_id")
+    if target_user_id:
+        websocket = active_connections.get(room_id, {}).get(target_user_id)
+        if websocket is not None:
+            try:
+                await send_frame(websocket, event["message"])
+            except Exception as e:
+                print(f"❌ [RELAY] Failed to deliver signal to {target_user_id} in room {room_id}: {e}")
+        return
+
+    await deliver_to_room(room_id, event["message"], event.get("exclude_user_id"))
+
+async def broadcast_to_room(room_id: str, message: dict, exclude_user_id: str = None, history: dict = None):
+    """Broadcast message to all users in a room, on this worker and the others.
+
+    `history` is the stored chat entry, it lets other workers update their history buffers.
+    """
+    await deliver_to_room(room_id, message, exclude_user_id)
+    event = {"message": message, "exclude_user_id": exclude_user_id}
+    if history is not None:
+        event["history"] = history
+    await worker_fanout.publish_room(room_id, event)
+
+async def deliver_to_room(room_id: str, message: dict, exclude_user_id: str = None):
+    """Send a message to the room's sockets held by this worker"""
     if room_id not in active_connections:
         return
 
     disconnected_users = []
+    # Encode once per codec rather than once per recipient
+    encoded = {}
     for user_id, websocket in active_connections[room_id].items():
         if exclude_user_id and user_id == exclude_user_id:
             continue
 
         try:
-            await websocket.send_text(json.dumps(message))
+            codec = get_codec(websocket)
+            if codec.name not in encoded:
+                encoded[codec.name] = codec.encode(message)
+            await send_encoded(websocket, codec, encoded[codec.name])
         except:
             disconnected_users.append(user_id)
 
     # Clean up disconnected users
     for user_id in disconnected_users:
         active_connections[room_id].pop(user_id, None)
+        await room_lifecycle_manager.leave(room_id, user_id, worker_fanout.worker_id)
         if not active_connections[room_id]:
-            del active_connections[room_id]
+            await release_room(room_id)
+            break
 
 # WebSocket Endpoint
 @router.websocket("/ws/{room_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str):
     """WebSocket endpoint for audio room"""
     print(f"🔌 [CONNECT] New WebSocket connection attempt for room {room_id}")
-    await websocket.accept()
+    # Clients may offer the bitweet.msgpack subprotocol for binary frames, JSON is the fallback
+    await websocket.accept(subprotocol=negotiate_codec(websocket))
     print(f"🔌 [CONNECT] WebSocket accepted for room {room_id}")
 
     # Authenticate user
     user = await authenticate_websocket(websocket)
     if not user:
         print(f"❌ [CONNECT] Authentication failed for room {room_id}")
-        await websocket.send_text(json.dumps({
+        await send_frame(websocket, {
             "type": "error",
             "message": "Authentication failed. Please login and try again.",
             "code": "AUTH_FAILED"
-        }))
+        })
         await websocket.close()
         print(f"🔌 [DISCONNECT] Connection closed due to auth failure for room {room_id}")
         return
@@ -282,22 +386,22 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
 
         if not room:
             print(f"❌ [CONNECT] Room {room_id} not found for user {user['username']}")
-            await websocket.send_text(json.dumps({
+            await send_frame(websocket, {
                 "type": "error",
                 "message": "Room not found",
                 "code": "ROOM_NOT_FOUND"
-            }))
+            })
             await websocket.close()
             print(f"🔌 [DISCONNECT] Connection closed due to room not found for user {user['username']}")
             return
 
         if not room.is_live:
             print(f"❌ [CONNECT] Room {room_id} is not live for user {user['username']}")
-            await websocket.send_text(json.dumps({
+            await send_frame(websocket, {
                 "type": "error",
                 "message": "Room is not live",
                 "code": "ROOM_NOT_LIVE"
-            }))
+            })
             await websocket.close()
             print(f"🔌 [DISCONNECT] Connection closed due to room not live for user {user['username']}")
             return
@@ -305,36 +409,37 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
     # Add user to room connections
     if room_id not in active_connections:
         active_connections[room_id] = {}
+        # Subscribe before reading history so no message from another worker falls in between
+        await worker_fanout.join_room(room_id)
 
     active_connections[room_id][user["id"]] = websocket
+    await room_lifecycle_manager.join(room_id, user["id"], worker_fanout.worker_id)
+    await room_lifecycle_manager.touch(room_id)
     print(f"✅ [CONNECT] User {user['username']} successfully connected to room {room_id}")
     print(f"📊 [CONNECT] Room {room_id} now has {len(active_connections[room_id])} active connections")
 
     # Get existing participants with their profile data
     existing_participants = []
     if room_id in active_connections:
-        for existing_user_id, _ in active_connections[room_id].items():
-            if existing_user_id != user["id"]:  # Exclude the current user
-                async with AsyncSessionLocal() as db:
-                    result = await db.execute(select(User).where(User.id == existing_user_id))
-                    existing_user = result.scalar_one_or_none()
-                    if existing_user:
-                        existing_participants.append({
-                            "id": str(existing_user.id),
-                            "username": existing_user.username,
-                            "fullName": existing_user.fullName,
-                            "email": existing_user.email
-                        })
+        # Members connected through any worker
+        member_ids = await room_lifecycle_manager.member_ids(room_id, active_connections[room_id].keys())
+        existing_participants = await load_participants([
+            member_id for member_id in member_ids if member_id != user["id"]  # Exclude the current user
+        ])
+
+    # Replay recent chat so late joiners see the conversation
+    chat_history = await room_history_manager.recent(room_id, ROOM_CHAT_REPLAY_SIZE)
 
     # Send connection success message with existing participants
-    await websocket.send_text(json.dumps({
+    await send_frame(websocket, {
         "type": "connected",
         "room_id": room_id,
         "user_id": user["id"],
         "username": user["username"],
         "message": "Successfully connected to room",
-        "existing_participants": existing_participants
-    }))
+        "existing_participants": existing_participants,
+        "chat_history": chat_history
+    })
 
     # Notify other users with full profile data
     await broadcast_to_room(room_id, {
@@ -352,50 +457,133 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
 
     try:
         print(f"🔄 [LOOP] Starting message loop for user {user['username']} in room {room_id}")
+        # Per-connection limits, the room-wide chat bucket is shared by all peers
+        chat_limit = TokenBucket(CHAT_RATE_PER_CONNECTION, CHAT_BURST_PER_CONNECTION)
+        signal_limit = TokenBucket(SIGNAL_RATE_PER_CONNECTION, SIGNAL_BURST_PER_CONNECTION)
+        room_chat_limit = room_chat_limits.setdefault(room_id, TokenBucket(CHAT_RATE_PER_ROOM, CHAT_BURST_PER_ROOM))
+
         # Message loop
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            data = await receive_frame(websocket)
+
+            # Reject oversized frames before spending time parsing them
+            if frame_exceeds(data, ROOM_MAX_FRAME_BYTES):
+                throttle_metrics.record("room", "frame_too_large")
+                await send_frame(websocket, {
+                    "type": "error",
+                    "message": f"Frame exceeds {ROOM_MAX_FRAME_BYTES} bytes",
+                    "code": "FRAME_TOO_LARGE"
+                })
+                continue
+
+            message = decode_frame(data)
             message_type = message.get("type")
 
             if message_type == "webrtc_signal":
+                # Signaling floods are dropped silently, WebRTC retries on its own
+                if not signal_limit.consume():
+                    throttle_metrics.record("room", "signal_rate_limited")
+                    continue
+
                 # Forward WebRTC signaling messages
                 target_user_id = message.get("target_user_id")
 
+                signal = {
+                    "type": "webrtc_signal",
+                    "from_user_id": user["id"],
+                    "signal_type": message.get("signal_type"),
+                    "data": message.get("data")
+                }
+
                 if target_user_id and target_user_id in active_connections.get(room_id, {}):
                     # Send to specific user
                     target_websocket = active_connections[room_id][target_user_id]
-                    await target_websocket.send_text(json.dumps({
-                        "type": "webrtc_signal",
-                        "from_user_id": user["id"],
-                        "signal_type": message.get("signal_type"),
-                        "data": message.get("data")
-                    }))
+                    await send_frame(target_websocket, signal)
+                elif target_user_id and await room_lifecycle_manager.is_member(room_id, target_user_id):
+                    # The target is connected to another worker
+                    await worker_fanout.publish_room(room_id, {"message": signal, "target_user_id": target_user_id})
                 else:
                     # Broadcast to all other users (for offers)
-                    await broadcast_to_room(room_id, {
-                        "type": "webrtc_signal",
-                        "from_user_id": user["id"],
-                        "signal_type": message.get("signal_type"),
-                        "data": message.get("data")
-                    }, exclude_user_id=user["id"])
+                    await broadcast_to_room(room_id, signal, exclude_user_id=user["id"])
 
             elif message_type == "chat":
+                chat_text = message.get("message", "")
+                if not isinstance(chat_text, str) or len(chat_text) > ROOM_CHAT_MAX_MESSAGE_LENGTH:
+                    throttle_metrics.record("room", "chat_too_long")
+                    await send_frame(websocket, {
+                        "type": "error",
+                        "message": f"Chat messages must be at most {ROOM_CHAT_MAX_MESSAGE_LENGTH} characters",
+                        "code": "MESSAGE_TOO_LONG",
+                        "temp_id": message.get("temp_id")
+                    })
+                    continue
+
+                if not chat_limit.consume() or not room_chat_limit.consume():
+                    throttle_metrics.record("room", "chat_rate_limited")
+                    # Tell the sender so the pending message can be marked as failed
+                    await send_frame(websocket, {
+                        "type": "error",
+                        "message": "You are sending messages too quickly",
+                        "code": "RATE_LIMITED",
+                        "temp_id": message.get("temp_id")
+                    })
+                    continue
+
                 # Handle chat messages - include sender for delivery confirmation
                 chat_response = {
                     "type": "chat",
                     "room_id": room_id,
                     "user_id": user["id"],
                     "username": user["username"],
-                    "message": message.get("message", ""),
+                    "message": chat_text,
                     "timestamp": message.get("timestamp")
                 }
 
+                # Store in room history before temp_id is attached, it is only meaningful to the sender
+                try:
+                    stored = await room_history_manager.append(room_id, chat_response)
+                except ValueError:
+                    # Not delivered either, so the pending message can be marked as failed and resent
+                    await send_frame(websocket, {
+                        "type": "error",
+                        "message": "Chat message could not be stored, please retry",
+                        "code": "CHAT_UNAVAILABLE",
+                        "temp_id": message.get("temp_id")
+                    })
+                    continue
+                chat_response["seq"] = stored["seq"]
+                chat_response["message"] = stored["message"]
+
                 # Include temp_id if provided by client for message tracking
                 if message.get("temp_id"):
                     chat_response["temp_id"] = message.get("temp_id")
 
-                await broadcast_to_room(room_id, chat_response)  # Include sender for delivery confirmation
+                await broadcast_to_room(room_id, chat_response, history=stored)  # Include sender for delivery confirmation
+
+            elif message_type == "chat_history":
+                # Page through older chat messages, `before` is the oldest seq the client has
+                if not chat_limit.consume():
+                    throttle_metrics.record("room", "history_rate_limited")
+                    continue
+
+                try:
+                    before_seq = int(message.get("before"))
+                    limit = int(message.get("limit", ROOM_CHAT_REPLAY_SIZE))
+                except (TypeError, ValueError):
+                    await send_frame(websocket, {
+                        "type": "error",
+                        "message": "chat_history requires an integer 'before' cursor",
+                        "code": "INVALID_CURSOR"
+                    })
+                    continue
+
+                history_page = await room_history_manager.page(room_id, before_seq, limit)
+                await send_frame(websocket, {
+                    "type": "chat_history",
+                    "room_id": room_id,
+                    "messages": history_page["messages"],
+                    "next_before": history_page["next_before"]
+                })
 
     except WebSocketDisconnect:
         print(f"🔌 [DISCONNECT] WebSocketDisconnect - User {user['username']} disconnected from room {room_id} (CLIENT INITIATED)")
@@ -412,11 +600,15 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
 
             # Clean up empty rooms
             if not active_connections[room_id]:
-                del active_connections[room_id]
+                await release_room(room_id)
                 print(f"🧹 [CLEANUP] Removed empty room {room_id} from active connections")
             else:
                 print(f"📊 [CLEANUP] Room {room_id} now has {len(active_connections[room_id])} active connections")
 
+        # Start the idle timer from the moment the user left
+        await room_lifecycle_manager.leave(room_id, user["id"], worker_fanout.worker_id)
+        await room_lifecycle_manager.touch(room_id)
+
         # Notify other users with full profile data
         await broadcast_to_room(room_id, {
             "type": "user_left",
@@ -1,33 +1,48 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Path, Query
-from pydantic import ValidationError
 from schemas.tweet_schemas import TweetRequest, TweetResponse, PaginatedTweetsResponse
 from services.tweet_service import TweetService
 from utils.auth_middleware import get_current_user
-from typing import Dict, List
+from utils.http_cache import conditional_response
+from utils.responses import FastJSONResponse
+from typing import Dict, List, Optional
 
 router = APIRouter(prefix="/user/tweets", tags=["Tweets"])
 
 @router.post("/", response_model=TweetResponse)
-async def create_tweet(request: Request, current_user: Dict = Depends(get_current_user)):
+async def create_tweet(tweet_data: TweetRequest, current_user: Dict = Depends(get_current_user)):
     try:
-        body = await request.json()
-        tweet_data = TweetRequest(**body)
-        
         # Call service layer with authenticated user ID
         result = await TweetService.create_tweet(
-            user_id=current_user["id"],
+            user=current_user,
             text=tweet_data.text,
             is_private=tweet_data.isPrivate
         )
         
-        return result
+        # Already in TweetResponse shape, skip response_model re-validation
+        return FastJSONResponse(content=result)
         
-    except ValidationError as e:
-        errors = {}
-        for error in e.errors():
-            field_name = error['loc'][-1] if error['loc'] else 'unknown'
-            errors[field_name] = error['msg']
-        raise HTTPException(status_code=400, detail={"errors": errors})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/search")
+async def search_tweets(
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms, web search syntax"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=50, description="Number of tweets per page"),
+    current_user: Dict = Depends(get_current_user)
+):
+    try:
+        result = await TweetService.search_tweets(
+            current_user_id=current_user["id"],
+            query=q,
+            cursor=cursor,
+            limit=limit
+        )
+
+        return FastJSONResponse(content=result)
+
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -35,30 +50,21 @@ async def create_tweet(request: Request, current_user: Dict = Depends(get_curren
 
 @router.put("/{tweet_id}", response_model=TweetResponse)
 async def update_tweet(
-    request: Request, 
+    tweet_data: TweetRequest,
     tweet_id: str = Path(..., title="The ID of the tweet to update"),
     current_user: Dict = Depends(get_current_user)
 ):
     try:
-        body = await request.json()
-        tweet_data = TweetRequest(**body)
-        
         # Call service layer with authenticated user ID
         result = await TweetService.update_tweet(
             tweet_id=tweet_id,
-            user_id=current_user["id"],
+            user=current_user,
             text=tweet_data.text,
             is_private=tweet_data.isPrivate
         )
         
-        return result
+        return FastJSONResponse(content=result)
         
-    except ValidationError as e:
-        errors = {}
-        for error in e.errors():
-            field_name = error['loc'][-1] if error['loc'] else 'unknown'
-            errors[field_name] = error['msg']
-        raise HTTPException(status_code=400, detail={"errors": errors})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -85,18 +91,22 @@ async def delete_tweet(
 
 @router.get("/my-tweets")
 async def get_my_tweets(
+    request: Request,
     page_number: int = Query(1, ge=1, description="Page number for pagination"),
     current_user: Dict = Depends(get_current_user)
 ):
     try:
-        # Call service layer to get current user's tweets
-        result = await TweetService.get_user_tweets(
-            user_id=current_user["id"],
-            page_number=page_number
+        # Unchanged since the client's ETag means a 304 without touching the database
+        return await conditional_response(
+            request,
+            scope=f"my-tweets:{current_user['id']}:{page_number}",
+            version_names=[f"user-tweets:{current_user['id']}"],
+            build=lambda: TweetService.get_user_tweets(
+                user_id=current_user["id"],
+                page_number=page_number
+            )
         )
         
-        return result
-        
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -104,18 +114,23 @@ async def get_my_tweets(
 
 @router.get("/")
 async def get_timeline(
+    request: Request,
     page_number: int = Query(1, ge=1, description="Page number for pagination"),
     current_user: Dict = Depends(get_current_user)
 ):
     try:
-        # Call service layer to get timeline tweets
-        result = await TweetService.get_timeline_tweets(
-            current_user_id=current_user["id"],
-            page_number=page_number
+        # A public tweet write, a private one by someone the user follows or a change in
+        # who the user follows produces a new ETag
+        return await conditional_response(
+            request,
+            scope=f"timeline:{current_user['id']}:{page_number}",
+            version_names=["public-tweets", f"timeline:{current_user['id']}", f"following:{current_user['id']}"],
+            build=lambda: TweetService.get_timeline_tweets(
+                current_user_id=current_user["id"],
+                page_number=page_number
+            )
         )
         
-        return result
-        
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Request, Depends
-from pydantic import ValidationError
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
 from schemas.user_schemas import SendOTPRequest, ChangePasswordRequest
 from services.user_service import UserService
+from services.user_search_service import user_search_service
 from utils.auth_middleware import get_current_user
+from utils.responses import FastJSONResponse
+from typing import Dict
 
 router = APIRouter(prefix="/user", tags=["User"])
 
@@ -13,23 +15,14 @@ async def send_password_reset_otp(request: Request, current_user=Depends(get_cur
 
         return {"message": "OTP sent successfully"}
 
-    except ValidationError as e:
-        errors = {}
-        for error in e.errors():
-            field_name = error['loc'][-1] if error['loc'] else 'unknown'
-            errors[field_name] = error['msg']
-        raise HTTPException(status_code=400, detail={"errors": errors})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.put("/password/change")
-async def change_password(request: Request, current_user=Depends(get_current_user)):
+async def change_password(change_request: ChangePasswordRequest, current_user=Depends(get_current_user)):
     try:
-        body = await request.json()
-        change_request = ChangePasswordRequest(**body)
-
         result = await UserService.verify_otp_and_change_password(
             user_id=current_user["id"],
             otp=change_request.otp,
@@ -38,12 +31,6 @@ async def change_password(request: Request, current_user=Depends(get_current_use
 
         return {"message": "Password changed successfully"}
 
-    except ValidationError as e:
-        errors = {}
-        for error in e.errors():
-            field_name = error['loc'][-1] if error['loc'] else 'unknown'
-            errors[field_name] = error['msg']
-        raise HTTPException(status_code=400, detail={"errors": errors})
     except ValueError as e:
         error_message = str(e)
         # Return specific error messages with 400 status code
@@ -57,3 +44,35 @@ async def change_password(request: Request, current_user=Depends(get_current_use
             raise HTTPException(status_code=400, detail={"message": error_message})
     except Exception as e:
         raise HTTPException(status_code=500, detail={"message": "Internal server error"})
+
+@router.get("/search")
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=100, description="Part of a username or full name"),
+    limit: int = Query(20, ge=1, le=50, description="Number of users to return"),
+    current_user: Dict = Depends(get_current_user)
+):
+    try:
+        users = await user_search_service.search(q, limit)
+
+        return FastJSONResponse(content={"users": users})
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/search/autocomplete")
+async def autocomplete_users(
+    prefix: str = Query(..., min_length=1, max_length=50, description="Start of a username or name"),
+    limit: int = Query(10, ge=1, le=20, description="Number of suggestions to return"),
+    current_user: Dict = Depends(get_current_user)
+):
+    try:
+        users = await user_search_service.autocomplete(prefix, limit)
+
+        return FastJSONResponse(content={"users": users})
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
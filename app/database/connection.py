@@ -1,5 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from database.models import Base
+from sqlalchemy import text
+from utils.metrics import TimedQueuePool, instrument_engine
+import asyncio
 import os
 from typing import AsyncGenerator
 
@@ -7,12 +9,33 @@ DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://twitter_user:twitter_pass
 # Convert to async URL
 ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
+# Connections per worker process, workers x (pool + overflow) must stay under Postgres max_connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+)
+instrument_engine(engine)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
-async def connect_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+async def ping_db():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+async def warm_pool(connections: int = 0):
+    """Open pooled connections up front so the first requests skip the connect handshake"""
+    connections = connections or engine.pool.size()
+    held = await asyncio.gather(*(engine.connect() for _ in range(connections)))
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in held))
+    finally:
+        for conn in held:
+            await conn.close()
 
 async def disconnect_db():
     await engine.dispose()
@@ -22,4 +45,4 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
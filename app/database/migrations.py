@@ -0,0 +1,40 @@
+from sqlalchemy import text
+from database.connection import engine, ping_db
+from database.models import Base
+from utils.readiness import wait_until_ready
+import asyncio
+import time
+
+# Idempotent upgrades for databases created before a column or index existed.
+# create_all only creates missing tables, not missing columns.
+SCHEMA_UPGRADES = [
+    "ALTER TABLE tweets ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_tweets_search_vector ON tweets USING gin (search_vector)",
+    # Trigram indexes for substring user search, the extension has to exist before the indexes
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (username gin_trgm_ops)",
+    'CREATE INDEX IF NOT EXISTS ix_users_fullname_trgm ON users USING gin ("fullName" gin_trgm_ops)',
+    # Follow keyset cursors need a createdAt, rows from before the default get the epoch and sort oldest
+    'UPDATE follows SET "createdAt" = TIMESTAMP \'epoch\' WHERE "createdAt" IS NULL',
+    'ALTER TABLE follows ALTER COLUMN "createdAt" SET NOT NULL',
+]
+
+async def run_migrations():
+    """Create missing tables and apply SCHEMA_UPGRADES"""
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
+    print(f"✅ [MIGRATIONS] Schema up to date in {time.perf_counter() - started:.2f}s")
+
+async def main():
+    await wait_until_ready("PostgreSQL", ping_db)
+    try:
+        await run_migrations()
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Index, Computed
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 import uuid
 from datetime import datetime
 
@@ -28,11 +28,17 @@ class Follow(Base):
 
     followerId = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
     followingId = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
-    createdAt = Column(DateTime, default=datetime.utcnow)
+    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     follower = relationship("User", foreign_keys=[followerId], back_populates="following")
     following = relationship("User", foreign_keys=[followingId], back_populates="followers")
 
+    # Keyset pagination of followers and followees, newest first
+    __table_args__ = (
+        Index("ix_follows_following_created_at", followingId, createdAt),
+        Index("ix_follows_follower_created_at", followerId, createdAt),
+    )
+
 class BlacklistedToken(Base):
     __tablename__ = "blacklisted_tokens"
 
@@ -48,9 +54,15 @@ class Tweet(Base):
     isPrivate = Column(Boolean, default=False)
     createdAt = Column(DateTime, default=datetime.utcnow)
     userId = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    # Maintained by Postgres on every write, searched through the GIN index below
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('english', coalesce(text, ''))", persisted=True))
 
     user = relationship("User", back_populates="tweets")
 
+    __table_args__ = (
+        Index("ix_tweets_search_vector", search_vector, postgresql_using="gin"),
+    )
+
 class Notification(Base):
     __tablename__ = "notifications"
 
@@ -75,6 +87,11 @@ class Room(Base):
     host = relationship("User", back_populates="hosted_rooms")
     participants = relationship("Participant", back_populates="room", cascade="all, delete-orphan")
 
+    # Partial index keeps the live-room listing proportional to live rooms only
+    __table_args__ = (
+        Index("ix_rooms_live_created_at", created_at, postgresql_where=is_live == True),
+    )
+
 class Participant(Base):
     __tablename__ = "participants"
 
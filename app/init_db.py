@@ -1,29 +1,29 @@
+from database.connection import ping_db, warm_pool
+from database.migrations import run_migrations
+from utils.readiness import wait_until_ready, readiness
 import asyncio
-import time
-import socket
+import os
 
-def wait_for_postgres():
-    print("Waiting for PostgreSQL...")
-    while True:
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex(('postgres', 5432))
-            sock.close()
-            if result == 0:
-                print("PostgreSQL is ready!")
-                break
-        except:
-            pass
-        time.sleep(1)
+# Schema changes normally run once as `python -m database.migrations` before the app starts.
+# Set to true to run them on every boot instead, e.g. for a single local process.
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "false").lower() == "true"
+
+async def wait_for_postgres():
+    await wait_until_ready("PostgreSQL", ping_db)
 
 async def init_database():
     try:
-        wait_for_postgres()
+        with readiness.phase("postgres"):
+            await wait_for_postgres()
+        if RUN_MIGRATIONS_ON_STARTUP:
+            with readiness.phase("migrations"):
+                await run_migrations()
+        with readiness.phase("pool"):
+            await warm_pool()
         print("Database initialized successfully")
     except Exception as e:
         print(f"Database initialization failed: {e}")
         raise e
 
 if __name__ == "__main__":
-    asyncio.run(init_database())
\ No newline at end of file
+    asyncio.run(init_database())
@@ -1,30 +1,75 @@
 from fastapi import FastAPI
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import os
 from controllers.auth_controller import router as auth_router
 from controllers.connections_controller import router as connections_router
 from controllers.tweet_controller import router as tweet_router
 from controllers.user_controller import router as user_router
 from controllers.notification_controller import router as notification_router
-from controllers.room_controller import router as room_router
-from database.connection import connect_db, disconnect_db
+from controllers.room_controller import (
+    router as room_router,
+    active_connections as room_connections,
+    drain_room_connections,
+    relay_room_event,
+)
+from controllers.health_controller import router as health_router
+from controllers.metrics_controller import router as metrics_router
+from database.connection import disconnect_db
 from init_db import init_database
 from services.websocket_manager import websocket_manager
+from services.room_history import room_history_manager
+from services.room_lifecycle import room_lifecycle_manager
+from services.discovery_service import discovery_service
+from services.fanout import worker_fanout
+from services.follow_graph import follow_graph, FOLLOW_GRAPH_EVENT
+from utils.http_cache import version_store
+from utils.metrics import metrics, MetricsMiddleware
+from utils.query_audit import QUERY_AUDIT, QueryAuditMiddleware
+from utils.readiness import readiness
 from utils.security_middleware import SecurityMiddleware
+from utils.validation import body_validation_exception_handler
+
+async def init_redis():
+    with readiness.phase("redis"):
+        await websocket_manager.init_redis()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    await init_database()
-    await connect_db()
-    await websocket_manager.init_redis()
+    # Startup, PostgreSQL and Redis are waited for concurrently
+    readiness.begin()
+    await asyncio.gather(init_database(), init_redis())
+    room_history_manager.set_redis(websocket_manager.redis_client)
+    room_lifecycle_manager.set_redis(websocket_manager.redis_client)
+    room_lifecycle_manager.start(lambda: list(room_connections.keys()))
+    discovery_service.set_redis(websocket_manager.redis_client)
+    version_store.set_redis(websocket_manager.redis_client)
+    discovery_service.start()
+    # Room broadcasts and notifications reach sockets held by other worker processes through Redis
+    worker_fanout.set_redis(websocket_manager.redis_client)
+    worker_fanout.on_broadcast(FOLLOW_GRAPH_EVENT, follow_graph.apply_remote)
+    await worker_fanout.start(websocket_manager.relay_worker_event, relay_room_event)
+    metrics.set_redis(websocket_manager.redis_client, worker_fanout.worker_id)
+    metrics.start()
+    readiness.on_drain(drain_room_connections)
+    readiness.on_drain(websocket_manager.drain)
+    readiness.mark_ready()
     yield
-    # Shutdown
+    # Shutdown, server.py drains before uvicorn closes sockets, this covers other servers
+    await readiness.drain()
+    await discovery_service.stop()
+    await room_lifecycle_manager.stop()
+    await worker_fanout.stop()
+    await metrics.stop()
+    await websocket_manager.close_redis()
     await disconnect_db()
 
 app = FastAPI(lifespan=lifespan)
 
+app.add_exception_handler(RequestValidationError, body_validation_exception_handler)
+
 app.add_middleware(SecurityMiddleware)
 
 # Configure CORS
@@ -37,12 +82,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Development and CI only: report N+1 and slow queries per request
+if QUERY_AUDIT != "off":
+    app.add_middleware(QueryAuditMiddleware)
+
+# Outermost, so latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth_router)
 app.include_router(connections_router)
 app.include_router(tweet_router)
 app.include_router(user_router)
 app.include_router(notification_router)
 app.include_router(room_router)
+app.include_router(health_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 def root():
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, validator
-from typing import List
+from typing import List, Optional
 import re
+import uuid
 
 class FollowRequest(BaseModel):
     to_follow: str  # User ID to follow
@@ -8,6 +9,39 @@ class FollowRequest(BaseModel):
 class UnfollowRequest(BaseModel):
     to_unfollow: str  # User ID to unfollow
 
+MAX_BULK_FOLLOW = 100
+
+def _validate_user_ids(v: List[str]) -> List[str]:
+    for user_id in v:
+        try:
+            uuid.UUID(user_id)
+        except ValueError:
+            raise ValueError(f'Invalid user id: {user_id}')
+    # Preserve order, drop duplicates
+    return list(dict.fromkeys(v))
+
+class BulkFollowRequest(BaseModel):
+    to_follow: List[str] = Field(..., min_length=1, max_length=MAX_BULK_FOLLOW)  # User IDs to follow
+
+    @validator('to_follow')
+    def validate_to_follow(cls, v):
+        return _validate_user_ids(v)
+
+class BulkUnfollowRequest(BaseModel):
+    to_unfollow: List[str] = Field(..., min_length=1, max_length=MAX_BULK_FOLLOW)  # User IDs to unfollow
+
+    @validator('to_unfollow')
+    def validate_to_unfollow(cls, v):
+        return _validate_user_ids(v)
+
+class BulkFollowResponse(BaseModel):
+    message: str
+    followed: List[str]
+
+class BulkUnfollowResponse(BaseModel):
+    message: str
+    unfollowed: List[str]
+
 class UserResponse(BaseModel):
     id: str
     username: str
@@ -16,16 +50,18 @@ class UserResponse(BaseModel):
 
 class PaginatedUsersResponse(BaseModel):
     users: List[UserResponse]
-    page: int
-    page_size: int
-    total: int
-    total_pages: int
+    next_cursor: Optional[str] = None
+
+class FollowerResponse(UserResponse):
+    isFollowing: bool = False  # Whether the current user follows this follower back
 
 class FollowersResponse(BaseModel):
-    followers: List[UserResponse]
+    followers: List[FollowerResponse]
+    next_cursor: Optional[str] = None
 
 class FollowingResponse(BaseModel):
     following: List[UserResponse]
+    next_cursor: Optional[str] = None
 
 class SendOTPRequest(BaseModel):
     pass  # No fields needed as we'll use the authenticated user's ID
@@ -0,0 +1,60 @@
+"""Production server: N uvicorn workers on uvloop and httptools with a graceful WebSocket drain.
+
+Run from the app directory: python server.py
+"""
+from uvicorn.supervisors import Multiprocess
+from utils.readiness import readiness, DRAIN_TIMEOUT
+import os
+import uvicorn
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+# Worker processes, defaults to the CPUs this container may use
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or len(os.sched_getaffinity(0))
+# Largest WebSocket message the protocol layer accepts (after decompression), bigger ones close
+# the socket with 1009 before they are buffered. Endpoints apply their own smaller caps on top.
+WS_MAX_SIZE = int(os.getenv("WS_MAX_SIZE", str(64 * 1024)))
+# Seconds in-flight requests get after the drain before uvicorn cancels them
+GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "20"))
+
+class DrainingServer(uvicorn.Server):
+    """Tells room peers about the restart before uvicorn drops every open connection.
+
+    uvicorn's own shutdown closes WebSockets with 1012 straight away and only then runs
+    the lifespan shutdown, so the drain has to happen here, in between.
+    """
+
+    async def shutdown(self, sockets=None):
+        # Stop accepting connections first so clients reconnect to the other workers
+        for server in self.servers:
+            server.close()
+        await readiness.drain(DRAIN_TIMEOUT)
+        await super().shutdown(sockets=sockets)
+
+def build_config(**overrides) -> uvicorn.Config:
+    options = dict(
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        loop="uvloop",
+        http="httptools",
+        ws="websockets",
+        ws_per_message_deflate=True,
+        ws_max_size=WS_MAX_SIZE,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
+    options.update(overrides)
+    return uvicorn.Config("main:app", **options)
+
+def serve(config: uvicorn.Config):
+    server = DrainingServer(config=config)
+    print(f"🚀 [SERVER] Starting {config.workers} worker(s) on {config.host}:{config.port}")
+    if config.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+
+if __name__ == "__main__":
+    serve(build_config())
@@ -1,23 +1,28 @@
-from passlib.context import CryptContext
 from sqlalchemy.exc import IntegrityError
 from database.connection import AsyncSessionLocal
 from database.models import User, BlacklistedToken
 from schemas.auth_schemas import UserRegistrationRequest, UserLoginRequest
 from utils.token_utils import generate_tokens
 from utils.security_middleware import sanitize_string
+from services.user_search_service import user_search_service
 from typing import Dict, Tuple
 from sqlalchemy import select, or_
+from functools import lru_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def pwd_context():
+    """bcrypt context, built on first hash or verify instead of at import"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class AuthService:
     @staticmethod
     def hash_password(password: str) -> str:
-        return pwd_context.hash(password)
+        return pwd_context().hash(password)
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+        return pwd_context().verify(plain_password, hashed_password)
 
     @staticmethod
     async def register_user(user_data: UserRegistrationRequest) -> Tuple[Dict, Dict[str, str]]:
@@ -41,6 +46,8 @@ class AuthService:
                 db.add(user)
                 await db.commit()
                 await db.refresh(user)
+
+                user_search_service.add_user(str(user.id), user.username, user.fullName)
                 
                 # Generate tokens
                 tokens = generate_tokens(str(user.id))
@@ -1,213 +1,267 @@
 from utils.notification_utils import send_notification
+from services.follow_graph import follow_graph
+from utils.http_cache import version_store
 from database.connection import AsyncSessionLocal
 from database.models import User, Follow
-from typing import Dict, List
-from sqlalchemy import select, func, and_, not_, delete
+from utils.pagination import encode_cursor, decode_cursor
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, delete, exists, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
 
 class ConnectionsService:
     @staticmethod
     async def follow_user(follower_id: str, following_id: str, follower_username: str) -> Dict:
+        if follower_id == following_id:
+            raise ValueError("You cannot follow yourself")
+
+        # One statement: look up the target, insert the edge if missing, report both
+        target = select(User.id, User.username).where(User.id == following_id).cte("target")
+        inserted = (
+            pg_insert(Follow)
+            .from_select(
+                ["followerId", "followingId", "createdAt"],
+                select(literal(follower_id, Follow.followerId.type), target.c.id, literal(datetime.utcnow(), Follow.createdAt.type))
+            )
+            .on_conflict_do_nothing(index_elements=[Follow.followerId, Follow.followingId])
+            .returning(Follow.followingId)
+            .cte("inserted")
+        )
+        query = select(
+            target.c.username,
+            select(func.count()).select_from(inserted).scalar_subquery().label("inserted")
+        )
+
         async with AsyncSessionLocal() as db:
             try:
-                # Check if users exist
-                result = await db.execute(select(User).where(User.id == following_id))
-                following_user = result.scalar_one_or_none()
-                if not following_user:
-                    raise ValueError("User to follow does not exist")
-
-                if follower_id == following_id:
-                    raise ValueError("You cannot follow yourself")
-
-                # Check if already following
-                result = await db.execute(
-                    select(Follow).where(
-                        and_(
-                            Follow.followerId == follower_id,
-                            Follow.followingId == following_id
-                        )
-                    )
-                )
-                existing_follow = result.scalar_one_or_none()
-
-                if existing_follow:
-                    return {"message": f"You are already following {following_user.username}"}
-
-                # Create follow relationship
-                follow = Follow(
-                    followerId=follower_id,
-                    followingId=following_id
-                )
-                db.add(follow)
+                result = await db.execute(query)
+                row = result.first()
                 await db.commit()
-
-                await send_notification(message=f"{follower_username} is now following you!", user_id=following_id)
-
-                return {"message": f"You are now following {following_user.username}"}
-
-            except ValueError as e:
-                raise ValueError(str(e))
+            except IntegrityError:
+                # Target was deleted between the lookup and the insert, the FK rejects the edge
+                await db.rollback()
+                raise ValueError("User to follow does not exist")
             except Exception as e:
                 await db.rollback()
                 raise ValueError(f"Failed to follow user: {str(e)}")
 
+        if row is None:
+            raise ValueError("User to follow does not exist")
+
+        if not row.inserted:
+            return {"message": f"You are already following {row.username}"}
+
+        await follow_graph.add_follow(follower_id, following_id)
+        await version_store.bump(f"following:{follower_id}", f"followers:{following_id}")
+        await send_notification(message=f"{follower_username} is now following you!", user_id=following_id)
+
+        return {"message": f"You are now following {row.username}"}
+
     @staticmethod
     async def unfollow_user(follower_id: str, following_id: str) -> Dict:
+        if follower_id == following_id:
+            raise ValueError("You cannot unfollow yourself")
+
+        # One statement: look up the target, delete the edge if present, report both
+        target = select(User.id, User.username).where(User.id == following_id).cte("target")
+        deleted = (
+            delete(Follow)
+            .where(Follow.followerId == follower_id, Follow.followingId == following_id)
+            .returning(Follow.followingId)
+            .cte("deleted")
+        )
+        query = select(
+            target.c.username,
+            select(func.count()).select_from(deleted).scalar_subquery().label("deleted")
+        )
+
         async with AsyncSessionLocal() as db:
             try:
-                # Check if users exist
-                result = await db.execute(select(User).where(User.id == following_id))
-                following_user = result.scalar_one_or_none()
-                if not following_user:
-                    raise ValueError("User to unfollow does not exist")
-
-                if follower_id == following_id:
-                    raise ValueError("You cannot unfollow yourself")
-
-                # Check if already following
-                result = await db.execute(
-                    select(Follow).where(
-                        and_(
-                            Follow.followerId == follower_id,
-                            Follow.followingId == following_id
-                        )
-                    )
-                )
-                existing_follow = result.scalar_one_or_none()
-
-                if not existing_follow:
-                    return {"message": f"You are not following {following_user.username}"}
-
-                # Delete follow relationship using SQLAlchemy delete
-                await db.execute(
-                    delete(Follow).where(
-                        and_(
-                            Follow.followerId == follower_id,
-                            Follow.followingId == following_id
-                        )
-                    )
-                )
+                result = await db.execute(query)
+                row = result.first()
                 await db.commit()
-
-                return {"message": f"You have unfollowed {following_user.username}"}
-            except ValueError as e:
-                raise ValueError(str(e))
             except Exception as e:
                 await db.rollback()
                 raise ValueError(f"Failed to unfollow user: {str(e)}")
 
+        if row is None:
+            raise ValueError("User to unfollow does not exist")
+
+        if not row.deleted:
+            return {"message": f"You are not following {row.username}"}
+
+        await follow_graph.remove_follow(follower_id, following_id)
+        await version_store.bump(f"following:{follower_id}", f"followers:{following_id}")
+
+        return {"message": f"You have unfollowed {row.username}"}
+
     @staticmethod
-    async def get_users_paginated(current_user_id: str, page: int = 1, page_size: int = 20) -> Dict:
+    async def follow_users(follower_id: str, following_ids: List[str]) -> Dict:
+        """Follow many users with one INSERT ... SELECT, skipping unknown and already followed ids.
+
+        Notifying the followed users is left to the caller, see send_notifications_batch.
+        """
+        candidate_ids = [user_id for user_id in following_ids if user_id != follower_id]
+        if not candidate_ids:
+            return {"message": "No users to follow", "followed": []}
+
+        query = (
+            pg_insert(Follow)
+            .from_select(
+                ["followerId", "followingId", "createdAt"],
+                select(literal(follower_id, Follow.followerId.type), User.id, literal(datetime.utcnow(), Follow.createdAt.type))
+                .where(User.id.in_(candidate_ids))
+            )
+            .on_conflict_do_nothing(index_elements=[Follow.followerId, Follow.followingId])
+            .returning(Follow.followingId)
+        )
+
         async with AsyncSessionLocal() as db:
             try:
-                # Calculate skip for pagination
-                skip = (page - 1) * page_size
-
-                # Get the IDs of users that the current user is following
-                result = await db.execute(
-                    select(Follow.followingId).where(Follow.followerId == current_user_id)
-                )
-                following_ids = [str(row[0]) for row in result.fetchall()]
-
-                # Build where condition
-                where_conditions = [User.id != current_user_id]
-                if following_ids:
-                    where_conditions.append(not_(User.id.in_(following_ids)))
-
-                # Get users with pagination, excluding current user and users already followed
-                result = await db.execute(
-                    select(User)
-                    .where(and_(*where_conditions))
-                    .order_by(User.id.asc())
-                    .offset(skip)
-                    .limit(page_size)
-                )
-                users = result.scalars().all()
-
-                # Manually exclude password
-                users_without_password = [{
-                    "id": str(user.id),
-                    "username": user.username,
-                    "fullName": user.fullName,
-                    "email": user.email
-                } for user in users]
-
-                # Get total count for pagination info (excluding current user and followed users)
-                count_result = await db.execute(
-                    select(func.count(User.id)).where(and_(*where_conditions))
-                )
-                total_count = count_result.scalar() or 0
-
-                return {
-                    "users": users_without_password,
-                    "page": page,
-                    "page_size": page_size,
-                    "total": total_count,
-                    "total_pages": (total_count + page_size - 1) // page_size if total_count > 0 else 0
-                }
-
-            except ValueError as e:
-                raise ValueError(str(e))
+                result = await db.execute(query)
+                followed = [str(row[0]) for row in result.all()]
+                await db.commit()
             except Exception as e:
-                raise ValueError(f"Failed to get users: {str(e)}")
+                await db.rollback()
+                raise ValueError(f"Failed to follow users: {str(e)}")
+
+        if followed:
+            await follow_graph.add_follows(follower_id, followed)
+            await version_store.bump(f"following:{follower_id}", *[f"followers:{user_id}" for user_id in followed])
+
+        return {"message": f"You are now following {len(followed)} users", "followed": followed}
 
     @staticmethod
-    async def get_followers(user_id: str) -> Dict:
+    async def unfollow_users(follower_id: str, following_ids: List[str]) -> Dict:
+        """Unfollow many users with one DELETE ... RETURNING"""
+        query = (
+            delete(Follow)
+            .where(Follow.followerId == follower_id, Follow.followingId.in_(following_ids))
+            .returning(Follow.followingId)
+        )
+
         async with AsyncSessionLocal() as db:
             try:
-                # Find all follows where the current user is being followed
-                result = await db.execute(
-                    select(Follow.followerId).where(Follow.followingId == user_id)
-                )
-                follower_ids = [str(row[0]) for row in result.fetchall()]
-
-                followers = []
-
-                if follower_ids:
-                    # Get the follower users
-                    result = await db.execute(
-                        select(User).where(User.id.in_(follower_ids))
-                    )
-                    users = result.scalars().all()
-
-                    followers = [{
-                        "id": str(user.id),
-                        "username": user.username,
-                        "fullName": user.fullName,
-                        "email": user.email
-                    } for user in users]
-
-                return {"followers": followers}
-
+                result = await db.execute(query)
+                unfollowed = [str(row[0]) for row in result.all()]
+                await db.commit()
             except Exception as e:
-                raise ValueError(f"Failed to get followers: {str(e)}")
+                await db.rollback()
+                raise ValueError(f"Failed to unfollow users: {str(e)}")
+
+        if unfollowed:
+            await follow_graph.remove_follows(follower_id, unfollowed)
+            await version_store.bump(f"following:{follower_id}", *[f"followers:{user_id}" for user_id in unfollowed])
+
+        return {"message": f"You have unfollowed {len(unfollowed)} users", "unfollowed": unfollowed}
 
     @staticmethod
-    async def get_following(user_id: str) -> Dict:
+    def not_followed_by(current_user_id: str):
+        """Anti-join predicate: users that current_user_id does not follow"""
+        return ~exists().where(
+            Follow.followerId == current_user_id,
+            Follow.followingId == User.id
+        )
+
+    @staticmethod
+    async def get_users_page(
+        current_user_id: str,
+        after_id: Optional[str] = None,
+        limit: int = 20,
+        exclude_ids: Optional[List[str]] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Users the current user does not follow, ordered by id, after the given id"""
+        try:
+            query = (
+                select(User.id, User.username, User.fullName, User.email)
+                .where(User.id != current_user_id, ConnectionsService.not_followed_by(current_user_id))
+                .order_by(User.id.asc())
+                .limit(limit + 1)
+            )
+            if after_id:
+                query = query.where(User.id > after_id)
+            if exclude_ids:
+                query = query.where(User.id.notin_(exclude_ids))
+
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(query)
+                rows = result.all()
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            # Manually exclude password
+            users = [{
+                "id": str(row.id),
+                "username": row.username,
+                "fullName": row.fullName,
+                "email": row.email
+            } for row in rows]
+
+            return users, (users[-1]["id"] if has_more else None)
+
+        except Exception as e:
+            raise ValueError(f"Failed to get users: {str(e)}")
+
+    @staticmethod
+    async def _get_connections_page(user_id: str, direction: str, cursor: Optional[str], limit: int) -> Tuple[List[Dict], Optional[str]]:
+        """One page of followers or followees, newest follow first, joined to users in a single query"""
+        if direction == "followers":
+            # Users following user_id
+            owner_column, other_column = Follow.followingId, Follow.followerId
+        else:
+            # Users that user_id follows
+            owner_column, other_column = Follow.followerId, Follow.followingId
+
+        query = (
+            select(User.id, User.username, User.fullName, User.email, Follow.createdAt)
+            .join(Follow, other_column == User.id)
+            .where(owner_column == user_id)
+            .order_by(Follow.createdAt.desc(), other_column.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            query = query.where(tuple_(Follow.createdAt, other_column) < tuple_(cursor_created_at, cursor_id))
+
         async with AsyncSessionLocal() as db:
-            try:
-                # Find all follows where the current user is following
-                result = await db.execute(
-                    select(Follow.followingId).where(Follow.followerId == user_id)
-                )
-                following_ids = [str(row[0]) for row in result.fetchall()]
-
-                following = []
-
-                if following_ids:
-                    # Get the following users
-                    result = await db.execute(
-                        select(User).where(User.id.in_(following_ids))
-                    )
-                    users = result.scalars().all()
-
-                    following = [{
-                        "id": str(user.id),
-                        "username": user.username,
-                        "fullName": user.fullName,
-                        "email": user.email
-                    } for user in users]
-
-                return {"following": following}
+            result = await db.execute(query)
+            rows = result.all()
 
-            except Exception as e:
-                raise ValueError(f"Failed to get following: {str(e)}")
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        users = [{
+            "id": str(row.id),
+            "username": row.username,
+            "fullName": row.fullName,
+            "email": row.email
+        } for row in rows]
+        next_cursor = encode_cursor(rows[-1].createdAt, rows[-1].id) if has_more else None
+
+        return users, next_cursor
+
+    @staticmethod
+    async def get_followers(user_id: str, cursor: Optional[str] = None, limit: int = 20) -> Dict:
+        try:
+            followers, next_cursor = await ConnectionsService._get_connections_page(user_id, "followers", cursor, limit)
+
+            # Follow-back state for the whole page in one membership check
+            follows_back = await follow_graph.are_following(user_id, [follower["id"] for follower in followers])
+            for follower in followers:
+                follower["isFollowing"] = follows_back[follower["id"]]
+            return {"followers": followers, "next_cursor": next_cursor}
+        except ValueError as e:
+            raise ValueError(str(e))
+        except Exception as e:
+            raise ValueError(f"Failed to get followers: {str(e)}")
+
+    @staticmethod
+    async def get_following(user_id: str, cursor: Optional[str] = None, limit: int = 20) -> Dict:
+        try:
+            following, next_cursor = await ConnectionsService._get_connections_page(user_id, "following", cursor, limit)
+            return {"following": following, "next_cursor": next_cursor}
+        except ValueError as e:
+            raise ValueError(str(e))
+        except Exception as e:
+            raise ValueError(f"Failed to get following: {str(e)}")
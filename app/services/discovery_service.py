@@ -0,0 +1,236 @@
+from database.connection import AsyncSessionLocal
+from database.models import User, Follow
+from services.connections_service import ConnectionsService
+from utils.serialization import dumps, loads
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+from typing import Dict, List, Optional
+import asyncio
+import os
+import time
+
+# Candidates precomputed per user
+DISCOVERY_POOL_SIZE = int(os.getenv("DISCOVERY_POOL_SIZE", "200"))
+# Seconds a user's candidate pool stays cached
+DISCOVERY_POOL_TTL = int(os.getenv("DISCOVERY_POOL_TTL", "3600"))
+# Seconds between pool refresh rounds
+DISCOVERY_REFRESH_INTERVAL = int(os.getenv("DISCOVERY_REFRESH_INTERVAL", "300"))
+# Users whose pools are rebuilt per refresh round
+DISCOVERY_REFRESH_BATCH = int(os.getenv("DISCOVERY_REFRESH_BATCH", "100"))
+
+# Users waiting for a pool to be built
+DISCOVERY_PENDING_KEY = "discover:pending"
+
+POOL_CURSOR_PREFIX = "p"
+SCAN_CURSOR_PREFIX = "u"
+# Scan that follows a served pool and skips the pool's users
+AFTER_POOL_CURSOR_PREFIX = "r"
+
+class DiscoveryService:
+    """People-to-follow suggestions: a cached friends-of-friends/popular pool, then a keyset scan"""
+
+    def __init__(
+        self,
+        pool_size: int = DISCOVERY_POOL_SIZE,
+        pool_ttl: int = DISCOVERY_POOL_TTL,
+        refresh_interval: int = DISCOVERY_REFRESH_INTERVAL,
+        refresh_batch: int = DISCOVERY_REFRESH_BATCH,
+    ):
+        self.pool_size = pool_size
+        self.pool_ttl = pool_ttl
+        self.refresh_interval = refresh_interval
+        self.refresh_batch = refresh_batch
+        self.redis_client = None
+        self.popular_ids: List[str] = []
+        self.popular_updated_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def set_redis(self, redis_client):
+        self.redis_client = redis_client
+
+    @staticmethod
+    def pool_key(user_id: str) -> str:
+        return f"discover:pool:{user_id}"
+
+    async def _scan(
+        self,
+        current_user_id: str,
+        after_id: Optional[str],
+        limit: int,
+        pool: Optional[List[str]] = None,
+    ) -> Dict:
+        """A keyset scan page, skipping the users of a pool the client has already been served"""
+        users, last_id = await ConnectionsService.get_users_page(current_user_id, after_id, limit, exclude_ids=pool)
+        prefix = AFTER_POOL_CURSOR_PREFIX if pool else SCAN_CURSOR_PREFIX
+        return {"users": users, "next_cursor": f"{prefix}{last_id}" if last_id else None}
+
+    async def get_people(self, current_user_id: str, cursor: Optional[str] = None, limit: int = 20) -> Dict:
+        """One page of suggestions. Pool pages come first, then every other user by id."""
+        if cursor and cursor[0] == SCAN_CURSOR_PREFIX:
+            return await self._scan(current_user_id, cursor[1:], limit)
+        if cursor and cursor[0] == AFTER_POOL_CURSOR_PREFIX:
+            # An expired pool can no longer be skipped, its users may then come up again
+            return await self._scan(current_user_id, cursor[1:], limit, await self._get_pool(current_user_id))
+
+        offset = 0
+        if cursor:
+            if cursor[0] != POOL_CURSOR_PREFIX or not cursor[1:].isdigit():
+                raise ValueError("Invalid cursor")
+            offset = int(cursor[1:])
+
+        pool = await self._get_pool(current_user_id)
+        if pool is None:
+            # No pool yet: serve the plain anti-join scan and ask the refresher to build one
+            await self._request_pool(current_user_id)
+            return await self._scan(current_user_id, None, limit)
+
+        users: List[Dict] = []
+        while offset < len(pool) and len(users) < limit:
+            window = pool[offset:offset + limit - len(users)]
+            offset += len(window)
+            users.extend(await self._hydrate(current_user_id, window))
+
+        if offset < len(pool):
+            return {"users": users, "next_cursor": f"{POOL_CURSOR_PREFIX}{offset}"}
+
+        # Pool exhausted, continue with the keyset scan over everyone outside the pool
+        if len(users) < limit:
+            page = await self._scan(current_user_id, None, limit - len(users), pool)
+            page["users"] = users + page["users"]
+            return page
+        return {"users": users, "next_cursor": f"{AFTER_POOL_CURSOR_PREFIX}"}
+
+    async def _hydrate(self, current_user_id: str, user_ids: List[str]) -> List[Dict]:
+        """Profiles for a pool window, dropping users followed since the pool was built"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(User.id, User.username, User.fullName, User.email)
+                .where(User.id.in_(user_ids), ConnectionsService.not_followed_by(current_user_id))
+            )
+            rows = {str(row.id): row for row in result.all()}
+
+        return [{
+            "id": user_id,
+            "username": rows[user_id].username,
+            "fullName": rows[user_id].fullName,
+            "email": rows[user_id].email
+        } for user_id in user_ids if user_id in rows]
+
+    async def _get_pool(self, user_id: str) -> Optional[List[str]]:
+        if not self.redis_client:
+            return None
+        try:
+            cached = await self.redis_client.get(self.pool_key(user_id))
+        except Exception as e:
+            print(f"❌ [DISCOVERY] Failed to read candidate pool for user {user_id}: {e}")
+            return None
+        return loads(cached) if cached is not None else None
+
+    async def _request_pool(self, user_id: str):
+        if self.redis_client:
+            try:
+                await self.redis_client.sadd(DISCOVERY_PENDING_KEY, user_id)
+            except Exception as e:
+                print(f"❌ [DISCOVERY] Failed to queue pool build for user {user_id}: {e}")
+
+    async def _refresh_popular(self):
+        """Most-followed users, shared by every pool and recomputed once per refresh interval"""
+        if time.time() - self.popular_updated_at < self.refresh_interval and self.popular_ids:
+            return
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Follow.followingId)
+                .group_by(Follow.followingId)
+                .order_by(func.count().desc())
+                .limit(self.pool_size)
+            )
+            self.popular_ids = [str(row[0]) for row in result.all()]
+        self.popular_updated_at = time.time()
+
+    async def build_pool(self, user_id: str) -> List[str]:
+        """Friends-of-friends ranked by mutual follows, topped up with popular users"""
+        first_hop = aliased(Follow)
+        second_hop = aliased(Follow)
+        mutuals = func.count().label("mutuals")
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(second_hop.followingId, mutuals)
+                .join(first_hop, first_hop.followingId == second_hop.followerId)
+                .where(
+                    first_hop.followerId == user_id,
+                    second_hop.followingId != user_id,
+                    ~select(Follow.followerId).where(
+                        Follow.followerId == user_id,
+                        Follow.followingId == second_hop.followingId
+                    ).exists()
+                )
+                .group_by(second_hop.followingId)
+                .order_by(mutuals.desc())
+                .limit(self.pool_size)
+            )
+            pool = [str(row[0]) for row in result.all()]
+
+        # Followed popular users are filtered out when the pool is hydrated
+        seen = set(pool)
+        seen.add(user_id)
+        for popular_id in self.popular_ids:
+            if len(pool) >= self.pool_size:
+                break
+            if popular_id not in seen:
+                pool.append(popular_id)
+                seen.add(popular_id)
+
+        if self.redis_client:
+            await self.redis_client.set(self.pool_key(user_id), dumps(pool), ex=self.pool_ttl)
+        return pool
+
+    async def invalidate(self, user_id: str):
+        """Drop a cached pool, e.g. after the user follows many people at once"""
+        if self.redis_client:
+            try:
+                await self.redis_client.delete(self.pool_key(user_id))
+            except Exception as e:
+                print(f"❌ [DISCOVERY] Failed to invalidate candidate pool for user {user_id}: {e}")
+
+    async def refresh(self) -> int:
+        """Build pools for users that asked for suggestions without one"""
+        if not self.redis_client:
+            return 0
+        user_ids = await self.redis_client.spop(DISCOVERY_PENDING_KEY, self.refresh_batch) or []
+        if not user_ids:
+            return 0
+        await self._refresh_popular()
+        for user_id in user_ids:
+            try:
+                await self.build_pool(user_id)
+            except Exception as e:
+                print(f"❌ [DISCOVERY] Failed to build candidate pool for user {user_id}: {e}")
+        return len(user_ids)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                built = await self.refresh()
+                if built:
+                    print(f"🧭 [DISCOVERY] Built candidate pools for {built} users")
+            except Exception as e:
+                print(f"❌ [DISCOVERY] Pool refresh failed: {e}")
+            # Pending users are picked up quickly, the popular list follows the refresh interval
+            await asyncio.sleep(min(self.refresh_interval, 10))
+
+# Global instance
+discovery_service = DiscoveryService()
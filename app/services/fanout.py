@@ -0,0 +1,198 @@
+from utils.serialization import dumps, loads
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+import asyncio
+import os
+import uuid
+
+WORKER_CHANNEL_PREFIX = "ws:worker:"
+ROOM_CHANNEL_PREFIX = "ws:room:"
+# Events every worker receives, e.g. cache invalidations
+BROADCAST_CHANNEL = "ws:broadcast"
+HEARTBEAT_KEY_PREFIX = "ws:alive:"
+# Seconds between heartbeats, which tell other workers this one still holds its sockets
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "5"))
+# Seconds after its last heartbeat a worker counts as dead, its room members and sockets are then ignored
+WORKER_HEARTBEAT_TTL = int(os.getenv("WORKER_HEARTBEAT_TTL", "15"))
+
+class WorkerFanout:
+    """Redis pub/sub relay for WebSocket traffic between worker processes.
+
+    Every worker subscribes to its own channel, for messages to sockets it holds, to the
+    channel of each room it has sockets in and to the broadcast channel. A heartbeat key
+    with a short TTL marks the worker as alive, so state left behind by a worker that was
+    killed without draining can be told apart. Without Redis everything stays local.
+    """
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.redis_client = None
+        self.rooms: Set[str] = set()
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._on_worker_message: Optional[Callable[[dict], Awaitable]] = None
+        self._on_room_message: Optional[Callable[[str, dict], Awaitable]] = None
+        # event kind -> handler for broadcasts from other workers
+        self._broadcast_handlers: Dict[str, Callable[[dict], Awaitable]] = {}
+
+    def set_redis(self, redis_client):
+        self.redis_client = redis_client
+
+    @property
+    def active(self) -> bool:
+        return self._pubsub is not None
+
+    @property
+    def worker_channel(self) -> str:
+        return f"{WORKER_CHANNEL_PREFIX}{self.worker_id}"
+
+    @staticmethod
+    def heartbeat_key(worker_id: str) -> str:
+        return f"{HEARTBEAT_KEY_PREFIX}{worker_id}"
+
+    @staticmethod
+    def room_channel(room_id: str) -> str:
+        return f"{ROOM_CHANNEL_PREFIX}{room_id}"
+
+    def on_broadcast(self, kind: str, handler: Callable[[dict], Awaitable]):
+        self._broadcast_handlers[kind] = handler
+
+    async def start(
+        self,
+        on_worker_message: Callable[[dict], Awaitable],
+        on_room_message: Callable[[str, dict], Awaitable],
+    ):
+        self._on_worker_message = on_worker_message
+        self._on_room_message = on_room_message
+        if not self.redis_client or self._task is not None:
+            return
+        self._pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.worker_channel, BROADCAST_CHANNEL)
+        # Alive before the first socket is accepted
+        await self._beat()
+        self._task = asyncio.create_task(self._run())
+        self._heartbeat_task = asyncio.create_task(self._run_heartbeat())
+        print(f"📡 [FANOUT] Worker {self.worker_id} listening for cross-worker messages")
+
+    async def stop(self):
+        for task in (self._task, self._heartbeat_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        if self._heartbeat_task is not None:
+            self._heartbeat_task = None
+            # Peers drop whatever this worker left behind right away instead of after the TTL
+            try:
+                await self.redis_client.delete(self.heartbeat_key(self.worker_id))
+            except Exception as e:
+                print(f"❌ [FANOUT] Failed to delete heartbeat: {e}")
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception as e:
+                print(f"❌ [FANOUT] Failed to close pub/sub connection: {e}")
+            self._pubsub = None
+        self.rooms.clear()
+
+    async def join_room(self, room_id: str):
+        """Receive room broadcasts from other workers, called when the first local socket joins"""
+        if self._pubsub is None or room_id in self.rooms:
+            return
+        self.rooms.add(room_id)
+        try:
+            await self._pubsub.subscribe(self.room_channel(room_id))
+        except Exception as e:
+            self.rooms.discard(room_id)
+            print(f"❌ [FANOUT] Failed to subscribe to room {room_id}: {e}")
+
+    async def leave_room(self, room_id: str):
+        if self._pubsub is None or room_id not in self.rooms:
+            return
+        self.rooms.discard(room_id)
+        try:
+            await self._pubsub.unsubscribe(self.room_channel(room_id))
+        except Exception as e:
+            print(f"❌ [FANOUT] Failed to unsubscribe from room {room_id}: {e}")
+
+    async def publish_room(self, room_id: str, event: dict):
+        """Hand a room event to the other workers with sockets in the room"""
+        if self._pubsub is None:
+            return
+        try:
+            await self.redis_client.publish(self.room_channel(room_id), dumps(dict(event, origin=self.worker_id)))
+        except Exception as e:
+            print(f"❌ [FANOUT] Failed to publish to room {room_id}: {e}")
+
+    async def publish_worker(self, worker_id: str, event: dict) -> bool:
+        """Hand an event to one worker, True if a worker was listening"""
+        if self._pubsub is None:
+            return False
+        try:
+            receivers = await self.redis_client.publish(f"{WORKER_CHANNEL_PREFIX}{worker_id}", dumps(event))
+            return receivers > 0
+        except Exception as e:
+            print(f"❌ [FANOUT] Failed to publish to worker {worker_id}: {e}")
+            return False
+
+    async def publish_broadcast(self, kind: str, event: dict):
+        """Hand an event to every other worker"""
+        if self._pubsub is None:
+            return
+        try:
+            await self.redis_client.publish(BROADCAST_CHANNEL, dumps(dict(event, kind=kind, origin=self.worker_id)))
+        except Exception as e:
+            print(f"❌ [FANOUT] Failed to broadcast {kind}: {e}")
+
+    async def live_workers(self, worker_ids: Iterable[str]) -> Set[str]:
+        """The given workers that still have a heartbeat, this worker always counts as alive"""
+        worker_ids = set(worker_ids)
+        others = [worker_id for worker_id in worker_ids if worker_id != self.worker_id]
+        if self._pubsub is None or not others:
+            return worker_ids
+        try:
+            beats = await self.redis_client.mget([self.heartbeat_key(worker_id) for worker_id in others])
+        except Exception as e:
+            # Keep everything rather than drop live peers on a failed read
+            print(f"❌ [FANOUT] Failed to read worker heartbeats: {e}")
+            return worker_ids
+        return (worker_ids - set(others)) | {worker_id for worker_id, beat in zip(others, beats) if beat}
+
+    async def _beat(self):
+        try:
+            await self.redis_client.set(self.heartbeat_key(self.worker_id), "1", ex=WORKER_HEARTBEAT_TTL)
+        except Exception as e:
+            print(f"❌ [FANOUT] Failed to refresh heartbeat: {e}")
+
+    async def _run_heartbeat(self):
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+            await self._beat()
+
+    async def _run(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message["type"] != "message":
+                    continue
+                channel = message["channel"]
+                event = loads(message["data"])
+                if channel == self.worker_channel:
+                    await self._on_worker_message(event)
+                elif channel.startswith(ROOM_CHANNEL_PREFIX) and event.get("origin") != self.worker_id:
+                    await self._on_room_message(channel[len(ROOM_CHANNEL_PREFIX):], event)
+                elif channel == BROADCAST_CHANNEL and event.get("origin") != self.worker_id:
+                    handler = self._broadcast_handlers.get(event.get("kind"))
+                    if handler is not None:
+                        await handler(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ [FANOUT] Failed to relay message: {e}")
+                await asyncio.sleep(1)
+
+# Global instance
+worker_fanout = WorkerFanout()
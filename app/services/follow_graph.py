@@ -0,0 +1,103 @@
+from database.connection import AsyncSessionLocal
+from database.models import Follow
+from services.fanout import worker_fanout
+from utils.adjacency import AdjacencyStore
+from sqlalchemy import select
+from typing import Dict, Iterable, List, Set
+import os
+
+# Users whose adjacency sets are kept per direction
+FOLLOW_GRAPH_MAX_USERS = int(os.getenv("FOLLOW_GRAPH_MAX_USERS", "50000"))
+# Seconds a loaded set is trusted, a backstop for invalidations from other workers that never arrived
+FOLLOW_GRAPH_TTL = float(os.getenv("FOLLOW_GRAPH_TTL", "60"))
+# Distinct user ids interned before the cache is reset
+FOLLOW_GRAPH_MAX_INTERNED = int(os.getenv("FOLLOW_GRAPH_MAX_INTERNED", "2000000"))
+# Followed ids inlined into a query's IN list, larger sets keep the follows subquery
+FOLLOW_GRAPH_MAX_INLINE_IDS = int(os.getenv("FOLLOW_GRAPH_MAX_INLINE_IDS", "1000"))
+
+# Broadcast kind other workers receive after a follow or unfollow
+FOLLOW_GRAPH_EVENT = "follow_graph"
+
+class FollowGraphCache:
+    """Read-through, write-through cache of who each user follows and is followed by.
+
+    Writes update this worker's sets and tell the other workers, through the fanout
+    broadcast channel, to drop theirs.
+    """
+
+    def __init__(
+        self,
+        max_users: int = FOLLOW_GRAPH_MAX_USERS,
+        ttl: float = FOLLOW_GRAPH_TTL,
+        max_interned: int = FOLLOW_GRAPH_MAX_INTERNED,
+    ):
+        self.following = AdjacencyStore(max_users, ttl, max_interned)
+        self.followers = AdjacencyStore(max_users, ttl, max_interned)
+        # Bumped by every invalidation from another worker
+        self._generation = 0
+
+    async def _load(self, store: AdjacencyStore, user_id: str, query) -> Set[int]:
+        neighbours = store.get(user_id)
+        if neighbours is None:
+            generation = self._generation
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(query)
+                neighbours = store.put(user_id, (str(row[0]) for row in result.all()))
+            if generation != self._generation:
+                # Another worker changed the graph mid-load, answer this call but do not keep the set
+                store.invalidate(user_id)
+        return neighbours
+
+    async def _following_set(self, user_id: str) -> Set[int]:
+        return await self._load(self.following, user_id, select(Follow.followingId).where(Follow.followerId == user_id))
+
+    async def _followers_set(self, user_id: str) -> Set[int]:
+        return await self._load(self.followers, user_id, select(Follow.followerId).where(Follow.followingId == user_id))
+
+    async def is_following(self, follower_id: str, following_id: str) -> bool:
+        return self.following.contains(await self._following_set(follower_id), following_id)
+
+    async def are_following(self, follower_id: str, user_ids: Iterable[str]) -> Dict[str, bool]:
+        """Batched membership check against one loaded set"""
+        neighbours = await self._following_set(follower_id)
+        return {user_id: self.following.contains(neighbours, user_id) for user_id in user_ids}
+
+    async def following_ids(self, follower_id: str) -> List[str]:
+        return self.following.names(await self._following_set(follower_id))
+
+    async def follower_ids(self, user_id: str) -> List[str]:
+        return self.followers.names(await self._followers_set(user_id))
+
+    async def is_followed_by(self, user_id: str, follower_id: str) -> bool:
+        return self.followers.contains(await self._followers_set(user_id), follower_id)
+
+    async def add_follows(self, follower_id: str, following_ids: List[str]):
+        for following_id in following_ids:
+            self.following.add(follower_id, following_id)
+            self.followers.add(following_id, follower_id)
+        await self._publish(follower_id, following_ids)
+
+    async def add_follow(self, follower_id: str, following_id: str):
+        await self.add_follows(follower_id, [following_id])
+
+    async def remove_follows(self, follower_id: str, following_ids: List[str]):
+        for following_id in following_ids:
+            self.following.discard(follower_id, following_id)
+            self.followers.discard(following_id, follower_id)
+        await self._publish(follower_id, following_ids)
+
+    async def remove_follow(self, follower_id: str, following_id: str):
+        await self.remove_follows(follower_id, [following_id])
+
+    async def _publish(self, follower_id: str, following_ids: List[str]):
+        await worker_fanout.publish_broadcast(FOLLOW_GRAPH_EVENT, {"follower_id": follower_id, "following_ids": following_ids})
+
+    async def apply_remote(self, event: dict):
+        """Drop the sets another worker changed, they are reloaded on next use"""
+        self._generation += 1
+        self.following.invalidate(event["follower_id"])
+        for following_id in event["following_ids"]:
+            self.followers.invalidate(following_id)
+
+# Global instance
+follow_graph = FollowGraphCache()
@@ -0,0 +1,121 @@
+from database.models import Tweet, User
+from utils.http_cache import version_store
+from utils.ttl_cache import TTLCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+import os
+
+# Tweet bodies and author profiles kept per worker
+TWEET_CACHE_SIZE = int(os.getenv("TWEET_CACHE_SIZE", "50000"))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "20000"))
+# Seconds an entry is kept, edited tweets are reloaded sooner through their edit counter
+HYDRATION_CACHE_TTL = float(os.getenv("HYDRATION_CACHE_TTL", "60"))
+# Seconds a tweet's edit counter is kept in Redis, must stay well above HYDRATION_CACHE_TTL
+TWEET_VERSION_TTL = int(os.getenv("TWEET_VERSION_TTL", str(24 * 3600)))
+
+def tweet_version_name(tweet_id: str) -> str:
+    """Counter bumped on every edit of a tweet, cached bodies are stamped with its value"""
+    return f"tweet:{tweet_id}"
+
+class TweetHydrator:
+    """Turns tweet ids into tweet and author dicts with one multi-get per cache.
+
+    Cached tweets carry the edit counter they were loaded at. Each hydrate reads the
+    counters of its page in one MGET and reloads entries edited since, including edits
+    made on other workers, so a body never trails the ETag it is served with.
+    """
+
+    def __init__(
+        self,
+        tweet_cache_size: int = TWEET_CACHE_SIZE,
+        profile_cache_size: int = PROFILE_CACHE_SIZE,
+        ttl: float = HYDRATION_CACHE_TTL,
+    ):
+        self.tweets = TTLCache(tweet_cache_size, ttl)
+        self.profiles = TTLCache(profile_cache_size, ttl)
+
+    async def hydrate(self, db: AsyncSession, tweet_ids: List[str]) -> List[Dict]:
+        """Tweets in the given order, each with its author profile under "user"; missing ids are dropped.
+
+        Cache misses are loaded on the caller's session, so a listing holds one pool connection.
+        """
+        stamps = await self._stamps(tweet_ids)
+        tweets = {}
+        for tweet_id, (stamp, tweet) in self.tweets.get_many(tweet_ids).items():
+            if stamps is None or stamp == stamps[tweet_id] or (stamp is None and stamps[tweet_id][1] == "0"):
+                tweets[tweet_id] = tweet
+        missing_tweets = [tweet_id for tweet_id in tweet_ids if tweet_id not in tweets]
+
+        if missing_tweets:
+            result = await db.execute(
+                select(Tweet.id, Tweet.text, Tweet.isPrivate, Tweet.createdAt, Tweet.userId)
+                .where(Tweet.id.in_(missing_tweets))
+            )
+            loaded = {
+                str(row.id): {
+                    "id": str(row.id),
+                    "text": row.text,
+                    "isPrivate": row.isPrivate,
+                    "createdAt": row.createdAt,
+                    "userId": str(row.userId)
+                }
+                for row in result.all()
+            }
+            # Stamped with the counters read before the load, an edit racing the load forces a reload
+            self.tweets.set_many({
+                tweet_id: (stamps[tweet_id] if stamps else None, tweet) for tweet_id, tweet in loaded.items()
+            })
+            tweets.update(loaded)
+
+        author_ids = list({tweet["userId"] for tweet in tweets.values()})
+        profiles = self.profiles.get_many(author_ids)
+        missing_profiles = [user_id for user_id in author_ids if user_id not in profiles]
+
+        if missing_profiles:
+            result = await db.execute(
+                select(User.id, User.username, User.fullName, User.email)
+                .where(User.id.in_(missing_profiles))
+            )
+            loaded = {
+                str(row.id): {
+                    "id": str(row.id),
+                    "email": row.email,
+                    "username": row.username,
+                    "fullName": row.fullName
+                }
+                for row in result.all()
+            }
+            self.profiles.set_many(loaded)
+            profiles.update(loaded)
+
+        return [
+            dict(tweets[tweet_id], user=profiles.get(tweets[tweet_id]["userId"]))
+            for tweet_id in tweet_ids
+            if tweet_id in tweets
+        ]
+
+    @staticmethod
+    async def _stamps(tweet_ids: List[str]) -> Optional[Dict[str, tuple]]:
+        """(version epoch, edit counter) per tweet, None without Redis"""
+        if not tweet_ids:
+            return {}
+        versions = await version_store.current([tweet_version_name(tweet_id) for tweet_id in tweet_ids])
+        if versions is None:
+            return None
+        return {tweet_id: (versions[0], value) for tweet_id, value in zip(tweet_ids, versions[1:])}
+
+    def store_tweet(self, tweet: Dict):
+        """Prime the caches from a new tweet that already returned the full row.
+
+        Unstamped, the entry is served while the tweet has never been edited.
+        """
+        self.tweets.set(tweet["id"], (None, {key: value for key, value in tweet.items() if key != "user"}))
+        if tweet.get("user"):
+            self.profiles.set(tweet["user"]["id"], tweet["user"])
+
+    def invalidate_tweet(self, tweet_id: str):
+        self.tweets.delete(tweet_id)
+
+# Global instance
+tweet_hydrator = TweetHydrator()
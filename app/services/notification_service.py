@@ -1,11 +1,24 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, insert
 from database.models import Notification, User
+from utils.http_cache import version_store
 from typing import List, Optional
 import uuid
 from datetime import datetime
 
 class NotificationService:
+    @staticmethod
+    def to_dict(notification: Notification) -> dict:
+        """Shape of NotificationResponse, built directly for the fast JSON encoder"""
+        return {
+            "id": notification.id,
+            "user_id": notification.user_id,
+            "title": notification.title,
+            "message": notification.message,
+            "is_read": notification.is_read,
+            "created_at": notification.created_at
+        }
+
     @staticmethod
     async def create_notification(
         db: AsyncSession,
@@ -20,9 +33,32 @@ class NotificationService:
         )
         db.add(notification)
         await db.commit()
+        await version_store.bump(f"notifications:{user_id}")
         await db.refresh(notification)
         return notification
 
+    @staticmethod
+    async def create_notifications(
+        db: AsyncSession,
+        user_ids: List[str],
+        message: str,
+        title: Optional[str] = None
+    ) -> int:
+        """Insert the same notification for many users in one statement"""
+        if not user_ids:
+            return 0
+        now = datetime.utcnow()
+        await db.execute(
+            insert(Notification),
+            [
+                {"id": uuid.uuid4(), "user_id": uuid.UUID(user_id), "message": message, "title": title, "is_read": False, "created_at": now}
+                for user_id in user_ids
+            ]
+        )
+        await db.commit()
+        await version_store.bump(*[f"notifications:{user_id}" for user_id in user_ids])
+        return len(user_ids)
+
     @staticmethod
     async def get_unread_notifications(db: AsyncSession, user_id: str) -> List[Notification]:
         result = await db.execute(
@@ -51,6 +87,7 @@ class NotificationService:
             .values(is_read=True)
         )
         await db.commit()
+        await version_store.bump(f"notifications:{user_id}")
         return result.rowcount
 
     @staticmethod
@@ -83,4 +120,5 @@ class NotificationService:
             .where(Notification.user_id == uuid.UUID(user_id))
         )
         await db.commit()
+        await version_store.bump(f"notifications:{user_id}")
         return result.rowcount
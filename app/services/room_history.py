@@ -0,0 +1,248 @@
+from collections import OrderedDict, deque
+from utils.serialization import dumps, loads
+from typing import Deque, Dict, List, Optional
+import asyncio
+import os
+
+# Number of chat messages kept in memory per room
+ROOM_CHAT_HISTORY_SIZE = int(os.getenv("ROOM_CHAT_HISTORY_SIZE", "100"))
+# Number of chat messages replayed in the `connected` frame
+ROOM_CHAT_REPLAY_SIZE = int(os.getenv("ROOM_CHAT_REPLAY_SIZE", "50"))
+# Upper bound on rooms with an in-memory buffer (least recently used is evicted)
+ROOM_CHAT_MAX_ROOMS = int(os.getenv("ROOM_CHAT_MAX_ROOMS", "1000"))
+# Number of chat messages kept in the Redis stream per room
+ROOM_CHAT_STREAM_SIZE = int(os.getenv("ROOM_CHAT_STREAM_SIZE", "1000"))
+# Seconds an idle room stream is kept in Redis
+ROOM_CHAT_STREAM_TTL = int(os.getenv("ROOM_CHAT_STREAM_TTL", str(24 * 3600)))
+# Longest chat message stored, longer messages are truncated
+ROOM_CHAT_MAX_MESSAGE_LENGTH = int(os.getenv("ROOM_CHAT_MAX_MESSAGE_LENGTH", "2000"))
+
+class RoomChatBuffer:
+    """Fixed-size ring buffer of chat messages for a single room"""
+
+    __slots__ = ("messages", "last_seq", "loaded", "loading")
+
+    def __init__(self, capacity: int):
+        self.messages: Deque[dict] = deque(maxlen=capacity)
+        self.last_seq = 0
+        self.loaded = False
+        # Load from Redis in progress, every caller arriving meanwhile awaits the same one
+        self.loading: Optional[asyncio.Future] = None
+
+    def append(self, message: dict) -> dict:
+        self.last_seq += 1
+        entry = dict(message, seq=self.last_seq)
+        self.messages.append(entry)
+        return entry
+
+    def recent(self, limit: int) -> List[dict]:
+        if limit <= 0:
+            return []
+        if limit >= len(self.messages):
+            return list(self.messages)
+        start = len(self.messages) - limit
+        return [self.messages[i] for i in range(start, len(self.messages))]
+
+    def add(self, entry: dict):
+        """Insert an entry that already has a seq, e.g. one written by another worker"""
+        seq = entry["seq"]
+        if not self.messages or seq > self.last_seq:
+            self.messages.append(entry)
+            self.last_seq = seq
+            return
+        if seq < self.messages[0]["seq"] and len(self.messages) == self.messages.maxlen:
+            return
+        # Late arrival from another worker, rarely more than a few places from the end
+        position = len(self.messages)
+        while position > 0 and self.messages[position - 1]["seq"] > seq:
+            position -= 1
+        if position > 0 and self.messages[position - 1]["seq"] == seq:
+            return
+        if len(self.messages) == self.messages.maxlen:
+            self.messages.popleft()
+            position -= 1
+        self.messages.insert(position, entry)
+
+    def before(self, before_seq: int, limit: int) -> List[dict]:
+        """Messages older than before_seq, oldest first"""
+        if not self.messages or limit <= 0:
+            return []
+        # Sequence numbers can have gaps when several workers write to the room
+        end = len(self.messages)
+        while end > 0 and self.messages[end - 1]["seq"] >= before_seq:
+            end -= 1
+        start = max(0, end - limit)
+        return [self.messages[i] for i in range(start, end)]
+
+    @property
+    def oldest_seq(self) -> Optional[int]:
+        return self.messages[0]["seq"] if self.messages else None
+
+# Allocates the next seq of a room and stores the message under it in one step, so workers
+# sharing a room never reuse a seq. A missing counter restarts after the stream's last entry.
+APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[2])
+if seq == 1 then
+    local last = redis.call('XREVRANGE', KEYS[1], '+', '-', 'COUNT', 1)
+    if last[1] then
+        seq = tonumber(string.match(last[1][1], '^(%d+)')) + 1
+        redis.call('SET', KEYS[2], seq)
+    end
+end
+redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[2], seq .. '-0', 'payload', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return seq
+"""
+
+def _stream_entry(entry_id: str, fields: dict) -> dict:
+    """Chat message from a stream entry, its seq is the entry id"""
+    entry = loads(fields["payload"])
+    entry["seq"] = int(entry_id.split("-", 1)[0])
+    return entry
+
+class RoomHistoryManager:
+    """Bounded per-room chat history with optional Redis stream persistence"""
+
+    def __init__(
+        self,
+        capacity: int = ROOM_CHAT_HISTORY_SIZE,
+        max_rooms: int = ROOM_CHAT_MAX_ROOMS,
+        stream_size: int = ROOM_CHAT_STREAM_SIZE,
+        stream_ttl: int = ROOM_CHAT_STREAM_TTL,
+    ):
+        self.capacity = capacity
+        self.max_rooms = max_rooms
+        self.stream_size = stream_size
+        self.stream_ttl = stream_ttl
+        self.buffers: "OrderedDict[str, RoomChatBuffer]" = OrderedDict()
+        self.redis_client = None
+        self._append_script = None
+
+    def set_redis(self, redis_client):
+        self.redis_client = redis_client
+        self._append_script = redis_client.register_script(APPEND_SCRIPT) if redis_client else None
+
+    @staticmethod
+    def stream_key(room_id: str) -> str:
+        return f"room:{room_id}:chat"
+
+    @staticmethod
+    def seq_key(room_id: str) -> str:
+        return f"room:{room_id}:chat:seq"
+
+    def _get_buffer(self, room_id: str) -> RoomChatBuffer:
+        buffer = self.buffers.get(room_id)
+        if buffer is None:
+            buffer = RoomChatBuffer(self.capacity)
+            self.buffers[room_id] = buffer
+            while len(self.buffers) > self.max_rooms:
+                self.buffers.popitem(last=False)
+        else:
+            self.buffers.move_to_end(room_id)
+        return buffer
+
+    async def _load_from_redis(self, room_id: str, buffer: RoomChatBuffer):
+        """Seed an empty buffer from the Redis stream after a restart or eviction"""
+        try:
+            if not self.redis_client or buffer.messages:
+                return
+            try:
+                entries = await self.redis_client.xrevrange(self.stream_key(room_id), count=self.capacity)
+            except Exception as e:
+                print(f"❌ [HISTORY] Failed to load chat history for room {room_id}: {e}")
+                return
+            for entry_id, fields in reversed(entries):
+                buffer.add(_stream_entry(entry_id, fields))
+        finally:
+            buffer.loaded = True
+            buffer.loading = None
+
+    async def _ensure_loaded(self, room_id: str, buffer: RoomChatBuffer):
+        if buffer.loaded:
+            return
+        if buffer.loading is None:
+            buffer.loading = asyncio.ensure_future(self._load_from_redis(room_id, buffer))
+        # A joiner that disconnects mid-load must not cancel the load for the others
+        await asyncio.shield(buffer.loading)
+
+    async def append(self, room_id: str, message: dict) -> dict:
+        """Store a chat message and return it with its sequence number, raises ValueError if Redis fails"""
+        buffer = self._get_buffer(room_id)
+        await self._ensure_loaded(room_id, buffer)
+
+        text = message.get("message")
+        if isinstance(text, str) and len(text) > ROOM_CHAT_MAX_MESSAGE_LENGTH:
+            message = dict(message, message=text[:ROOM_CHAT_MAX_MESSAGE_LENGTH])
+
+        if self._append_script is None:
+            # Single worker without Redis, the buffer is the only source of seqs
+            return buffer.append(message)
+
+        try:
+            seq = await self._append_script(
+                keys=[self.stream_key(room_id), self.seq_key(room_id)],
+                args=[dumps(message), self.stream_size, self.stream_ttl],
+            )
+        except Exception as e:
+            # A seq minted here could collide with one another worker gets from Redis
+            print(f"❌ [HISTORY] Failed to persist chat message for room {room_id}: {e}")
+            raise ValueError(f"Failed to store chat message: {str(e)}")
+        entry = dict(message, seq=int(seq))
+        buffer.add(entry)
+        return entry
+
+    def ingest(self, room_id: str, entry: dict):
+        """Add a message another worker stored, if this worker has the room's history loaded"""
+        buffer = self.buffers.get(room_id)
+        # During a load too, add() drops the entry if the stream read returns it again
+        if buffer is not None and (buffer.loaded or buffer.loading is not None):
+            buffer.add(entry)
+
+    def evict(self, room_id: str):
+        """Drop the local buffer only, it is reloaded from Redis if the room is used again here"""
+        self.buffers.pop(room_id, None)
+
+    async def recent(self, room_id: str, limit: int = ROOM_CHAT_REPLAY_SIZE) -> List[dict]:
+        """Last `limit` messages of a room, oldest first"""
+        buffer = self._get_buffer(room_id)
+        await self._ensure_loaded(room_id, buffer)
+        return buffer.recent(min(limit, self.capacity))
+
+    async def page(self, room_id: str, before_seq: int, limit: int = ROOM_CHAT_REPLAY_SIZE) -> Dict:
+        """Messages older than before_seq, oldest first, with a cursor for the next page"""
+        limit = max(1, min(limit, self.capacity))
+        buffer = self._get_buffer(room_id)
+        await self._ensure_loaded(room_id, buffer)
+
+        messages = buffer.before(before_seq, limit)
+        oldest_in_memory = buffer.oldest_seq
+
+        # Fall back to the Redis stream once the page reaches past the ring buffer
+        if len(messages) < limit and self.redis_client and (oldest_in_memory is None or oldest_in_memory > 1):
+            cutoff = min(before_seq, oldest_in_memory) if oldest_in_memory is not None else before_seq
+            try:
+                entries = await self.redis_client.xrevrange(
+                    self.stream_key(room_id),
+                    max=f"({cutoff}-0",
+                    min="-",
+                    count=limit - len(messages),
+                )
+                older = [_stream_entry(entry_id, fields) for entry_id, fields in reversed(entries)]
+                messages = older + messages
+            except Exception as e:
+                print(f"❌ [HISTORY] Failed to read chat history for room {room_id}: {e}")
+
+        next_before = messages[0]["seq"] if messages and messages[0]["seq"] > 1 else None
+        return {"messages": messages, "next_before": next_before}
+
+    async def clear(self, room_id: str):
+        self.buffers.pop(room_id, None)
+        if self.redis_client:
+            try:
+                await self.redis_client.delete(self.stream_key(room_id), self.seq_key(room_id))
+            except Exception as e:
+                print(f"❌ [HISTORY] Failed to delete chat history for room {room_id}: {e}")
+
+# Global instance
+room_history_manager = RoomHistoryManager()
@@ -0,0 +1,271 @@
+from database.connection import AsyncSessionLocal
+from database.models import Room, Participant
+from services.room_history import room_history_manager
+from services.fanout import worker_fanout
+from sqlalchemy import select, update, delete
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import os
+import time
+
+# Seconds a live room may go without connections before it is closed
+ROOM_IDLE_TIMEOUT = int(os.getenv("ROOM_IDLE_TIMEOUT", "900"))
+# Seconds between lifecycle sweeps
+ROOM_SWEEP_INTERVAL = int(os.getenv("ROOM_SWEEP_INTERVAL", "60"))
+# Rooms inspected per query while sweeping
+ROOM_SWEEP_BATCH_SIZE = int(os.getenv("ROOM_SWEEP_BATCH_SIZE", "500"))
+
+# Removes user_id -> worker_id pairs from a room's members, skipping users that have since
+# joined again through another worker. ARGV holds user_id, worker_id pairs.
+REMOVE_MEMBERS_SCRIPT = """
+local removed = 0
+for i = 1, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        removed = removed + redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+return removed
+"""
+
+class RoomLifecycleManager:
+    """Background task that closes live rooms nobody is connected to"""
+
+    def __init__(
+        self,
+        idle_timeout: int = ROOM_IDLE_TIMEOUT,
+        sweep_interval: int = ROOM_SWEEP_INTERVAL,
+        batch_size: int = ROOM_SWEEP_BATCH_SIZE,
+    ):
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.batch_size = batch_size
+        # room_id -> last time this worker saw the room with connections
+        self.last_seen: Dict[str, float] = {}
+        self.redis_client = None
+        self.get_active_room_ids: Callable[[], Iterable[str]] = lambda: ()
+        self._task: Optional[asyncio.Task] = None
+        self._remove_members_script = None
+
+    def set_redis(self, redis_client):
+        self.redis_client = redis_client
+        self._remove_members_script = redis_client.register_script(REMOVE_MEMBERS_SCRIPT) if redis_client else None
+
+    @staticmethod
+    def presence_key(room_id: str) -> str:
+        return f"room:{room_id}:presence"
+
+    @staticmethod
+    def members_key(room_id: str) -> str:
+        return f"room:{room_id}:members"
+
+    async def join(self, room_id: str, user_id: str, worker_id: str):
+        """Record which worker holds a user's room socket, so every worker sees the full member list"""
+        if self.redis_client:
+            try:
+                key = self.members_key(room_id)
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.hset(key, user_id, worker_id)
+                    pipe.expire(key, self.idle_timeout * 2)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"❌ [LIFECYCLE] Failed to store member {user_id} of room {room_id}: {e}")
+
+    async def leave(self, room_id: str, user_id: str, worker_id: str):
+        if self.redis_client:
+            try:
+                # Only remove the entry if a newer connection on another worker has not replaced it
+                await self._remove_members(room_id, [(user_id, worker_id)])
+            except Exception as e:
+                print(f"❌ [LIFECYCLE] Failed to remove member {user_id} of room {room_id}: {e}")
+
+    async def _remove_members(self, room_id: str, members: List[Tuple[str, str]]):
+        args = [value for member in members for value in member]
+        await self._remove_members_script(keys=[self.members_key(room_id)], args=args)
+
+    async def _live_members(self, rooms: Dict[str, Dict[str, str]]) -> Dict[str, List[str]]:
+        """Member ids per room whose worker is alive, entries of dead workers are removed.
+
+        A worker killed without draining never calls `leave`, and peers keep refreshing the
+        members key's TTL, so its entries would otherwise stay for as long as the room is used.
+        """
+        live_workers = await worker_fanout.live_workers(
+            worker_id for members in rooms.values() for worker_id in members.values()
+        )
+        live = {}
+        for room_id, members in rooms.items():
+            live[room_id] = [user_id for user_id, worker_id in members.items() if worker_id in live_workers]
+            dead = [(user_id, worker_id) for user_id, worker_id in members.items() if worker_id not in live_workers]
+            if dead:
+                try:
+                    await self._remove_members(room_id, dead)
+                except Exception as e:
+                    print(f"❌ [LIFECYCLE] Failed to remove stale members of room {room_id}: {e}")
+        return live
+
+    async def is_member(self, room_id: str, user_id: str) -> bool:
+        if not self.redis_client:
+            return False
+        try:
+            worker_id = await self.redis_client.hget(self.members_key(room_id), user_id)
+        except Exception as e:
+            print(f"❌ [LIFECYCLE] Failed to look up member {user_id} of room {room_id}: {e}")
+            return False
+        if worker_id is None:
+            return False
+        live = await self._live_members({room_id: {user_id: worker_id}})
+        return bool(live[room_id])
+
+    async def member_ids(self, room_id: str, local_ids: Iterable[str]) -> List[str]:
+        """Users connected to the room on any live worker, falling back to this worker's sockets"""
+        member_ids = list(local_ids)
+        if self.redis_client:
+            try:
+                members = await self.redis_client.hgetall(self.members_key(room_id))
+            except Exception as e:
+                print(f"❌ [LIFECYCLE] Failed to read members of room {room_id}: {e}")
+                return member_ids
+            live = await self._live_members({room_id: members})
+            seen = set(member_ids)
+            member_ids.extend(user_id for user_id in live[room_id] if user_id not in seen)
+        return member_ids
+
+    async def member_counts(self, local_counts: Dict[str, int]) -> Dict[str, int]:
+        """Connected users per room across live workers, falling back to this worker's counts"""
+        if not self.redis_client or not local_counts:
+            return local_counts
+        room_ids = list(local_counts)
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for room_id in room_ids:
+                    pipe.hgetall(self.members_key(room_id))
+                members = await pipe.execute()
+        except Exception as e:
+            print(f"❌ [LIFECYCLE] Failed to count room members: {e}")
+            return local_counts
+        live = await self._live_members(dict(zip(room_ids, members)))
+        return {room_id: max(len(live[room_id]), local_counts[room_id]) for room_id in room_ids}
+
+    async def touch(self, room_id: str):
+        """Record that the room had activity, shared across workers through Redis"""
+        now = time.time()
+        self.last_seen[room_id] = now
+        if self.redis_client:
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.set(self.presence_key(room_id), str(now), ex=self.idle_timeout * 2)
+                    # The member list lives as long as the room is active
+                    pipe.expire(self.members_key(room_id), self.idle_timeout * 2)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"❌ [LIFECYCLE] Failed to store presence for room {room_id}: {e}")
+
+    def start(self, get_active_room_ids: Callable[[], Iterable[str]]):
+        self.get_active_room_ids = get_active_room_ids
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"🕒 [LIFECYCLE] Room lifecycle manager started (idle timeout {self.idle_timeout}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                closed = await self.sweep()
+                if closed:
+                    print(f"🧹 [LIFECYCLE] Closed {closed} idle rooms")
+            except Exception as e:
+                print(f"❌ [LIFECYCLE] Room sweep failed: {e}")
+
+    async def _remote_last_seen(self, room_ids: List[str]) -> Dict[str, float]:
+        if not self.redis_client or not room_ids:
+            return {}
+        try:
+            values = await self.redis_client.mget([self.presence_key(room_id) for room_id in room_ids])
+        except Exception as e:
+            print(f"❌ [LIFECYCLE] Failed to read room presence: {e}")
+            return {}
+        return {room_id: float(value) for room_id, value in zip(room_ids, values) if value}
+
+    async def sweep(self) -> int:
+        """Mark idle live rooms as not live and purge their presence state"""
+        now = time.time()
+
+        # Rooms with connections on this worker are active by definition
+        local_rooms = set(self.get_active_room_ids())
+        for room_id in local_rooms:
+            await self.touch(room_id)
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.idle_timeout)
+        closed_total = 0
+        last_id = None
+
+        async with AsyncSessionLocal() as db:
+            while True:
+                query = (
+                    select(Room.id)
+                    .where(Room.is_live == True, Room.created_at < cutoff)
+                    .order_by(Room.id)
+                    .limit(self.batch_size)
+                )
+                if last_id is not None:
+                    query = query.where(Room.id > last_id)
+                result = await db.execute(query)
+                candidate_ids = [row[0] for row in result.fetchall()]
+                if not candidate_ids:
+                    break
+                last_id = candidate_ids[-1]
+
+                candidates = [str(room_id) for room_id in candidate_ids if str(room_id) not in local_rooms]
+                remote_seen = await self._remote_last_seen(candidates)
+
+                idle_ids = []
+                for room_id in candidates:
+                    seen = max(self.last_seen.get(room_id, 0.0), remote_seen.get(room_id, 0.0))
+                    if now - seen >= self.idle_timeout:
+                        idle_ids.append(room_id)
+
+                if idle_ids:
+                    await db.execute(
+                        update(Room)
+                        .where(Room.id.in_(idle_ids), Room.is_live == True)
+                        .values(is_live=False)
+                    )
+                    await db.execute(delete(Participant).where(Participant.room_id.in_(idle_ids)))
+                    await db.commit()
+                    await self._purge(idle_ids)
+                    closed_total += len(idle_ids)
+
+                if len(candidate_ids) < self.batch_size:
+                    break
+
+        # Forget rooms that have been quiet long enough to be closed anyway
+        stale_before = now - self.idle_timeout * 2
+        for room_id in [r for r, seen in self.last_seen.items() if seen < stale_before and r not in local_rooms]:
+            del self.last_seen[room_id]
+
+        return closed_total
+
+    async def _purge(self, room_ids: List[str]):
+        for room_id in room_ids:
+            self.last_seen.pop(room_id, None)
+            await room_history_manager.clear(room_id)
+        if self.redis_client:
+            try:
+                await self.redis_client.delete(
+                    *[self.presence_key(room_id) for room_id in room_ids],
+                    *[self.members_key(room_id) for room_id in room_ids]
+                )
+            except Exception as e:
+                print(f"❌ [LIFECYCLE] Failed to delete room presence: {e}")
+
+# Global instance
+room_lifecycle_manager = RoomLifecycleManager()
@@ -1,136 +1,189 @@
 from database.connection import AsyncSessionLocal
-from database.models import Tweet, User
+from database.models import Tweet, User, Follow
+from services.follow_graph import follow_graph, FOLLOW_GRAPH_MAX_INLINE_IDS
+from services.hydration import tweet_hydrator, tweet_version_name, TWEET_VERSION_TTL
+from utils.http_cache import version_store
 from utils.security_middleware import sanitize_string
 from typing import Dict, Optional, List
-from sqlalchemy import select, func, and_, or_, update, delete
-from sqlalchemy.orm import selectinload
+import uuid
+from sqlalchemy import select, func, and_, or_, insert, update, delete, tuple_, literal
+from utils.pagination import encode_cursor_value, decode_cursor_value
+
+# Columns every tweet write returns, so callers never reload the row
+TWEET_RETURNING = (Tweet.id, Tweet.text, Tweet.isPrivate, Tweet.createdAt, Tweet.userId)
 
 class TweetService:
     @staticmethod
-    async def create_tweet(user_id: str, text: str, is_private: bool) -> Dict:
+    def _tweet_response(row, author: Dict) -> Dict:
+        return {
+            "id": str(row.id),
+            "text": row.text,
+            "isPrivate": row.isPrivate,
+            "createdAt": row.createdAt,
+            "userId": str(row.userId),
+            "user": {
+                "id": author["id"],
+                "email": author["email"],
+                "username": author["username"],
+                "fullName": author["fullName"]
+            }
+        }
+
+    @staticmethod
+    def _public_tweet(tweet: Dict) -> Dict:
+        """Listing shape for other people's tweets, without the author's email"""
+        return {
+            "id": tweet["id"],
+            "text": tweet["text"],
+            "createdAt": tweet["createdAt"],
+            "isPrivate": tweet["isPrivate"],
+            "user": {
+                "id": tweet["user"]["id"],
+                "fullName": tweet["user"]["fullName"],
+                "username": tweet["user"]["username"]
+            } if tweet["user"] else None
+        }
+
+    @staticmethod
+    def _followed_by(current_user_id: str):
+        """Subquery of the ids the current user follows, for private-tweet visibility"""
+        return select(Follow.followingId).where(Follow.followerId == current_user_id)
+
+    @staticmethod
+    async def _by_followed_author(current_user_id: str):
+        """Tweet.userId IN the authors the current user follows, from the follow graph cache"""
+        following_ids = await follow_graph.following_ids(current_user_id)
+        if len(following_ids) > FOLLOW_GRAPH_MAX_INLINE_IDS:
+            return Tweet.userId.in_(TweetService._followed_by(current_user_id))
+        return Tweet.userId.in_(following_ids)
+
+    @staticmethod
+    async def _bump_listings(author_id: str, public: bool, private: bool):
+        """New ETags for the listings a tweet write shows up in.
+
+        Public tweets are on every timeline. Private ones only reach the author's followers,
+        whose timeline counters are bumped one by one unless there are too many of them.
+        """
+        names = [f"user-tweets:{author_id}"]
+        if private:
+            follower_ids = await follow_graph.follower_ids(author_id)
+            if len(follower_ids) > FOLLOW_GRAPH_MAX_INLINE_IDS:
+                public = True
+            else:
+                names.extend(f"timeline:{follower_id}" for follower_id in follower_ids)
+        if public:
+            names.append("public-tweets")
+        await version_store.bump(*names)
+
+    @staticmethod
+    async def _ownership_error(db, tweet_id: str, action: str) -> ValueError:
+        """Explain why a write matched no rows, only runs on the failure path"""
+        result = await db.execute(select(Tweet.id).where(Tweet.id == tweet_id))
+        if result.scalar_one_or_none() is None:
+            return ValueError("Tweet not found")
+        return ValueError(f"You can only {action} your own tweets")
+
+    @staticmethod
+    async def create_tweet(user: Dict, text: str, is_private: bool) -> Dict:
+        """Insert a tweet in one round trip, the author block comes from the request's user"""
         async with AsyncSessionLocal() as db:
             try:
                 # Sanitize tweet text
                 sanitized_text = sanitize_string(text)
-                
-                # Create tweet
-                tweet = Tweet(
-                    text=sanitized_text,
-                    isPrivate=is_private,
-                    userId=user_id
-                )
-                db.add(tweet)
-                await db.commit()
-                await db.refresh(tweet)
-                
-                # Load user relationship
+
                 result = await db.execute(
-                    select(Tweet).options(selectinload(Tweet.user)).where(Tweet.id == tweet.id)
+                    insert(Tweet)
+                    .values(text=sanitized_text, isPrivate=is_private, userId=user["id"])
+                    .returning(*TWEET_RETURNING)
                 )
-                tweet_with_user = result.scalar_one()
-                
-                return {
-                    "id": str(tweet_with_user.id),
-                    "text": tweet_with_user.text,
-                    "isPrivate": tweet_with_user.isPrivate,
-                    "createdAt": tweet_with_user.createdAt,
-                    "userId": str(tweet_with_user.userId),
-                    "user": {
-                        "id": str(tweet_with_user.user.id),
-                        "email": tweet_with_user.user.email,
-                        "username": tweet_with_user.user.username,
-                        "fullName": tweet_with_user.user.fullName
-                    } if tweet_with_user.user else None
-                }
-                
+                row = result.one()
+                await db.commit()
+
+                tweet = TweetService._tweet_response(row, user)
+                tweet_hydrator.store_tweet(tweet)
+                await TweetService._bump_listings(user["id"], public=not row.isPrivate, private=bool(row.isPrivate))
+                return tweet
+
             except Exception as e:
                 await db.rollback()
                 raise ValueError(f"Failed to create tweet: {str(e)}")
-        
+
     @staticmethod
-    async def update_tweet(tweet_id: str, user_id: str, text: Optional[str] = None, is_private: Optional[bool] = None) -> Dict:
+    async def update_tweet(tweet_id: str, user: Dict, text: Optional[str] = None, is_private: Optional[bool] = None) -> Dict:
+        """Update a tweet with the ownership check in the WHERE clause"""
         async with AsyncSessionLocal() as db:
             try:
-                # Check if tweet exists and belongs to user
-                result = await db.execute(select(Tweet).where(Tweet.id == tweet_id))
-                existing_tweet = result.scalar_one_or_none()
-                
-                if not existing_tweet:
-                    raise ValueError("Tweet not found")
-                    
-                if str(existing_tweet.userId) != user_id:
-                    raise ValueError("You can only update your own tweets")
-                
                 # Prepare update data
                 update_data = {}
                 if text is not None:
                     update_data["text"] = sanitize_string(text)
                 if is_private is not None:
                     update_data["isPrivate"] = is_private
-                
-                # Update tweet using SQLAlchemy update
+
+                owned = and_(Tweet.id == tweet_id, Tweet.userId == user["id"])
                 if update_data:
-                    await db.execute(
+                    result = await db.execute(
                         update(Tweet)
-                        .where(Tweet.id == tweet_id)
+                        .where(owned)
                         .values(**update_data)
+                        .returning(*TWEET_RETURNING)
                     )
-                    await db.commit()
-                
-                # Load updated tweet with user relationship
-                result = await db.execute(
-                    select(Tweet).options(selectinload(Tweet.user)).where(Tweet.id == tweet_id)
+                else:
+                    result = await db.execute(select(*TWEET_RETURNING).where(owned))
+                row = result.one_or_none()
+
+                if row is None:
+                    raise await TweetService._ownership_error(db, tweet_id, "update")
+
+                await db.commit()
+
+                tweet = TweetService._tweet_response(row, user)
+                # The edit counter goes first, a listing built for the new ETags then reloads the body on every worker
+                tweet_hydrator.invalidate_tweet(tweet["id"])
+                await version_store.bump(tweet_version_name(tweet["id"]), ttl=TWEET_VERSION_TTL)
+                # A privacy change moves the tweet between both kinds of listing
+                changed_privacy = is_private is not None
+                await TweetService._bump_listings(
+                    user["id"],
+                    public=changed_privacy or not row.isPrivate,
+                    private=changed_privacy or bool(row.isPrivate)
                 )
-                updated_tweet = result.scalar_one()
-                
-                return {
-                    "id": str(updated_tweet.id),
-                    "text": updated_tweet.text,
-                    "isPrivate": updated_tweet.isPrivate,
-                    "createdAt": updated_tweet.createdAt,
-                    "userId": str(updated_tweet.userId),
-                    "user": {
-                        "id": str(updated_tweet.user.id),
-                        "email": updated_tweet.user.email,
-                        "username": updated_tweet.user.username,
-                        "fullName": updated_tweet.user.fullName
-                    } if updated_tweet.user else None
-                }
-                
+                return tweet
+
             except ValueError as e:
+                await db.rollback()
                 raise ValueError(str(e))
             except Exception as e:
                 await db.rollback()
                 raise ValueError(f"Failed to update tweet: {str(e)}")
-    
+
     @staticmethod
     async def delete_tweet(tweet_id: str, user_id: str) -> Dict:
+        """Delete a tweet with the ownership check in the WHERE clause"""
         async with AsyncSessionLocal() as db:
             try:
-                # Check if tweet exists and belongs to user
-                result = await db.execute(select(Tweet).where(Tweet.id == tweet_id))
-                existing_tweet = result.scalar_one_or_none()
-                
-                if not existing_tweet:
-                    raise ValueError("Tweet not found")
-                    
-                if str(existing_tweet.userId) != user_id:
-                    raise ValueError("You can only delete your own tweets")
-                
-                # Delete tweet using SQLAlchemy delete
-                await db.execute(
-                    delete(Tweet).where(Tweet.id == tweet_id)
+                result = await db.execute(
+                    delete(Tweet)
+                    .where(Tweet.id == tweet_id, Tweet.userId == user_id)
+                    .returning(Tweet.id, Tweet.isPrivate)
                 )
+                row = result.one_or_none()
+                if row is None:
+                    raise await TweetService._ownership_error(db, tweet_id, "delete")
+
                 await db.commit()
-                
+                tweet_hydrator.invalidate_tweet(tweet_id)
+                await TweetService._bump_listings(user_id, public=not row.isPrivate, private=bool(row.isPrivate))
+
                 return {"message": "Tweet deleted successfully"}
-                
+
             except ValueError as e:
+                await db.rollback()
                 raise ValueError(str(e))
             except Exception as e:
                 await db.rollback()
                 raise ValueError(f"Failed to delete tweet: {str(e)}")
-    
+
     @staticmethod
     async def get_user_tweets(user_id: str, page_number: int = 1, page_size: int = 10) -> Dict:
         async with AsyncSessionLocal() as db:
@@ -138,31 +191,18 @@ class TweetService:
                 # Calculate skip for pagination
                 skip = (page_number - 1) * page_size
                 
-                # Get user tweets with pagination, ordered by creation date (newest first)
+                # Get user tweet ids with pagination, ordered by creation date (newest first)
                 result = await db.execute(
-                    select(Tweet)
-                    .options(selectinload(Tweet.user))
+                    select(Tweet.id)
                     .where(Tweet.userId == user_id)
                     .order_by(Tweet.createdAt.desc())
                     .offset(skip)
                     .limit(page_size)
                 )
-                tweets_raw = result.scalars().all()
-                
-                # Convert to dict format
-                tweets = [{
-                    "id": str(tweet.id),
-                    "text": tweet.text,
-                    "isPrivate": tweet.isPrivate,
-                    "createdAt": tweet.createdAt,
-                    "userId": str(tweet.userId),
-                    "user": {
-                        "id": str(tweet.user.id),
-                        "email": tweet.user.email,
-                        "username": tweet.user.username,
-                        "fullName": tweet.user.fullName
-                    } if tweet.user else None
-                } for tweet in tweets_raw]
+                tweet_ids = [str(row[0]) for row in result.all()]
+
+                # Bodies and authors come from the hydration cache
+                tweets = await tweet_hydrator.hydrate(db, tweet_ids)
                 
                 # Get total count for pagination
                 count_result = await db.execute(
@@ -186,8 +226,6 @@ class TweetService:
     async def get_timeline_tweets(current_user_id: str, page_number: int = 1, page_size: int = 10) -> Dict:
         async with AsyncSessionLocal() as db:
             try:
-                from database.models import Follow
-                
                 # Calculate skip for pagination
                 skip = (page_number - 1) * page_size
                 
@@ -202,37 +240,22 @@ class TweetService:
                     and_(
                         Tweet.isPrivate == True,
                         Tweet.userId != current_user_id,
-                        Tweet.userId.in_(
-                            select(Follow.followingId).where(Follow.followerId == current_user_id)
-                        )
+                        await TweetService._by_followed_author(current_user_id)
                     )
                 )
                 
-                # Get tweets with user details
+                # Get timeline tweet ids, bodies and authors come from the hydration cache
                 result = await db.execute(
-                    select(Tweet)
-                    .options(selectinload(Tweet.user))
+                    select(Tweet.id)
                     .where(where_condition)
                     .order_by(Tweet.createdAt.desc())
                     .offset(skip)
                     .limit(page_size)
                 )
-                tweets_raw = result.scalars().all()
-
-                tweets = [
-                    {
-                        "id": str(tweet.id),
-                        "text": tweet.text,
-                        "createdAt": tweet.createdAt,
-                        "isPrivate": tweet.isPrivate,
-                        "user": {
-                            "id": str(tweet.user.id),
-                            "fullName": tweet.user.fullName,
-                            "username": tweet.user.username
-                        } if tweet.user else None
-                    }
-                    for tweet in tweets_raw
-                ]
+                tweet_ids = [str(row[0]) for row in result.all()]
+                hydrated = await tweet_hydrator.hydrate(db, tweet_ids)
+
+                tweets = [TweetService._public_tweet(tweet) for tweet in hydrated]
                             
                 # Get total count for pagination
                 count_result = await db.execute(
@@ -250,4 +273,58 @@ class TweetService:
                 }
                 
             except Exception as e:
-                raise ValueError(f"Failed to fetch timeline tweets: {str(e)}")
\ No newline at end of file
+                raise ValueError(f"Failed to fetch timeline tweets: {str(e)}")
+
+    @staticmethod
+    async def search_tweets(current_user_id: str, query: str, cursor: Optional[str] = None, limit: int = 20) -> Dict:
+        """Ranked full-text search over tweets the current user is allowed to see"""
+        async with AsyncSessionLocal() as db:
+            try:
+                ts_query = func.websearch_to_tsquery("english", query)
+                rank = func.ts_rank_cd(Tweet.search_vector, ts_query)
+
+                # Same visibility as the timeline, plus the user's own tweets
+                visible = or_(
+                    Tweet.isPrivate == False,
+                    Tweet.userId == current_user_id,
+                    await TweetService._by_followed_author(current_user_id)
+                )
+
+                statement = (
+                    select(Tweet.id, rank.label("rank"))
+                    .where(Tweet.search_vector.op("@@")(ts_query), visible)
+                    .order_by(rank.desc(), Tweet.id.desc())
+                    .limit(limit + 1)
+                )
+                if cursor:
+                    cursor_rank, cursor_id = TweetService._decode_search_cursor(cursor)
+                    statement = statement.where(tuple_(rank, Tweet.id) < tuple_(literal(cursor_rank), literal(cursor_id)))
+
+                result = await db.execute(statement)
+                rows = result.all()
+
+                has_more = len(rows) > limit
+                rows = rows[:limit]
+                hydrated = await tweet_hydrator.hydrate(db, [str(row.id) for row in rows])
+                tweets = [TweetService._public_tweet(tweet) for tweet in hydrated]
+                next_cursor = TweetService._encode_search_cursor(rows[-1].rank, rows[-1].id) if has_more else None
+
+                return {"tweets": tweets, "next_cursor": next_cursor}
+
+            except ValueError as e:
+                raise ValueError(str(e))
+            except Exception as e:
+                raise ValueError(f"Failed to search tweets: {str(e)}")
+
+    @staticmethod
+    def _encode_search_cursor(rank: float, tweet_id) -> str:
+        return encode_cursor_value(f"{rank!r}|{tweet_id}")
+
+    @staticmethod
+    def _decode_search_cursor(cursor: str):
+        try:
+            rank, tweet_id = decode_cursor_value(cursor).split("|", 1)
+            return float(rank), uuid.UUID(tweet_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+
@@ -0,0 +1,88 @@
+from database.connection import AsyncSessionLocal
+from database.models import User
+from utils.prefix_index import PrefixIndex
+from sqlalchemy import select, func, or_
+from typing import Dict, List
+import asyncio
+import os
+import time
+
+# Seconds before the autocomplete index is fully reloaded, picks up users registered on other workers
+AUTOCOMPLETE_RELOAD_INTERVAL = int(os.getenv("AUTOCOMPLETE_RELOAD_INTERVAL", "600"))
+
+class UserSearchService:
+    """Substring search through pg_trgm and in-process prefix autocomplete"""
+
+    def __init__(self, reload_interval: int = AUTOCOMPLETE_RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self.index = PrefixIndex()
+        self.loaded_at = 0.0
+        self._loading = None
+
+    async def _load(self):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(User.id, User.username, User.fullName))
+            rows = [(str(row.id), row.username, row.fullName) for row in result.all()]
+        index = PrefixIndex()
+        index.load(rows)
+        # Swap in one assignment so concurrent readers never see a half-built index
+        self.index = index
+        self.loaded_at = time.monotonic()
+        print(f"🔎 [SEARCH] Loaded autocomplete index with {len(index)} users")
+
+    async def _ensure_loaded(self):
+        """Load lazily on first use, later reloads run in the background"""
+        if self.loaded_at == 0.0:
+            if self._loading is None:
+                self._loading = asyncio.ensure_future(self._load())
+            # Kept locally, another caller awaiting the same load may already have cleared self._loading
+            task = self._loading
+            try:
+                await asyncio.shield(task)
+            finally:
+                if task.done() and self._loading is task:
+                    self._loading = None
+        elif time.monotonic() - self.loaded_at > self.reload_interval and self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+            self._loading.add_done_callback(lambda _: setattr(self, "_loading", None))
+
+    def add_user(self, user_id: str, username: str, full_name: str):
+        """Incremental update on registration, skipped until the index is first loaded"""
+        if self.loaded_at:
+            self.index.add(user_id, username, full_name)
+
+    async def autocomplete(self, prefix: str, limit: int = 10) -> List[Dict]:
+        await self._ensure_loaded()
+        index = self.index
+        return [{
+            "id": user_id,
+            "username": index.profiles[user_id][0],
+            "fullName": index.profiles[user_id][1]
+        } for user_id in index.search(prefix, limit)]
+
+    @staticmethod
+    async def search(query: str, limit: int = 20) -> List[Dict]:
+        """Substring match on username or full name, most similar first"""
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        similarity = func.greatest(func.similarity(User.username, query), func.similarity(User.fullName, query))
+
+        async with AsyncSessionLocal() as db:
+            try:
+                # The ILIKE is answered by the gin_trgm_ops indexes on username and fullName
+                result = await db.execute(
+                    select(User.id, User.username, User.fullName)
+                    .where(or_(User.username.ilike(pattern), User.fullName.ilike(pattern)))
+                    .order_by(similarity.desc(), User.username)
+                    .limit(limit)
+                )
+                return [{
+                    "id": str(row.id),
+                    "username": row.username,
+                    "fullName": row.fullName
+                } for row in result.all()]
+            except Exception as e:
+                raise ValueError(f"Failed to search users: {str(e)}")
+
+# Global instance
+user_search_service = UserSearchService()
@@ -5,23 +5,24 @@ import re
 from database.connection import AsyncSessionLocal
 from database.models import User
 from services.auth_service import AuthService
-from worker import celery, print_otp_to_console
-import redis
-import os
+from services.websocket_manager import websocket_manager
 from sqlalchemy import select, update
 from typing import Optional
 
-# Connect to Redis
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "redis"),
-    port=int(os.getenv("REDIS_PORT", 6379)),
-    db=0,
-    decode_responses=True
-)
-
 # OTP TTL in seconds (5 minutes)
 OTP_TTL = 300
 
+def _redis():
+    """The app's shared async Redis client, connected during startup"""
+    if websocket_manager.redis_client is None:
+        raise ValueError("OTP service is unavailable, please try again later")
+    return websocket_manager.redis_client
+
+def _celery():
+    """The Celery app, imported on first use since building it dominates this module's import time"""
+    from worker import celery
+    return celery
+
 class UserService:
     @staticmethod
     def generate_otp(length=6):
@@ -31,8 +32,9 @@ class UserService:
     async def generate_and_send_otp(user_id: str):
         """Generate OTP, store in Redis, and schedule a task to send it via email"""
         # Check if OTP was sent recently
+        redis_client = _redis()
         history_key = f"otp-sent-history:{user_id}"
-        if redis_client.exists(history_key):
+        if await redis_client.exists(history_key):
             raise ValueError("Please wait a bit longer before requesting another OTP.")
 
         # Fetch user email from the database
@@ -47,11 +49,12 @@ class UserService:
 
         # Store OTP in Redis with TTL
         redis_key = f"password_reset_otp:{user_id}"
-        redis_client.set(redis_key, otp, ex=OTP_TTL)
+        await redis_client.set(redis_key, otp, ex=OTP_TTL)
 
-        celery.send_task('worker.send_otp_email', args=[user_email, otp])
+        # Dropped by the worker once the OTP has expired, e.g. when Redis redelivers it after a worker crash
+        _celery().send_task('worker.send_otp_email', args=[user_email, otp], expires=OTP_TTL)
 
-        redis_client.set(history_key, "sent", ex=50)
+        await redis_client.set(history_key, "sent", ex=50)
 
         return {"success": True}
 
@@ -72,8 +75,9 @@ class UserService:
     async def verify_otp_and_change_password(user_id: str, otp: str, new_password: str):
         """Verify OTP and change user password if valid"""
 
+        redis_client = _redis()
         redis_key = f"password_reset_otp:{user_id}"
-        stored_otp = redis_client.get(redis_key)
+        stored_otp = await redis_client.get(redis_key)
 
         if not stored_otp or stored_otp != otp:
             raise ValueError("Invalid or expired OTP")
@@ -107,7 +111,7 @@ class UserService:
                 await db.commit()
 
                 # Delete the OTP from Redis
-                redis_client.delete(redis_key)
+                await redis_client.delete(redis_key)
 
                 return {"success": True}
             except Exception as e:
@@ -1,31 +1,49 @@
 from fastapi import WebSocket
-import redis.asyncio as redis
-import json
+from utils.ws_transport import negotiate_codec, send_frame
+from utils.readiness import wait_until_ready
+from utils.metrics import TimedRedis
+from services.fanout import worker_fanout
+import asyncio
 import uuid
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import os
 
+# Seconds startup waits for Redis, the app runs without it (no presence, history or caches) after that
+REDIS_STARTUP_TIMEOUT = float(os.getenv("REDIS_STARTUP_TIMEOUT", "15"))
+
 class WebSocketManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
         self.redis_client = None
 
-    async def init_redis(self):
+    async def init_redis(self, timeout: float = REDIS_STARTUP_TIMEOUT):
+        """Connect to Redis, waiting up to `timeout` seconds for it at startup (0 tries once)"""
         try:
             redis_host = os.getenv("REDIS_HOST", "localhost")
             redis_port = os.getenv("REDIS_PORT", "6379")
             redis_url = os.getenv("REDIS_URL", f"redis://{redis_host}:{redis_port}")
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
-            await self.redis_client.ping()
+            # Every command is timed, this client is shared by all services
+            self.redis_client = TimedRedis.from_url(redis_url, decode_responses=True)
+            await wait_until_ready("Redis", self.redis_client.ping, timeout=timeout)
             print(f"Redis connected successfully at {redis_url}")
         except Exception as e:
             print(f"Redis connection failed: {e}")
             self.redis_client = None
 
+    async def close_redis(self):
+        if self.redis_client is not None:
+            try:
+                await self.redis_client.aclose()
+            except Exception as e:
+                print(f"❌ [WEBSOCKET] Failed to close Redis client: {e}")
+            self.redis_client = None
+
     async def connect(self, websocket: WebSocket, user_id: str) -> str:
         print(f"🔌 [WEBSOCKET] Accepting WebSocket connection for user {user_id}")
-        await websocket.accept()
-        connection_id = str(uuid.uuid4())
+        # Frame codec (JSON text or MessagePack binary) is chosen from the offered subprotocols
+        await websocket.accept(subprotocol=negotiate_codec(websocket))
+        # Prefixed with the worker id so any worker can tell which process holds the socket
+        connection_id = f"{worker_fanout.worker_id}:{uuid.uuid4()}"
         print(f"🆔 [WEBSOCKET] Generated connection_id: {connection_id}")
 
         # Store connection in memory
@@ -57,8 +75,10 @@ class WebSocketManager:
         # Remove from Redis
         if self.redis_client:
             try:
-                result = await self.redis_client.delete(f"user:{user_id}")
-                print(f"✅ [WEBSOCKET] Removed user mapping from Redis. Keys deleted: {result}")
+                # Keep the mapping if the user has reconnected since, possibly through another worker
+                if await self.redis_client.get(f"user:{user_id}") == connection_id:
+                    result = await self.redis_client.delete(f"user:{user_id}")
+                    print(f"✅ [WEBSOCKET] Removed user mapping from Redis. Keys deleted: {result}")
             except Exception as e:
                 print(f"❌ [WEBSOCKET] Failed to remove user connection from Redis: {e}")
         else:
@@ -68,7 +88,7 @@ class WebSocketManager:
         if connection_id in self.active_connections:
             websocket = self.active_connections[connection_id]
             try:
-                await websocket.send_text(json.dumps(message))
+                await send_frame(websocket, message)
                 print("Notification sent : ", message)
                 return True
             except Exception as e:
@@ -88,6 +108,11 @@ class WebSocketManager:
             # Get connection_id for user from Redis
             connection_id = await self.redis_client.get(f"user:{user_id}")
             print(f"🔑 [WEBSOCKET] Found connection_id: {connection_id}")
+            if connection_id and connection_id not in self.active_connections:
+                # The socket is held by another worker, hand the message over
+                owner = self.connection_owner(connection_id)
+                print(f"📤 [WEBSOCKET] Relaying message via worker {owner}")
+                return await worker_fanout.publish_worker(owner, {"connection_id": connection_id, "message": message})
             if connection_id:
                 print(f"📤 [WEBSOCKET] Sending message via connection {connection_id}")
                 result = await self.send_message(connection_id, message)
@@ -99,6 +124,30 @@ class WebSocketManager:
             print(f"❌ [WEBSOCKET] Failed to get user connection from Redis: {e}")
         return False
 
+    async def send_message_to_users(self, user_ids: List[str], message: dict) -> int:
+        """Push one message to many users with a single Redis lookup, returns how many were reached"""
+        if not self.redis_client or not user_ids:
+            return 0
+        try:
+            connection_ids = await self.redis_client.mget([f"user:{user_id}" for user_id in user_ids])
+        except Exception as e:
+            print(f"❌ [WEBSOCKET] Failed to get user connections from Redis: {e}")
+            return 0
+
+        sends = []
+        for connection_id in connection_ids:
+            if not connection_id:
+                continue
+            if connection_id in self.active_connections:
+                sends.append(self.send_message(connection_id, message))
+            elif self.connection_owner(connection_id) != worker_fanout.worker_id:
+                # The socket is held by another worker, hand the message over
+                sends.append(worker_fanout.publish_worker(
+                    self.connection_owner(connection_id), {"connection_id": connection_id, "message": message}
+                ))
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        return sum(1 for result in results if result is True)
+
     async def is_user_connected(self, user_id: str) -> bool:
         print(f"🔍 [WEBSOCKET] Checking if user {user_id} is connected")
         debug_info = await self.debug_user_connection(user_id)
@@ -110,6 +159,10 @@ class WebSocketManager:
         try:
             connection_id = await self.redis_client.get(f"user:{user_id}")
             is_connected = connection_id is not None and connection_id in self.active_connections
+            if connection_id is not None and not is_connected and worker_fanout.active:
+                # Held by another worker, which may have died without cleaning up its mappings
+                owner = self.connection_owner(connection_id)
+                is_connected = owner != worker_fanout.worker_id and owner in await worker_fanout.live_workers([owner])
             print(f"📡 [WEBSOCKET] User {user_id} connection status: connection_id={connection_id}, is_connected={is_connected}")
             return is_connected
         except Exception as e:
@@ -118,6 +171,28 @@ class WebSocketManager:
 
     async def get_connection_count(self) -> int:
         return len(self.active_connections)
+
+    @staticmethod
+    def connection_owner(connection_id: str) -> str:
+        return connection_id.split(":", 1)[0]
+
+    async def relay_worker_event(self, event: dict):
+        """Deliver a message another worker routed to a socket held here"""
+        await self.send_message(event["connection_id"], event["message"])
+
+    async def drain(self):
+        """Graceful shutdown: close notification sockets with 1012 so clients reconnect to another worker"""
+        connections = list(self.active_connections.values())
+
+        async def close(websocket: WebSocket):
+            try:
+                await websocket.close(code=1012)
+            except Exception:
+                pass
+
+        await asyncio.gather(*(close(websocket) for websocket in connections))
+        if connections:
+            print(f"🔌 [SHUTDOWN] Closed {len(connections)} notification connections")
     
     async def debug_user_connection(self, user_id: str) -> dict:
         """Debug method to check user connection status in both memory and Redis"""
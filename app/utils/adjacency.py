@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+import time
+
+class AdjacencyStore:
+    """Bounded LRU of adjacency sets keyed by user id.
+
+    User ids are interned to small ints, so every set holding the same user shares
+    one int object and a set slot is the only per-edge cost.
+    """
+
+    def __init__(self, max_users: int, ttl: float, max_interned: int):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.max_interned = max_interned
+        self._ids: Dict[str, int] = {}
+        # index -> user id, the reverse of _ids
+        self._names: List[str] = []
+        # user index -> (expires_at, neighbour indexes)
+        self._sets: "OrderedDict[int, tuple]" = OrderedDict()
+
+    def intern(self, user_id: str) -> int:
+        index = self._ids.get(user_id)
+        if index is None:
+            index = len(self._ids)
+            self._ids[user_id] = index
+            self._names.append(user_id)
+        return index
+
+    def get(self, user_id: str) -> Optional[Set[int]]:
+        index = self._ids.get(user_id)
+        if index is None:
+            return None
+        entry = self._sets.get(index)
+        if entry is None:
+            return None
+        expires_at, neighbours = entry
+        if expires_at < time.monotonic():
+            del self._sets[index]
+            return None
+        self._sets.move_to_end(index)
+        return neighbours
+
+    def put(self, user_id: str, neighbour_ids: Iterable[str]) -> Set[int]:
+        neighbour_ids = list(neighbour_ids)
+        if len(self._ids) + len(neighbour_ids) + 1 > self.max_interned:
+            # Indexes are only meaningful together with the sets built from them, so reset both
+            self._ids.clear()
+            self._names.clear()
+            self._sets.clear()
+        neighbours = {self.intern(neighbour_id) for neighbour_id in neighbour_ids}
+        self._sets[self.intern(user_id)] = (time.monotonic() + self.ttl, neighbours)
+        while len(self._sets) > self.max_users:
+            self._sets.popitem(last=False)
+        return neighbours
+
+    def add(self, user_id: str, neighbour_id: str):
+        """Write-through edge insert, only for sets that are already cached"""
+        neighbours = self.get(user_id)
+        if neighbours is not None:
+            neighbours.add(self.intern(neighbour_id))
+
+    def discard(self, user_id: str, neighbour_id: str):
+        neighbours = self.get(user_id)
+        index = self._ids.get(neighbour_id)
+        if neighbours is not None and index is not None:
+            neighbours.discard(index)
+
+    def contains(self, neighbours: Set[int], neighbour_id: str) -> bool:
+        index = self._ids.get(neighbour_id)
+        return index is not None and index in neighbours
+
+    def names(self, neighbours: Set[int]) -> List[str]:
+        return [self._names[index] for index in neighbours]
+
+    def invalidate(self, user_id: str):
+        index = self._ids.get(user_id)
+        if index is not None:
+            self._sets.pop(index, None)
+
+    def __len__(self) -> int:
+        return len(self._sets)
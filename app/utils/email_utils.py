@@ -1,43 +1,201 @@
-
+from utils.serialization import dumps
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 import http.client
-import json
 import os
+import random
+import threading
+import time
 
 BREVO_API_KEY = os.getenv("BREVO_API_KEY")
 BREVO_SENDER_EMAIL = os.getenv("BREVO_SENDER_EMAIL")
 BREVO_SENDER_NAME = os.getenv("BREVO_SENDER_NAME", "Bitweet - Connect and build networks")
+# Point at a local fake server in tests and benchmarks, e.g. http://127.0.0.1:8025
+BREVO_API_URL = os.getenv("BREVO_API_URL", "https://api.brevo.com")
+# Seconds to connect and to wait for each response
+EMAIL_TIMEOUT = float(os.getenv("EMAIL_TIMEOUT", "10"))
+# Attempts after the first for connection errors, 429 and 5xx responses
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+# First and longest pause between retries, the pause doubles in between
+EMAIL_RETRY_INITIAL_DELAY = float(os.getenv("EMAIL_RETRY_INITIAL_DELAY", "0.5"))
+EMAIL_RETRY_MAX_DELAY = float(os.getenv("EMAIL_RETRY_MAX_DELAY", "8"))
+# Recipients per API call when sending a batch, Brevo accepts up to 1000 message versions
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "500"))
+# Seconds between throughput log lines per worker process
+EMAIL_METRICS_LOG_INTERVAL = float(os.getenv("EMAIL_METRICS_LOG_INTERVAL", "60"))
 
-def send_brevo_email(to_email: str, subject: str, html_content: str):
-    conn = http.client.HTTPSConnection("api.brevo.com")
-
-    payload = {
-        "sender": {"name": BREVO_SENDER_NAME, "email": BREVO_SENDER_EMAIL},
-        "to": [{"email": to_email}],
-        "subject": subject,
-        "htmlContent": html_content,
-    }
-
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "api-key": BREVO_API_KEY,
-    }
-
-    try:
-        conn.request("POST", "/v3/smtp/email", json.dumps(payload), headers)
-        res = conn.getresponse()
-        data = res.read()
-
-        if 200 <= res.status < 300:
-            print("data : ", data.decode("utf-8"))
-            print(f"Email sent successfully to {to_email}")
-            return True
-        else:
-            print(f"Failed to send email. Status: {res.status}")
-            print(data.decode("utf-8"))
-            return False
-    except Exception as e:
-        print(f"An error occurred while sending email: {e}")
+SEND_PATH = "/v3/smtp/email"
+
+class EmailMetrics:
+    """Delivery counters for this process, emails per second is the throughput of one worker"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started_at = time.monotonic()
+        self.logged_at = self.started_at
+        self.sent = 0
+        self.failed = 0
+        self.api_calls = 0
+        self.retries = 0
+        self.send_seconds = 0.0
+
+    def snapshot(self) -> Dict:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "pid": os.getpid(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "api_calls": self.api_calls,
+            "retries": self.retries,
+            "emails_per_second": round(self.sent / elapsed, 2),
+            "avg_call_ms": round(self.send_seconds / self.api_calls * 1000, 2) if self.api_calls else 0.0,
+        }
+
+    def maybe_log(self):
+        now = time.monotonic()
+        if now - self.logged_at >= EMAIL_METRICS_LOG_INTERVAL:
+            self.logged_at = now
+            stats = self.snapshot()
+            print(
+                f"📧 [EMAIL] Worker {stats['pid']}: {stats['sent']} sent, {stats['failed']} failed, "
+                f"{stats['emails_per_second']}/s, {stats['api_calls']} calls, {stats['retries']} retries"
+            )
+
+class BrevoClient:
+    """Brevo transactional email client that keeps one connection alive per process.
+
+    Every Celery task used to pay a TCP and TLS handshake. Requests are serialized on the
+    connection, which matches a prefork worker running one task at a time.
+    """
+
+    def __init__(
+        self,
+        api_url: str = BREVO_API_URL,
+        api_key: Optional[str] = BREVO_API_KEY,
+        timeout: float = EMAIL_TIMEOUT,
+        max_retries: int = EMAIL_MAX_RETRIES,
+        batch_size: int = EMAIL_BATCH_SIZE,
+    ):
+        url = urlsplit(api_url)
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.batch_size = batch_size
+        self.headers = {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "api-key": api_key or "",
+        }
+        self.metrics = EmailMetrics()
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        # A connection inherited through fork is shared with the parent, never reuse it
+        if self._conn is None or self._pid != os.getpid():
+            connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            self._conn = connection_class(self.host, self.port, timeout=self.timeout)
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _post(self, body: bytes) -> Tuple[int, bytes]:
+        """One request on the kept-alive connection, reconnecting once if the server dropped it while idle"""
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", SEND_PATH, body, self.headers)
+                res = conn.getresponse()
+                data = res.read()
+                if res.will_close:
+                    self.close()
+                return res.status, data
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if attempt:
+                    raise
+            except Exception:
+                self.close()
+                raise
+
+    def _send(self, payload: Dict, recipients: int) -> bool:
+        # Bytes let http.client send headers and body in one packet, a str body goes out
+        # separately and stalls each kept-alive request on Nagle and delayed ACKs
+        body = dumps(payload).encode("utf-8")
+        delay = EMAIL_RETRY_INITIAL_DELAY
+        with self._lock:
+            for attempt in range(self.max_retries + 1):
+                started = time.monotonic()
+                try:
+                    status, data = self._post(body)
+                    error = f"status {status}: {data.decode('utf-8', 'replace')[:200]}"
+                except Exception as e:
+                    status, error = None, str(e)
+                self.metrics.api_calls += 1
+                self.metrics.send_seconds += time.monotonic() - started
+
+                if status is not None and 200 <= status < 300:
+                    self.metrics.sent += recipients
+                    self.metrics.maybe_log()
+                    return True
+                # Other 4xx responses (bad address, bad key) fail the same way on every attempt
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt == self.max_retries:
+                    print(f"❌ [EMAIL] Failed to send email to {recipients} recipient(s): {error}")
+                    break
+                self.metrics.retries += 1
+                print(f"⏳ [EMAIL] Send failed (attempt {attempt + 1}), retrying: {error}")
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, EMAIL_RETRY_MAX_DELAY)
+
+        self.metrics.failed += recipients
+        self.metrics.maybe_log()
         return False
-    finally:
-        conn.close()
+
+    @staticmethod
+    def _sender() -> Dict:
+        return {"name": BREVO_SENDER_NAME, "email": BREVO_SENDER_EMAIL}
+
+    def send(self, to_email: str, subject: str, html_content: str) -> bool:
+        return self._send({
+            "sender": self._sender(),
+            "to": [{"email": to_email}],
+            "subject": subject,
+            "htmlContent": html_content,
+        }, 1)
+
+    def send_batch(self, subject: str, html_content: str, recipients: List[Tuple[str, Dict]]) -> int:
+        """Send one template to many recipients, `batch_size` per API call.
+
+        `html_content` may reference each recipient's params as {{ params.name }}.
+        Returns how many recipients were accepted.
+        """
+        accepted = 0
+        for start in range(0, len(recipients), self.batch_size):
+            chunk = recipients[start:start + self.batch_size]
+            payload = {
+                "sender": self._sender(),
+                "subject": subject,
+                "htmlContent": html_content,
+                "messageVersions": [
+                    {"to": [{"email": email}], "params": params} for email, params in chunk
+                ],
+            }
+            if self._send(payload, len(chunk)):
+                accepted += len(chunk)
+        return accepted
+
+# Global instance
+brevo_client = BrevoClient()
+
+def send_brevo_email(to_email: str, subject: str, html_content: str):
+    return brevo_client.send(to_email, subject, html_content)
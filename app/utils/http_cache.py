@@ -0,0 +1,91 @@
+from fastapi import Request, Response
+from utils.responses import FastJSONResponse
+from typing import Any, Awaitable, Callable, List, Optional
+import hashlib
+import uuid
+
+# Per-user data: browsers may store it but must revalidate every time
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+VARY = "Cookie, Authorization"
+
+class VersionStore:
+    """Change counters in Redis that stand in for the content of per-user listings"""
+
+    EPOCH_KEY = "ver:epoch"
+
+    def __init__(self):
+        self.redis_client = None
+
+    def set_redis(self, redis_client):
+        self.redis_client = redis_client
+
+    @staticmethod
+    def key(name: str) -> str:
+        return f"ver:{name}"
+
+    async def bump(self, *names: str, ttl: Optional[int] = None):
+        """Invalidate every ETag derived from these counters.
+
+        `ttl` is only safe for counters whose readers forget older values sooner, a counter
+        that expires restarts at 0 and would match again.
+        """
+        if not self.redis_client or not names:
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for name in names:
+                    pipe.incr(self.key(name))
+                    if ttl:
+                        pipe.expire(self.key(name), ttl)
+                await pipe.execute()
+        except Exception as e:
+            print(f"❌ [HTTP CACHE] Failed to bump versions {names}: {e}")
+
+    async def current(self, names: List[str]) -> Optional[List[str]]:
+        """Counter values prefixed by the store epoch, or None when versions are unavailable"""
+        if not self.redis_client:
+            return None
+        try:
+            values = await self.redis_client.mget([self.EPOCH_KEY] + [self.key(name) for name in names])
+            if values[0] is None:
+                # A new epoch after a Redis flush keeps reset counters from reusing old ETags
+                await self.redis_client.set(self.EPOCH_KEY, uuid.uuid4().hex, nx=True)
+                values[0] = await self.redis_client.get(self.EPOCH_KEY)
+        except Exception as e:
+            print(f"❌ [HTTP CACHE] Failed to read versions {names}: {e}")
+            return None
+        return [value or "0" for value in values]
+
+# Global instance
+version_store = VersionStore()
+
+def _etag(scope: str, versions: List[str]) -> str:
+    digest = hashlib.blake2b(f"{scope}|{'|'.join(versions)}".encode("utf-8"), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+async def conditional_response(
+    request: Request,
+    scope: str,
+    version_names: List[str],
+    build: Callable[[], Awaitable[Any]],
+) -> Response:
+    """Answer with 304 when the client's ETag still matches, otherwise build and tag the body.
+
+    `scope` must identify everything the body depends on besides the versions: route, user and query.
+    """
+    versions = await version_store.current(version_names)
+    if versions is None:
+        return FastJSONResponse(content=await build(), headers={"Cache-Control": PRIVATE_CACHE_CONTROL, "Vary": VARY})
+
+    etag = _etag(scope, versions)
+    headers = {"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL, "Vary": VARY}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return FastJSONResponse(content=await build(), headers=headers)
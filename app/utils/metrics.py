@@ -0,0 +1,377 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from utils.query_audit import current_query_audit
+from utils.serialization import dumps, loads
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import os
+import time
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+
+# Seconds between pushes of this worker's metrics to Redis, where /metrics merges all workers
+METRICS_PUSH_INTERVAL = float(os.getenv("METRICS_PUSH_INTERVAL", "5"))
+# Workers that have not pushed for this many seconds are left out of /metrics
+METRICS_STALE_AFTER = float(os.getenv("METRICS_STALE_AFTER", "30"))
+
+METRICS_WORKERS_KEY = "metrics:workers"
+
+# Deletes the given workers' snapshots if they are still older than ARGV[1], a worker that
+# pushed again since they were read keeps its fresh one
+PRUNE_WORKERS_SCRIPT = """
+local removed = 0
+for i = 2, #ARGV do
+    local payload = redis.call('HGET', KEYS[1], ARGV[i])
+    if payload and cjson.decode(payload)['at'] < tonumber(ARGV[1]) then
+        removed = removed + redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+return removed
+"""
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Label values joined into one string key, so series survive a JSON round trip
+LABEL_SEPARATOR = "\x1f"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _format_labels(names: Tuple[str, ...], key: str, extra: str = "") -> str:
+    values = key.split(LABEL_SEPARATOR) if names else []
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series: Dict[str, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        key = LABEL_SEPARATOR.join(label_values)
+        self.series[key] = self.series.get(key, 0) + amount
+
+    def export(self) -> Dict:
+        return self.series
+
+    @staticmethod
+    def merge(into: Dict, series: Dict):
+        for key, value in series.items():
+            into[key] = into.get(key, 0) + value
+
+    def render(self, series: Dict) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in series.items()]
+
+class Gauge(Counter):
+    """Values read from `collect` when metrics are exported, summed across workers.
+
+    kind="counter" exposes totals another module already keeps.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Dict[Tuple[str, ...], float]],
+        labels: Tuple[str, ...] = (),
+        kind: str = "gauge",
+    ):
+        super().__init__(name, help, labels)
+        self.collect = collect
+        self.kind = kind
+
+    def export(self) -> Dict:
+        try:
+            return {LABEL_SEPARATOR.join(labels): value for labels, value in self.collect().items()}
+        except Exception as e:
+            print(f"❌ [METRICS] Failed to collect {self.name}: {e}")
+            return {}
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label key -> per-bucket counts (the last one is +Inf), then sum, then count
+        self.series: Dict[str, List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        key = LABEL_SEPARATOR.join(label_values)
+        counts = self.series.get(key)
+        if counts is None:
+            counts = self.series[key] = [0] * (len(self.buckets) + 3)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def export(self) -> Dict:
+        return self.series
+
+    @staticmethod
+    def merge(into: Dict, series: Dict):
+        for key, counts in series.items():
+            current = into.get(key)
+            into[key] = list(counts) if current is None else [a + b for a, b in zip(current, counts)]
+
+    def render(self, series: Dict) -> List[str]:
+        lines = []
+        bounds = [_format_value(bucket) for bucket in self.buckets] + ["+Inf"]
+        for key, counts in series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = 'le="' + bound + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(counts[-1])}")
+        return lines
+
+class MetricsRegistry:
+    """In-process metrics in Prometheus text format.
+
+    Each worker process keeps its own series and pushes them to Redis every
+    METRICS_PUSH_INTERVAL, so /metrics on any worker reports the sum over all of them.
+
+    A worker that stops, or has not pushed for METRICS_STALE_AFTER, leaves the sum and its
+    snapshot is deleted. Summed counters then go down, which Prometheus handles like a
+    process restart: it is read as a counter reset, so rate() and increase() briefly
+    overstate traffic around a worker stop, crash or restart.
+    """
+
+    def __init__(self, push_interval: float = METRICS_PUSH_INTERVAL, stale_after: float = METRICS_STALE_AFTER):
+        self.metrics: Dict[str, object] = {}
+        self.push_interval = push_interval
+        self.stale_after = stale_after
+        self.worker_id: Optional[str] = None
+        self.redis_client = None
+        self._task: Optional[asyncio.Task] = None
+        self._prune_script = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, collect: Callable, labels: Tuple[str, ...] = (), kind: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, help, collect, labels, kind))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def set_redis(self, redis_client, worker_id: str):
+        self.redis_client = redis_client
+        self.worker_id = worker_id
+        self._prune_script = redis_client.register_script(PRUNE_WORKERS_SCRIPT) if redis_client else None
+
+    def export(self) -> Dict[str, Dict]:
+        return {name: metric.export() for name, metric in self.metrics.items()}
+
+    async def push(self):
+        if self.redis_client:
+            payload = dumps({"at": time.time(), "metrics": self.export()})
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(METRICS_WORKERS_KEY, self.worker_id, payload)
+                pipe.expire(METRICS_WORKERS_KEY, int(self.stale_after * 2))
+                await pipe.execute()
+
+    async def _other_workers(self) -> Iterable[Dict]:
+        if not self.redis_client:
+            return []
+        try:
+            pushed = await self.redis_client.hgetall(METRICS_WORKERS_KEY)
+        except Exception as e:
+            print(f"❌ [METRICS] Failed to read other workers' metrics: {e}")
+            return []
+        cutoff = time.time() - self.stale_after
+        snapshots = []
+        stale = []
+        for worker_id, payload in pushed.items():
+            snapshot = loads(payload)
+            if snapshot["at"] < cutoff:
+                stale.append(worker_id)
+            elif worker_id != self.worker_id:
+                snapshots.append(snapshot["metrics"])
+        if stale:
+            # Workers that died without removing their snapshot, see stop()
+            try:
+                await self._prune_script(keys=[METRICS_WORKERS_KEY], args=[cutoff, *stale])
+            except Exception as e:
+                print(f"❌ [METRICS] Failed to remove stale worker metrics: {e}")
+        return snapshots
+
+    async def render(self) -> str:
+        merged = {name: {} for name in self.metrics}
+        for snapshot in [self.export(), *await self._other_workers()]:
+            for name, series in snapshot.items():
+                if name in self.metrics:
+                    self.metrics[name].merge(merged[name], series)
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(merged[name]))
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        if self._task is None and self.redis_client:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.redis_client:
+            try:
+                await self.redis_client.hdel(METRICS_WORKERS_KEY, self.worker_id)
+            except Exception as e:
+                print(f"❌ [METRICS] Failed to remove worker metrics: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.push()
+            except Exception as e:
+                print(f"❌ [METRICS] Failed to push worker metrics: {e}")
+            await asyncio.sleep(self.push_interval)
+
+# Global instance
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+HTTP_REQUEST_SECONDS = metrics.histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+REQUEST_DB_QUERIES = metrics.histogram("http_request_db_queries", "Database queries per HTTP request", ("route",), COUNT_BUCKETS)
+REQUEST_REDIS_COMMANDS = metrics.histogram("http_request_redis_commands", "Redis round trips per HTTP request", ("route",), COUNT_BUCKETS)
+DB_QUERY_SECONDS = metrics.histogram("db_query_duration_seconds", "Database statement latency", ("operation",))
+DB_POOL_CHECKOUT_SECONDS = metrics.histogram("db_pool_checkout_seconds", "Time to get a pooled connection, including waits and new connections")
+REDIS_COMMAND_SECONDS = metrics.histogram("redis_command_duration_seconds", "Redis round trip latency, a pipeline counts once", ("command",))
+
+class RequestStats:
+    """Work done on behalf of the current request, read by the middleware when it finishes"""
+
+    __slots__ = ("db_queries", "db_seconds", "redis_commands", "redis_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.redis_commands = 0
+        self.redis_seconds = 0.0
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+DB_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+def instrument_engine(engine):
+    """Time every statement of an engine, count it against the current request and any active query audit"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        words = statement.lstrip()[:7].split(None, 1)
+        operation = words[0].upper() if words else "OTHER"
+        DB_QUERY_SECONDS.observe(elapsed, operation if operation in DB_OPERATIONS else "OTHER")
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_seconds += elapsed
+        audit = current_query_audit.get()
+        if audit is not None:
+            audit.record(statement, elapsed)
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The asyncio queue pool, timing how long each checkout takes"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+def _record_redis(command: str, elapsed: float):
+    REDIS_COMMAND_SECONDS.observe(elapsed, command)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.redis_commands += 1
+        stats.redis_seconds += elapsed
+
+class TimedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            _record_redis("PIPELINE", time.perf_counter() - started)
+
+class TimedRedis(redis.Redis):
+    """Redis client timing every command and pipeline. Pub/sub traffic is not counted."""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            _record_redis(str(args[0]).upper(), time.perf_counter() - started)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and per-request DB and Redis work"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request_stats.reset(token)
+            # The matched route's template keeps label cardinality bounded
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, path, str(status))
+            HTTP_REQUEST_SECONDS.observe(elapsed, method, path)
+            REQUEST_DB_QUERIES.observe(stats.db_queries, path)
+            REQUEST_REDIS_COMMANDS.observe(stats.redis_commands, path)
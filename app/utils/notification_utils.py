@@ -2,12 +2,12 @@ import datetime
 from services.notification_service import NotificationService
 from services.websocket_manager import websocket_manager
 from database.connection import AsyncSessionLocal
-from typing import Optional
+from typing import List, Optional
 
 async def send_notification(user_id: str, message: str, title: Optional[str] = None):
     try:
         if websocket_manager.redis_client is None:
-            await websocket_manager.init_redis()
+            await websocket_manager.init_redis(timeout=0)
 
         print(f"🔍 [WEBSOCKET] Checking if user {user_id} is connected via WebSocket")
         # Check if user is connected
@@ -37,3 +37,34 @@ async def send_notification(user_id: str, message: str, title: Optional[str] = N
         print(f"❌ [WEBSOCKET] Error occurred: {str(e)}")
         async with AsyncSessionLocal() as db:
             await NotificationService.create_notification(db, user_id, message, title)
+
+async def send_notifications_batch(user_ids: List[str], message: str, title: Optional[str] = None):
+    """Persist one notification per user in a single insert, then push to whoever is connected.
+
+    Meant to run after the response (a background task), so it logs failures instead of raising.
+    """
+    if not user_ids:
+        return
+
+    try:
+        async with AsyncSessionLocal() as db:
+            await NotificationService.create_notifications(db, user_ids, message, title)
+    except Exception as e:
+        print(f"❌ [NOTIFICATIONS] Failed to store notifications for {len(user_ids)} users: {str(e)}")
+
+    try:
+        if websocket_manager.redis_client is None:
+            await websocket_manager.init_redis(timeout=0)
+
+        notification_message = {
+            "type": "new_notification",
+            "data": {
+                "title": title,
+                "message": message,
+                "created_at": datetime.datetime.now().isoformat()
+            }
+        }
+        delivered = await websocket_manager.send_message_to_users(user_ids, notification_message)
+        print(f"📤 [WEBSOCKET] Pushed notification to {delivered} of {len(user_ids)} users")
+    except Exception as e:
+        print(f"❌ [WEBSOCKET] Failed to push notifications: {str(e)}")
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Tuple
+import base64
+import uuid
+
+def encode_cursor_value(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor_value(cursor: str) -> str:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    """Opaque keyset cursor for rows ordered by (created_at, id) descending"""
+    return encode_cursor_value(f"{created_at.isoformat()}|{row_id}")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        created_at, row_id = decode_cursor_value(cursor).split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,64 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Tuple
+
+class PrefixIndex:
+    """Sorted array of lowercase search keys for prefix lookups with bisect.
+
+    Each user is indexed under their username and every word of their full name.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._ids: List[str] = []
+        # user_id -> (username, fullName)
+        self.profiles: Dict[str, Tuple[str, str]] = {}
+
+    @staticmethod
+    def _terms(username: str, full_name: str) -> List[str]:
+        terms = {username.lower()}
+        terms.update(word for word in full_name.lower().split() if word)
+        return sorted(terms)
+
+    def load(self, users: Iterable[Tuple[str, str, str]]):
+        """Replace the index with (user_id, username, fullName) rows"""
+        entries = []
+        profiles = {}
+        for user_id, username, full_name in users:
+            profiles[user_id] = (username, full_name)
+            entries.extend((term, user_id) for term in self._terms(username, full_name))
+        entries.sort()
+        self._keys = [term for term, _ in entries]
+        self._ids = [user_id for _, user_id in entries]
+        self.profiles = profiles
+
+    def add(self, user_id: str, username: str, full_name: str):
+        if user_id in self.profiles:
+            return
+        self.profiles[user_id] = (username, full_name)
+        for term in self._terms(username, full_name):
+            position = bisect_right(self._keys, term)
+            self._keys.insert(position, term)
+            self._ids.insert(position, user_id)
+
+    def search(self, prefix: str, limit: int) -> List[str]:
+        """User ids with a term starting with prefix, in key order (an exact match sorts first)"""
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        start = bisect_left(self._keys, prefix)
+        # Every key with this prefix sorts below prefix + the highest code point
+        end = bisect_left(self._keys, prefix + "\U0010ffff", lo=start)
+
+        seen = set()
+        results = []
+        for i in range(start, end):
+            user_id = self._ids[i]
+            if user_id not in seen:
+                seen.add(user_id)
+                results.append(user_id)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def __len__(self) -> int:
+        return len(self.profiles)
@@ -0,0 +1,123 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import os
+import re
+
+# "off" (default), "log" reports N+1 and slow queries per request, "strict" also raises so tests fail
+QUERY_AUDIT = os.getenv("QUERY_AUDIT", "off").lower()
+# Runs of the same statement shape in one request that count as N+1
+QUERY_AUDIT_REPEAT_THRESHOLD = int(os.getenv("QUERY_AUDIT_REPEAT_THRESHOLD", "3"))
+# Statements slower than this many milliseconds are reported
+QUERY_AUDIT_SLOW_MS = float(os.getenv("QUERY_AUDIT_SLOW_MS", "100"))
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r"\$\d+|%\(\w+\)s|:\w+|\?")
+_PARAM_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE_RE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """The statement with literals and bound parameters replaced, IN lists of any length collapse to one shape"""
+    shape = _STRING_RE.sub("?", statement)
+    shape = _PARAM_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _PARAM_LIST_RE.sub("?...", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class QueryAudit:
+    """Statements issued while an audit is active, fed by the engine hooks in utils.metrics"""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.statements: List[Tuple[str, float]] = []
+
+    def record(self, statement: str, elapsed: float):
+        self.statements.append((statement, elapsed))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = QUERY_AUDIT_REPEAT_THRESHOLD) -> Dict[str, int]:
+        """Statement shapes issued at least `threshold` times, the signature of an N+1 loop"""
+        shapes = Counter(statement_shape(statement) for statement, _ in self.statements)
+        return {shape: count for shape, count in shapes.most_common() if count >= threshold}
+
+    def slow(self, threshold_ms: float = QUERY_AUDIT_SLOW_MS) -> List[Tuple[str, float]]:
+        return [(statement, elapsed) for statement, elapsed in self.statements if elapsed * 1000 >= threshold_ms]
+
+    def problems(self, max_queries: Optional[int] = None, repeat_threshold: int = QUERY_AUDIT_REPEAT_THRESHOLD) -> List[str]:
+        problems = []
+        if max_queries is not None and self.count > max_queries:
+            problems.append(f"{self.count} queries, budget is {max_queries}")
+        for shape, count in self.repeated(repeat_threshold).items():
+            problems.append(f"{count}x {shape[:200]}")
+        for statement, elapsed in self.slow():
+            problems.append(f"slow ({elapsed * 1000:.0f} ms) {statement_shape(statement)[:200]}")
+        return problems
+
+    def report(self) -> str:
+        lines = [f"{self.label or 'audit'}: {self.count} queries"]
+        lines.extend(f"  {index + 1}. {statement_shape(statement)[:200]}" for index, (statement, _) in enumerate(self.statements))
+        return "\n".join(lines)
+
+current_query_audit: ContextVar[Optional[QueryAudit]] = ContextVar("current_query_audit", default=None)
+
+@contextmanager
+def audit_queries(label: str = ""):
+    """Record every statement issued inside the block, including from awaited coroutines"""
+    audit = QueryAudit(label)
+    token = current_query_audit.set(audit)
+    try:
+        yield audit
+    finally:
+        current_query_audit.reset(token)
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "", repeat_threshold: int = QUERY_AUDIT_REPEAT_THRESHOLD):
+    """Test helper: fail when the block issues more than `max_queries` or repeats a statement shape.
+
+        with query_budget(2, "room join"):
+            await load_participants(user_ids)
+    """
+    with audit_queries(label) as audit:
+        yield audit
+    problems = audit.problems(max_queries, repeat_threshold)
+    if problems:
+        raise QueryBudgetExceeded(f"{label or 'query budget'}: " + "; ".join(problems) + "\n" + audit.report())
+
+class QueryAuditMiddleware:
+    """Pure ASGI middleware auditing each HTTP request when QUERY_AUDIT is "log" or "strict".
+
+    Adds an X-Query-Count header. In strict mode a request with problems raises after its
+    response is sent, which fails the test that made it.
+    """
+
+    def __init__(self, app, mode: str = QUERY_AUDIT):
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.mode not in ("log", "strict"):
+            await self.app(scope, receive, send)
+            return
+
+        with audit_queries(f"{scope['method']} {scope['path']}") as audit:
+            async def send_with_count(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-query-count", str(audit.count).encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_count)
+
+        problems = audit.problems()
+        if problems:
+            print(f"⚠️ [QUERY AUDIT] {audit.label}: " + "; ".join(problems))
+            if self.mode == "strict":
+                raise QueryBudgetExceeded(f"{audit.label}: " + "; ".join(problems) + "\n" + audit.report())
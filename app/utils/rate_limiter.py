@@ -0,0 +1,36 @@
+from collections import defaultdict
+from typing import Dict
+import time
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second up to `capacity`"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def consume(self, amount: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+class ThrottleMetrics:
+    """Counters for frames rejected by socket rate limits and size caps"""
+
+    def __init__(self):
+        # (socket, reason) -> count
+        self.counters: Dict[tuple, int] = defaultdict(int)
+
+    def record(self, socket: str, reason: str):
+        self.counters[(socket, reason)] += 1
+
+# Global instance
+throttle_metrics = ThrottleMetrics()
@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import os
+import random
+import time
+
+# Seconds startup keeps retrying a dependency before giving up
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", "60"))
+# First and longest pause between retries, the pause doubles in between
+STARTUP_RETRY_INITIAL_DELAY = float(os.getenv("STARTUP_RETRY_INITIAL_DELAY", "0.1"))
+STARTUP_RETRY_MAX_DELAY = float(os.getenv("STARTUP_RETRY_MAX_DELAY", "2"))
+# Seconds shutdown gives open connections to be told about the restart and closed
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "10"))
+
+async def wait_until_ready(
+    name: str,
+    check: Callable[[], Awaitable],
+    timeout: float = STARTUP_TIMEOUT,
+    initial_delay: float = STARTUP_RETRY_INITIAL_DELAY,
+    max_delay: float = STARTUP_RETRY_MAX_DELAY,
+) -> float:
+    """Await check() until it succeeds, with jittered exponential backoff between attempts.
+
+    Returns the seconds waited, re-raises the last error once `timeout` has passed.
+    """
+    started = time.perf_counter()
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            await check()
+            waited = time.perf_counter() - started
+            print(f"✅ [STARTUP] {name} ready after {attempt} attempt(s) in {waited:.2f}s")
+            return waited
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            if elapsed + delay > timeout:
+                print(f"❌ [STARTUP] {name} not ready after {elapsed:.1f}s: {e}")
+                raise
+            print(f"⏳ [STARTUP] Waiting for {name} (attempt {attempt}): {e}")
+        await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        delay = min(delay * 2, max_delay)
+
+class ReadinessState:
+    """Startup phase timings and whether the process should receive traffic"""
+
+    def __init__(self):
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.startup_seconds: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.drain_hooks: List[Callable[[], Awaitable]] = []
+        self._drained: Optional[asyncio.Task] = None
+
+    def begin(self):
+        self.started_at = time.perf_counter()
+        self.ready = False
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - started, 3)
+
+    def mark_ready(self):
+        self.ready = True
+        if self.started_at is not None:
+            self.startup_seconds = round(time.perf_counter() - self.started_at, 3)
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        print(f"🚀 [STARTUP] Ready in {self.startup_seconds}s ({phases})")
+
+    def mark_draining(self):
+        """Fail readiness during shutdown so load balancers stop routing here"""
+        self.ready = False
+
+    def on_drain(self, hook: Callable[[], Awaitable]):
+        """Register a coroutine that closes long-lived connections during shutdown"""
+        self.drain_hooks.append(hook)
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT):
+        """Run the drain hooks once, later calls wait for the same run"""
+        self.mark_draining()
+        if self._drained is None:
+            self._drained = asyncio.ensure_future(asyncio.gather(*(hook() for hook in self.drain_hooks), return_exceptions=True))
+        try:
+            await asyncio.wait_for(asyncio.shield(self._drained), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ [SHUTDOWN] Connections still draining after {timeout}s")
+
+# Global instance
+readiness = ReadinessState()
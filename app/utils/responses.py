@@ -0,0 +1,9 @@
+from starlette.responses import JSONResponse
+from utils.serialization import dumps_bytes
+from typing import Any
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes with the fast serializer and skips response_model re-validation"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
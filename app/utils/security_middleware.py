@@ -1,56 +1,44 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-import bleach
-import html
-import json
-import re
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.sanitize import sanitize_string
 from typing import Any, Dict
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, allowed_tags: list = [], allowed_attributes: dict = {}):
-        super().__init__(app)
-        # Default: strip all HTML tags
-        self.allowed_tags = allowed_tags or []
-        self.allowed_attributes = allowed_attributes or {}
+# Sent on every HTTP response, encoded once at import
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+]
+_SECURITY_HEADER_NAMES = {name for name, _ in SECURITY_HEADERS}
 
-    async def dispatch(self, request: Request, call_next):
-        # Add security headers to response
-        response = await call_next(request)
+class SecurityMiddleware:
+    """Pure ASGI middleware adding security headers to HTTP responses.
 
-        # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+    It only wraps `send`, so responses stream straight through and WebSocket
+    and lifespan scopes are passed on untouched.
+    """
 
-        return response
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-def sanitize_string(text: str) -> str:
-    """Sanitize string input to prevent XSS attacks"""
-    if not isinstance(text, str):
-        return text
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    # Remove HTML tags and attributes
-    cleaned = bleach.clean(text, tags=[], attributes={}, strip=True)
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                # Replace rather than duplicate headers a route already set
+                headers = [
+                    header for header in message.get("headers", [])
+                    if header[0].lower() not in _SECURITY_HEADER_NAMES
+                ]
+                headers.extend(SECURITY_HEADERS)
+                message["headers"] = headers
+            await send(message)
 
-    # HTML escape any remaining content
-    escaped = html.escape(cleaned)
-
-    # Remove common XSS patterns
-    xss_patterns = [
-        r'javascript:',
-        r'on\w+\s*=',
-        r'<script[^>]*>.*?</script>',
-        r'<iframe[^>]*>.*?</iframe>',
-        r'<object[^>]*>.*?</object>',
-        r'<embed[^>]*>.*?</embed>',
-    ]
-
-    for pattern in xss_patterns:
-        escaped = re.sub(pattern, '', escaped, flags=re.IGNORECASE | re.DOTALL)
-
-    return escaped
+        await self.app(scope, receive, send_with_headers)
 
 def sanitize_dict(data: Dict[str, Any]) -> Dict[str, Any]:
     """Recursively sanitize dictionary values"""
@@ -0,0 +1,50 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+import json
+import os
+import uuid
+
+# "orjson" (default) or "json" to force the stdlib encoder
+JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "orjson")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if JSON_SERIALIZER == "json":
+    orjson = None
+
+def encode_default(value: Any) -> Any:
+    """Encode types the stdlib encoder does not know about, matching orjson's output"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=encode_default, option=_ORJSON_OPTIONS)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=encode_default, option=_ORJSON_OPTIONS).decode("utf-8")
+
+    def loads(data: Any) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, default=encode_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, default=encode_default, ensure_ascii=False, separators=(",", ":"))
+
+    def loads(data: Any) -> Any:
+        return json.loads(data)
@@ -0,0 +1,30 @@
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
+from utils.responses import FastJSONResponse
+from typing import Any, Dict, Sequence
+
+def validation_errors(errors: Sequence[Dict[str, Any]]) -> Dict[str, str]:
+    """Map pydantic errors to {field name: message}, the body of every 400 validation response"""
+    fields = {}
+    for error in errors:
+        field_name = error['loc'][-1] if error['loc'] else 'unknown'
+        fields[field_name] = error['msg']
+    return fields
+
+async def body_validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Invalid request bodies answer 400 {"detail": {"errors": ...}}.
+
+    Malformed JSON answers 400 with the decoder's message as a string detail, as it did
+    when controllers parsed request.json() themselves. Query and path parameter errors
+    keep FastAPI's default 422 response.
+    """
+    errors = exc.errors()
+    if not all(error['loc'] and error['loc'][0] == "body" for error in errors):
+        return await request_validation_exception_handler(request, exc)
+    for error in errors:
+        if error['type'] == "json_invalid":
+            # loc is ("body", character position) here, not a field name
+            message = f"{error.get('ctx', {}).get('error', error['msg'])} (char {error['loc'][-1]})"
+            return FastJSONResponse(status_code=400, content={"detail": message})
+    return FastJSONResponse(status_code=400, content={"detail": {"errors": validation_errors(errors)}})
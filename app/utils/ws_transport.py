@@ -0,0 +1,89 @@
+from fastapi import WebSocket, WebSocketDisconnect
+from utils.serialization import dumps, loads, encode_default
+from typing import Any, Dict, Optional, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Subprotocols a client may offer in Sec-WebSocket-Protocol, in server preference order.
+# Compression is negotiated separately by the server (permessage-deflate), so both modes get it.
+MSGPACK_SUBPROTOCOL = "bitweet.msgpack"
+JSON_SUBPROTOCOL = "bitweet.json"
+
+class FrameCodec:
+    """Encodes outgoing frames as text JSON"""
+
+    name = "json"
+    subprotocol = JSON_SUBPROTOCOL
+    binary = False
+
+    def encode(self, message: Dict) -> Union[str, bytes]:
+        return dumps(message)
+
+class MsgPackCodec(FrameCodec):
+    """Encodes outgoing frames as binary MessagePack"""
+
+    name = "msgpack"
+    subprotocol = MSGPACK_SUBPROTOCOL
+    binary = True
+
+    def encode(self, message: Dict) -> Union[str, bytes]:
+        return msgpack.packb(message, default=encode_default, use_bin_type=True)
+
+JSON_CODEC = FrameCodec()
+MSGPACK_CODEC = MsgPackCodec() if msgpack is not None else None
+
+def negotiate_codec(websocket: WebSocket) -> Optional[str]:
+    """Pick the frame codec from the client's offered subprotocols and remember it on the connection.
+
+    Returns the subprotocol to echo back in accept(), or None when the client offered none.
+    """
+    offered = websocket.scope.get("subprotocols") or []
+    if MSGPACK_CODEC is not None and MSGPACK_SUBPROTOCOL in offered:
+        websocket.state.codec = MSGPACK_CODEC
+        return MSGPACK_SUBPROTOCOL
+
+    websocket.state.codec = JSON_CODEC
+    return JSON_SUBPROTOCOL if JSON_SUBPROTOCOL in offered else None
+
+def get_codec(websocket: WebSocket) -> FrameCodec:
+    return getattr(websocket.state, "codec", JSON_CODEC)
+
+async def send_encoded(websocket: WebSocket, codec: FrameCodec, payload: Union[str, bytes]):
+    if codec.binary:
+        await websocket.send_bytes(payload)
+    else:
+        await websocket.send_text(payload)
+
+async def send_frame(websocket: WebSocket, message: Dict):
+    """Send a message using the codec negotiated for this connection"""
+    codec = get_codec(websocket)
+    await send_encoded(websocket, codec, codec.encode(message))
+
+async def receive_frame(websocket: WebSocket) -> Union[str, bytes]:
+    """Receive a raw text or binary frame, raising WebSocketDisconnect like receive_text()"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("text") is not None:
+        return message["text"]
+    return message.get("bytes") or b""
+
+def frame_exceeds(data: Union[str, bytes], limit: int) -> bool:
+    """Whether a frame is larger than `limit` bytes, text frames are measured as UTF-8"""
+    if isinstance(data, bytes) or len(data) > limit:
+        return len(data) > limit
+    # Only encode when the character count alone cannot decide it
+    if len(data) * 4 <= limit:
+        return False
+    return len(data.encode("utf-8")) > limit
+
+def decode_frame(data: Union[str, bytes]) -> Any:
+    """Text frames are JSON, binary frames are MessagePack"""
+    if isinstance(data, str):
+        return loads(data)
+    if msgpack is None:
+        raise ValueError("Binary frames are not supported")
+    return msgpack.unpackb(data, raw=False)
@@ -1,6 +1,20 @@
 from celery import Celery
+from celery.signals import worker_process_shutdown
+from kombu import Queue
 import os
-from utils.email_utils import send_brevo_email
+from utils.email_utils import brevo_client
+
+# Latency-sensitive mail a user is waiting for, served by its own workers
+OTP_QUEUE = "otp"
+# Batch sends and future retention jobs, may run for a while
+BULK_QUEUE = "bulk"
+DEFAULT_QUEUE = "celery"
+
+# Seconds before Redis hands an unacknowledged task to another worker, must exceed the longest task.
+# It applies to every queue (any consumer restores any unacknowledged message), so it cannot be
+# shortened for OTP mail alone without redelivering bulk batches still waiting in a prefetch.
+# Tasks whose mail is useless after a deadline are sent with `expires` instead, see send_otp_email.
+CELERY_VISIBILITY_TIMEOUT = int(os.getenv("CELERY_VISIBILITY_TIMEOUT", "3600"))
 
 celery = Celery(
     "app",
@@ -16,14 +30,23 @@ celery.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    task_queues=[Queue(name, routing_key=name) for name in (OTP_QUEUE, BULK_QUEUE, DEFAULT_QUEUE)],
+    task_default_queue=DEFAULT_QUEUE,
     task_routes={
-        'worker.print_otp_to_console': {'queue': 'celery'},
-        'worker.add': {'queue': 'celery'},
-        'worker.send_otp_email': {'queue': 'celery'},
-    }
+        'worker.print_otp_to_console': {'queue': OTP_QUEUE},
+        'worker.add': {'queue': DEFAULT_QUEUE},
+        'worker.send_otp_email': {'queue': OTP_QUEUE},
+        'worker.send_email_batch': {'queue': BULK_QUEUE},
+    },
+    # Nobody reads task results, tasks that return something useful opt back in
+    task_ignore_result=True,
+    result_expires=3600,
+    # Reserve one task per process, so a queued OTP is not stuck behind tasks prefetched by a busy process
+    worker_prefetch_multiplier=1,
+    broker_transport_options={"visibility_timeout": CELERY_VISIBILITY_TIMEOUT},
 )
 
-@celery.task
+@celery.task(ignore_result=False)
 def add(x, y):
     return x + y
 
@@ -33,10 +56,23 @@ def print_otp_to_console(otp, user_id):
     print(f"OTP for user {user_id}: {otp}")
     return True
 
-@celery.task
+# Acknowledged after it runs: a crashed worker resends the OTP rather than losing it. Redelivery
+# waits for CELERY_VISIBILITY_TIMEOUT, so callers pass expires=OTP_TTL and a resend after the
+# OTP has expired is revoked instead of mailed.
+@celery.task(acks_late=True, reject_on_worker_lost=True)
 def send_otp_email(email: str, otp: str):
     """Task to send OTP email"""
     subject = "Your OTP for Password Reset"
     html_content = f"<p>Your OTP for password reset is: <strong>{otp}</strong></p>"
-    send_brevo_email(to_email=email, subject=subject, html_content=html_content)
-    return True
+    return brevo_client.send(to_email=email, subject=subject, html_content=html_content)
+
+# Acknowledged before it runs: redelivering a half-sent batch would mail its recipients twice
+@celery.task(acks_late=False)
+def send_email_batch(subject: str, html_content: str, recipients: list):
+    """Task to send one template to many [email, params] recipients in as few API calls as possible"""
+    return brevo_client.send_batch(subject, html_content, [(email, params) for email, params in recipients])
+
+@worker_process_shutdown.connect
+def close_email_client(**kwargs):
+    print(f"📧 [EMAIL] Worker email totals: {brevo_client.metrics.snapshot()}")
+    brevo_client.close()
@@ -0,0 +1,120 @@
+"""OTP task latency while bulk email jobs keep the Celery workers busy.
+
+Runs real Celery workers against Redis and the fake Brevo API from email_benchmark.py,
+each call taking --latency-ms. A burst of bulk batch tasks is queued, then OTP tasks
+arrive at a steady rate; latency is enqueue to the fake API receiving the OTP email.
+
+Profiles use the same total concurrency:
+    shared queue      one worker on the default queue, prefetch 4 (the old setup)
+    dedicated queues  an otp worker and a bulk worker, prefetch 1 (worker.py routing)
+
+Needs a Redis to use as broker; queues on it are purged. Run from the repository root:
+    REDIS_HOST=localhost REDIS_PORT=6379 python benchmarks/celery_load_test.py
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+
+from email_benchmark import FakeBrevo
+from worker import celery, OTP_QUEUE, BULK_QUEUE, DEFAULT_QUEUE
+
+HTML = "<p>{{ params.body }}</p>"
+
+PROFILES = [
+    ("shared queue", [(DEFAULT_QUEUE, 2, 4)], False),
+    ("dedicated queues", [(OTP_QUEUE, 1, 1), (f"{BULK_QUEUE},{DEFAULT_QUEUE}", 1, 1)], True),
+]
+
+def start_workers(specs, api_url: str, batch_size: int):
+    env = dict(os.environ, BREVO_API_URL=api_url, EMAIL_BATCH_SIZE=str(batch_size), EMAIL_METRICS_LOG_INTERVAL="3600")
+    return [
+        subprocess.Popen(
+            [sys.executable, "-m", "celery", "-A", "worker", "worker", "-Q", queues, "-n", f"load{index}@%h",
+             "--concurrency", str(concurrency), "--prefetch-multiplier", str(prefetch), "--loglevel", "warning"],
+            cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for index, (queues, concurrency, prefetch) in enumerate(specs)
+    ]
+
+def stop_workers(workers):
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        try:
+            worker.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+
+def wait_for(server: FakeBrevo, emails, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(email in server.arrivals for email in emails):
+            return
+        time.sleep(0.05)
+    missing = [email for email in emails if email not in server.arrivals]
+    raise SystemExit(f"{len(missing)} emails never reached the fake API, e.g. {missing[:3]}")
+
+def run_profile(server: FakeBrevo, specs, routed: bool, args) -> list:
+    def queue_for(queue: str) -> str:
+        return queue if routed else DEFAULT_QUEUE
+
+    celery.control.purge()
+    server.reset()
+    workers = start_workers(specs, server.url, args.batch_size)
+    try:
+        # Warm up every worker before timing
+        celery.send_task("worker.send_otp_email", args=["warm-otp@example.com", "000000"], queue=queue_for(OTP_QUEUE))
+        celery.send_task("worker.send_email_batch", args=["Warm", HTML, [["warm-bulk@example.com", {}]]], queue=queue_for(BULK_QUEUE))
+        wait_for(server, ["warm-otp@example.com", "warm-bulk@example.com"], timeout=60)
+
+        for job in range(args.bulk_jobs):
+            recipients = [[f"bulk{job}-{i}@example.com", {"body": "digest"}] for i in range(args.bulk_recipients)]
+            celery.send_task("worker.send_email_batch", args=["Digest", HTML, recipients], queue=queue_for(BULK_QUEUE))
+
+        enqueued = {}
+        for i in range(args.otps):
+            email = f"otp{i}@example.com"
+            enqueued[email] = time.time()
+            celery.send_task("worker.send_otp_email", args=[email, f"{i:06d}"], queue=queue_for(OTP_QUEUE))
+            time.sleep(args.otp_interval_ms / 1000)
+
+        wait_for(server, list(enqueued), timeout=600)
+        return [(server.arrivals[email] - sent) * 1000 for email, sent in enqueued.items()]
+    finally:
+        celery.control.purge()
+        stop_workers(workers)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20, help="fake API time per call")
+    parser.add_argument("--bulk-jobs", type=int, default=20)
+    parser.add_argument("--bulk-recipients", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=50, help="recipients per API call in bulk jobs")
+    parser.add_argument("--otps", type=int, default=30)
+    parser.add_argument("--otp-interval-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    server = FakeBrevo(latency=args.latency_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    for name, specs, routed in PROFILES:
+        latencies = sorted(run_profile(server, specs, routed, args))
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(
+            f"{name:>16}: OTP latency p50 {statistics.median(latencies):,.0f} ms, "
+            f"p95 {p95:,.0f} ms, max {latencies[-1]:,.0f} ms"
+        )
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
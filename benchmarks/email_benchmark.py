@@ -0,0 +1,161 @@
+"""Emails per second through BrevoClient against a local fake Brevo API.
+
+Compares the old connection-per-email send, the pooled keep-alive client and batched
+sends. The fake server speaks plain HTTP, so the old path's TLS handshake per email is
+not counted and the real gain is larger. The fake also injects failures to check retries.
+
+Run from the repository root:
+    python benchmarks/email_benchmark.py [--emails 2000] [--latency-ms 0]
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+os.environ.setdefault("EMAIL_RETRY_INITIAL_DELAY", "0.01")
+os.environ.setdefault("EMAIL_METRICS_LOG_INTERVAL", "3600")
+
+from utils.email_utils import BrevoClient, SEND_PATH
+
+class FakeBrevo(ThreadingHTTPServer):
+    """Accepts POST /v3/smtp/email with keep-alive, counting calls, recipients and connections"""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), FakeBrevoHandler)
+        self.latency = latency
+        self.calls = 0
+        self.recipients = 0
+        self.connections = 0
+        # recipient email -> time.time() the fake accepted it
+        self.arrivals = {}
+        # Status codes to answer with before accepting, e.g. [503, 429]
+        self.failures = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset(self):
+        with self.lock:
+            self.calls = self.recipients = self.connections = 0
+            self.arrivals = {}
+
+class FakeBrevoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.calls += 1
+            status = self.server.failures.pop(0) if self.server.failures else 201
+            if status == 201:
+                recipients = [version["to"][0] for version in body["messageVersions"]] if "messageVersions" in body else body["to"]
+                self.server.recipients += len(recipients)
+                now = time.time()
+                for recipient in recipients:
+                    self.server.arrivals[recipient["email"]] = now
+        reply = b'{"messageId": "<fake@brevo>"}' if status == 201 else b'{"code": "fake_error"}'
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+def send_with_new_connection(server: FakeBrevo, to_email: str, subject: str, html_content: str) -> bool:
+    """The old send_brevo_email: a new connection per email, no timeout"""
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+    payload = {
+        "sender": {"name": "Bitweet", "email": "noreply@example.com"},
+        "to": [{"email": to_email}],
+        "subject": subject,
+        "htmlContent": html_content,
+    }
+    headers = {"accept": "application/json", "content-type": "application/json", "api-key": "test"}
+    try:
+        conn.request("POST", SEND_PATH, json.dumps(payload), headers)
+        res = conn.getresponse()
+        res.read()
+        return 200 <= res.status < 300
+    finally:
+        conn.close()
+
+def check_retries(server: FakeBrevo):
+    client = BrevoClient(api_url=server.url, api_key="test", max_retries=2)
+    server.failures = [503, 429]
+    if not client.send("retry@example.com", "Retry", "<p>retry</p>"):
+        raise SystemExit("send did not recover from 503 and 429")
+    server.failures = [400]
+    if client.send("bad@example.com", "Bad", "<p>bad</p>"):
+        raise SystemExit("a 400 response must not be reported as sent")
+    server.failures = [500, 500, 500]
+    if client.send("down@example.com", "Down", "<p>down</p>"):
+        raise SystemExit("send must give up after max_retries")
+    stats = client.metrics.snapshot()
+    if (stats["sent"], stats["failed"], stats["retries"]) != (1, 2, 4):
+        raise SystemExit(f"unexpected retry metrics: {stats}")
+    client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated API latency per call")
+    args = parser.parse_args()
+
+    server = FakeBrevo(latency=args.latency_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    check_retries(server)
+
+    recipients = [(f"user{i}@example.com", {"otp": f"{i:06d}"}) for i in range(args.emails)]
+    html = "<p>Your OTP for password reset is: <strong>{{ params.otp }}</strong></p>"
+
+    def old():
+        for email, params in recipients:
+            send_with_new_connection(server, email, "Your OTP", html)
+
+    client = BrevoClient(api_url=server.url, api_key="test")
+
+    def pooled():
+        for email, params in recipients:
+            client.send(email, "Your OTP", html)
+
+    def batched():
+        client.send_batch("Your OTP", html, recipients)
+
+    for name, run in [("connection per email", old), ("pooled keep-alive", pooled), ("batched", batched)]:
+        server.reset()
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        if server.recipients != args.emails:
+            raise SystemExit(f"{name}: fake server accepted {server.recipients} of {args.emails} emails")
+        print(
+            f"{name:>20}: {args.emails / elapsed:>10,.0f} emails/s "
+            f"({server.calls} calls, {server.connections} connections)"
+        )
+
+    print(f"client metrics: {client.metrics.snapshot()}")
+    client.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
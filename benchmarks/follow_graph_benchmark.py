@@ -0,0 +1,58 @@
+"""Memory footprint and lookup throughput of the follow graph cache at 1M edges.
+
+Run from the repository root:
+    python benchmarks/follow_graph_benchmark.py
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from utils.adjacency import AdjacencyStore
+
+USERS = 20_000
+FOLLOWS_PER_USER = 50  # USERS * FOLLOWS_PER_USER = 1M edges
+LOOKUPS = 1_000_000
+
+def main():
+    random.seed(42)
+    user_ids = [str(uuid.uuid4()) for _ in range(USERS)]
+    adjacency = {user_id: random.sample(user_ids, FOLLOWS_PER_USER) for user_id in user_ids}
+
+    store = AdjacencyStore(max_users=USERS, ttl=3600, max_interned=USERS * 2)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    for user_id, following in adjacency.items():
+        store.put(user_id, following)
+    load_elapsed = time.perf_counter() - start
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    edges = USERS * FOLLOWS_PER_USER
+    used = after - before
+    print(f"load: {edges:,} edges in {load_elapsed:.2f}s")
+    print(f"memory: {used / 1024 / 1024:.1f} MiB ({used / edges:.1f} bytes/edge, user id strings owned by the caller)")
+
+    probes = [(random.choice(user_ids), random.choice(user_ids)) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for follower_id, following_id in probes:
+        store.contains(store.get(follower_id), following_id)
+    lookup_elapsed = time.perf_counter() - start
+    print(f"is_following: {LOOKUPS:,} lookups in {lookup_elapsed:.2f}s ({LOOKUPS / lookup_elapsed:,.0f}/s)")
+
+    batch = user_ids[:100]
+    start = time.perf_counter()
+    for follower_id in user_ids[:10_000]:
+        neighbours = store.get(follower_id)
+        {user_id: store.contains(neighbours, user_id) for user_id in batch}
+    batch_elapsed = time.perf_counter() - start
+    print(f"are_following: 10,000 batches of 100 in {batch_elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
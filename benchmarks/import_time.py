@@ -0,0 +1,84 @@
+"""Cold import time of the API entry point, checked against a budget.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters, reports the median
+total and the slowest top-level imports, and exits non-zero when the median is over
+budget or when a module that must stay lazy was imported.
+
+Run from the repository root:
+    python benchmarks/import_time.py [--budget-ms 2000] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# Built on first use (OTP email, password hashing, sanitizing markup), never at import
+LAZY_MODULES = ["worker", "celery", "passlib.context", "bleach"]
+
+def import_profile(module: str) -> tuple:
+    """Cumulative us per imported module, and the direct imports of `module`, for one cold import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    children = []
+    direct = []
+    # Lines are in completion order, so a module's direct imports are listed right before it
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        cumulative[name] = int(cumulative_us)
+        if level == 1:
+            children.append(name)
+        elif level == 0:
+            if name == module:
+                direct = children
+            children = []
+    return cumulative, direct
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "2000")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # The first run also writes bytecode caches, it is not counted
+    import_profile(args.module)
+    profiles = [import_profile(args.module) for _ in range(args.runs)]
+    totals_ms = [cumulative[args.module] / 1000 for cumulative, _ in profiles]
+    median_ms = statistics.median(totals_ms)
+
+    last, direct = profiles[-1]
+    print(f"slowest direct imports of {args.module} (cumulative):")
+    for name in sorted(direct, key=last.get, reverse=True)[:args.top]:
+        print(f"  {last[name] / 1000:8.1f} ms  {name}")
+
+    print(f"import {args.module}: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(totals_ms):.0f}, max {max(totals_ms):.0f}), budget {args.budget_ms:.0f} ms")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in last]
+    if eager:
+        print(f"FAIL: imported eagerly but should be lazy: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: over budget by {median_ms - args.budget_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
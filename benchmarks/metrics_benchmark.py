@@ -0,0 +1,87 @@
+"""Per-request cost of MetricsMiddleware and the time to render /metrics.
+
+Requests are driven straight through the ASGI app, with no server or sockets, so the
+numbers isolate the middleware's own overhead.
+
+Run from the repository root (needs fastapi):
+    python benchmarks/metrics_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from utils.metrics import MetricsMiddleware, metrics, HTTP_REQUESTS, HTTP_REQUEST_SECONDS, REQUEST_DB_QUERIES
+
+REQUESTS = 20_000
+ROUTES = 50
+
+def build_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+def scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+
+async def request(app, path: str):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope(path), receive, send)
+
+async def requests_per_second(app) -> float:
+    for i in range(500):
+        await request(app, f"/items/{i}")
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        await request(app, f"/items/{i}")
+    return REQUESTS / (time.perf_counter() - start)
+
+async def main():
+    for name, middleware in [("no middleware", None), ("MetricsMiddleware", MetricsMiddleware)]:
+        rps = await requests_per_second(build_app(middleware))
+        print(f"{name:>18}: {rps:,.0f} req/s ({1e6 / rps:.1f} us/request)")
+
+    # Every request above shares one route template, so the label set stays bounded
+    series = HTTP_REQUESTS.series
+    if list(series) != ["GET\x1f/items/{item_id}\x1f200"]:
+        raise SystemExit(f"unexpected request series: {list(series)}")
+
+    # Render with series for a realistic number of routes
+    for i in range(ROUTES):
+        HTTP_REQUESTS.inc("GET", f"/route-{i}", "200")
+        HTTP_REQUEST_SECONDS.observe(0.01, "GET", f"/route-{i}")
+        REQUEST_DB_QUERIES.observe(3, f"/route-{i}")
+    start = time.perf_counter()
+    text = await metrics.render()
+    print(f"render /metrics: {(time.perf_counter() - start) * 1000:.2f} ms, {len(text.splitlines())} lines")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""Checks the query auditor and shows what an N+1 loop looks like to it.
+
+Uses an in-memory SQLite engine with the same hooks as the application engine, so no
+database server is needed. Exits non-zero if the auditor misses the N+1 loop or flags
+the batched query.
+
+Run from the repository root (needs fastapi):
+    python benchmarks/query_audit_check.py
+"""
+import asyncio
+import os
+import sys
+
+from fastapi import FastAPI
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from utils.metrics import instrument_engine
+from utils.query_audit import QueryAuditMiddleware, QueryBudgetExceeded, query_budget, statement_shape
+
+PARTICIPANTS = 10
+
+# One shared in-memory database, endpoints run in the threadpool
+engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+instrument_engine(engine)
+
+def setup():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT)"))
+        for user_id in range(PARTICIPANTS):
+            conn.execute(text("INSERT INTO users (id, username) VALUES (:id, :username)"), {"id": user_id, "username": f"user{user_id}"})
+
+def participants_one_by_one(user_ids):
+    """The old room join: one SELECT per connected member"""
+    with engine.connect() as conn:
+        return [conn.execute(text("SELECT id, username FROM users WHERE id = :id"), {"id": user_id}).one() for user_id in user_ids]
+
+def participants_batched(user_ids):
+    with engine.connect() as conn:
+        statement = text("SELECT id, username FROM users WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+        return conn.execute(statement, {"ids": list(user_ids)}).all()
+
+def check_shapes():
+    cases = [
+        ("SELECT * FROM users WHERE id = $1", "SELECT * FROM users WHERE id = $7"),
+        ("SELECT * FROM users WHERE id IN ($1, $2)", "SELECT * FROM users WHERE id IN ($1, $2, $3, $4)"),
+        ("SELECT * FROM users WHERE name = 'a''b' LIMIT 10", "SELECT *  FROM users\nWHERE name = 'c' LIMIT 20"),
+    ]
+    for left, right in cases:
+        if statement_shape(left) != statement_shape(right):
+            raise SystemExit(f"shapes differ: {statement_shape(left)!r} != {statement_shape(right)!r}")
+    if statement_shape("SELECT a FROM t") == statement_shape("SELECT b FROM t"):
+        raise SystemExit("different columns must not share a shape")
+
+async def check_middleware():
+    app = FastAPI()
+
+    @app.get("/participants")
+    def participants():
+        return {"count": len(participants_one_by_one(range(PARTICIPANTS)))}
+
+    async def request(asgi_app) -> dict:
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/participants", "raw_path": b"/participants", "root_path": "",
+            "query_string": b"", "headers": [(b"host", b"localhost")],
+            "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        headers = {}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                headers.update(message["headers"])
+
+        await asgi_app(scope, receive, send)
+        return headers
+
+    headers = await request(QueryAuditMiddleware(app, mode="log"))
+    print(f"log mode: X-Query-Count {headers[b'x-query-count'].decode()}")
+    try:
+        await request(QueryAuditMiddleware(app, mode="strict"))
+    except QueryBudgetExceeded:
+        print("strict mode: request raised QueryBudgetExceeded")
+    else:
+        raise SystemExit("strict mode did not fail the N+1 request")
+
+def main():
+    setup()
+    check_shapes()
+
+    try:
+        with query_budget(2, "participants one by one"):
+            participants_one_by_one(range(PARTICIPANTS))
+    except QueryBudgetExceeded as e:
+        print(f"one by one: flagged\n{str(e).splitlines()[0]}")
+    else:
+        raise SystemExit("the N+1 loop was not flagged")
+
+    with query_budget(1, "participants batched") as audit:
+        rows = participants_batched(range(PARTICIPANTS))
+    if len(rows) != PARTICIPANTS:
+        raise SystemExit(f"batched query returned {len(rows)} rows")
+    print(f"batched: {audit.count} query, within budget")
+
+    asyncio.run(check_middleware())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Per-request cost of the old manual request.json() endpoint versus a declared body model.
+
+Both endpoints receive the same tweet payload through the ASGI app in-process. The old one
+also re-validates its dict through response_model, the new one returns a FastJSONResponse.
+Rounds are interleaved and the best round is reported, since single runs are noisy.
+
+Run from the repository root (needs fastapi):
+    python benchmarks/request_body_benchmark.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from schemas.tweet_schemas import TweetRequest, TweetResponse
+from utils.responses import FastJSONResponse
+from utils.validation import body_validation_exception_handler
+
+REQUESTS = 5_000
+ROUNDS = 5
+
+BODY = json.dumps({"text": "Just shipped a new feature, feeling great about it today", "isPrivate": False}).encode()
+
+RESULT = {
+    "id": "6f1f1b8e-2f43-4c7a-9f9e-0d6c2b8f3a11",
+    "text": "Just shipped a new feature, feeling great about it today",
+    "isPrivate": False,
+    "createdAt": "2024-01-01T00:00:00",
+    "userId": "0b3c8f9a-5d2e-4f61-8a7b-9c0d1e2f3a4b",
+    "user": {
+        "id": "0b3c8f9a-5d2e-4f61-8a7b-9c0d1e2f3a4b",
+        "username": "bench_user",
+        "fullName": "Bench User",
+        "email": "bench@example.com",
+    },
+}
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_exception_handler(RequestValidationError, body_validation_exception_handler)
+
+    @app.post("/manual", response_model=TweetResponse)
+    async def manual(request: Request):
+        """The pattern the controllers used before"""
+        try:
+            body = await request.json()
+            tweet_data = TweetRequest(**body)
+            return dict(RESULT, text=tweet_data.text)
+        except ValidationError as e:
+            errors = {}
+            for error in e.errors():
+                field_name = error['loc'][-1] if error['loc'] else 'unknown'
+                errors[field_name] = error['msg']
+            raise HTTPException(status_code=400, detail={"errors": errors})
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @app.post("/declared", response_model=TweetResponse)
+    async def declared(tweet_data: TweetRequest):
+        return FastJSONResponse(content=dict(RESULT, text=tweet_data.text))
+
+    return app
+
+def scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(BODY)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+
+async def request(app, path: str, body: bytes = BODY) -> list:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope(path), receive, send)
+    return messages
+
+async def per_request_us(app, path: str) -> float:
+    for _ in range(500):
+        await request(app, path)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await request(app, path)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+async def main():
+    app = build_app()
+
+    invalid = json.dumps({"text": "   "}).encode()
+    for label, body in (("invalid body", invalid), ("malformed JSON", b'{"text": "hi",')):
+        for path in ("/manual", "/declared"):
+            messages = await request(app, path, body)
+            print(f"{path:>9} {label} -> {messages[0]['status']} {messages[1]['body'].decode()}")
+
+    best = {"/manual": float("inf"), "/declared": float("inf")}
+    for _ in range(ROUNDS):
+        for path in best:
+            best[path] = min(best[path], await per_request_us(app, path))
+    for path, us in best.items():
+        print(f"{path:>9}: {us:.1f} us per request")
+
+if __name__ == "__main__":
+    asyncio.run(main())
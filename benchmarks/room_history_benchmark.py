@@ -0,0 +1,60 @@
+"""Append and replay throughput of the in-memory room chat history.
+
+Run from the repository root:
+    python benchmarks/room_history_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from services.room_history import RoomHistoryManager
+
+ROOMS = 100
+MESSAGES_PER_ROOM = 2_000
+
+def make_message(room_id: str, i: int) -> dict:
+    return {
+        "type": "chat",
+        "room_id": room_id,
+        "user_id": "5b2f3c1e-8a4d-4c2e-9f1a-0d6e7b8c9a10",
+        "username": "bench_user",
+        "message": f"message number {i}",
+        "timestamp": "2024-01-01T00:00:00Z",
+    }
+
+async def main():
+    manager = RoomHistoryManager(capacity=100, max_rooms=ROOMS)
+    room_ids = [f"room-{r}" for r in range(ROOMS)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(MESSAGES_PER_ROOM):
+        for room_id in room_ids:
+            await manager.append(room_id, make_message(room_id, i))
+    append_elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = ROOMS * MESSAGES_PER_ROOM
+    print(f"append: {total} messages in {append_elapsed:.3f}s ({total / append_elapsed:,.0f} msg/s)")
+    print(f"peak memory: {peak / 1024 / 1024:.1f} MiB for {ROOMS} rooms (bounded by capacity)")
+
+    replays = 100_000
+    start = time.perf_counter()
+    for i in range(replays):
+        await manager.recent(room_ids[i % ROOMS], 50)
+    replay_elapsed = time.perf_counter() - start
+    print(f"replay: {replays} x 50 messages in {replay_elapsed:.3f}s ({replays / replay_elapsed:,.0f} replays/s)")
+
+    start = time.perf_counter()
+    for i in range(replays):
+        await manager.page(room_ids[i % ROOMS], MESSAGES_PER_ROOM - 40, 50)
+    page_elapsed = time.perf_counter() - start
+    print(f"page: {replays} pages in {page_elapsed:.3f}s ({replays / page_elapsed:,.0f} pages/s)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""Equivalence check and per-call time of utils.sanitize against the original sanitize_string.
+
+The check feeds both implementations random strings built from the characters the
+sanitizer cares about and fails on the first input where their outputs differ.
+
+Run from the repository root (needs bleach):
+    python benchmarks/sanitize_benchmark.py
+"""
+import html
+import os
+import random
+import re
+import sys
+import timeit
+
+import bleach
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from utils.sanitize import sanitize_string
+
+PROPERTY_CASES = 20_000
+ITERATIONS = 20_000
+
+def reference_sanitize_string(text: str) -> str:
+    """The implementation utils.sanitize replaced, kept verbatim as the oracle"""
+    if not isinstance(text, str):
+        return text
+
+    cleaned = bleach.clean(text, tags=[], attributes={}, strip=True)
+    escaped = html.escape(cleaned)
+
+    xss_patterns = [
+        r'javascript:',
+        r'on\w+\s*=',
+        r'<script[^>]*>.*?</script>',
+        r'<iframe[^>]*>.*?</iframe>',
+        r'<object[^>]*>.*?</object>',
+        r'<embed[^>]*>.*?</embed>',
+    ]
+
+    for pattern in xss_patterns:
+        escaped = re.sub(pattern, '', escaped, flags=re.IGNORECASE | re.DOTALL)
+
+    return escaped
+
+FRAGMENTS = [
+    "a", "Z", "on", "ON", "click", "load", " ", "\t", "\n", "\r", "\r\n", "\x00", "\x07", "\x0c",
+    "<", ">", "&", '"', "'", "=", ":", ";", "/", "#", "é", "😀",
+    "<b>", "</b>", "<script>", "</script>", "<iframe src=x>", "<img src=x onerror=alert(1)>",
+    "<!--", "-->", "<![CDATA[", "&amp;", "&lt;", "&#39;", "&#x27;", "&nbsp;", "&bogus;",
+    "javascript:", "JaVaScRiPt:", "onmouseover =", "onerror=",
+]
+
+SAMPLES = {
+    "plain tweet": "Just shipped a new feature, feeling great about it today #buildinpublic",
+    "apostrophes": "Can't believe it's already Friday, what's everyone's plan?",
+    "url": "Read the write-up at https://example.com/posts/42?ref=home",
+    "markup": 'Nice <b>bold</b> move <img src=x onerror="alert(1)"> &amp; more',
+}
+
+def random_text() -> str:
+    return "".join(random.choice(FRAGMENTS) for _ in range(random.randint(0, 12)))
+
+def check_equivalence():
+    random.seed(1234)
+    inputs = [random_text() for _ in range(PROPERTY_CASES)]
+    inputs.extend(SAMPLES.values())
+    inputs.extend(["", None, 42])
+    for text in inputs:
+        expected = reference_sanitize_string(text)
+        actual = sanitize_string(text)
+        if actual != expected:
+            raise SystemExit(f"mismatch for {text!r}:\n  expected {expected!r}\n  actual   {actual!r}")
+    print(f"equivalence: {len(inputs):,} inputs, identical output")
+
+def main():
+    check_equivalence()
+    for name, text in SAMPLES.items():
+        before = timeit.timeit(lambda: reference_sanitize_string(text), number=ITERATIONS)
+        after = timeit.timeit(lambda: sanitize_string(text), number=ITERATIONS)
+        print(f"{name:>12}: original {before / ITERATIONS * 1e6:7.1f} us, "
+              f"new {after / ITERATIONS * 1e6:7.1f} us ({before / after:.0f}x)")
+
+if __name__ == "__main__":
+    main()
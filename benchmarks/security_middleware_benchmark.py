@@ -0,0 +1,106 @@
+"""Requests per second on a trivial endpoint with the old and new SecurityMiddleware.
+
+Requests are driven straight through the ASGI app, with no server or sockets, so the
+numbers isolate the middleware's own per-request cost.
+
+Run from the repository root (needs fastapi):
+    python benchmarks/security_middleware_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from utils.security_middleware import SecurityMiddleware, SECURITY_HEADERS
+
+REQUESTS = 20_000
+
+class BaseHTTPSecurityMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation SecurityMiddleware replaced"""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        return response
+
+def build_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware)
+
+    @app.get("/")
+    def root():
+        return {"message": "Twitter Clone Server is running"}
+
+    return app
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/",
+    "raw_path": b"/",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [(b"host", b"localhost")],
+    "client": ("127.0.0.1", 50000),
+    "server": ("127.0.0.1", 8000),
+}
+
+async def request(app) -> list:
+    received = False
+
+    async def receive():
+        # The body once, then wait like a server does until the client disconnects.
+        # BaseHTTPMiddleware keeps listening for the disconnect, answering it with more
+        # http.request messages would spin forever, an immediate disconnect drops the response.
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await app(dict(SCOPE), receive, send)
+    return messages
+
+async def requests_per_second(app) -> float:
+    for _ in range(500):
+        await request(app)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await request(app)
+    return REQUESTS / (time.perf_counter() - start)
+
+async def main():
+    messages = await request(build_app(SecurityMiddleware))
+    headers = messages[0]["headers"]
+    missing = [name for name, value in SECURITY_HEADERS if (name, value) not in headers]
+    if missing:
+        raise SystemExit(f"missing security headers: {missing}")
+
+    for name, middleware in [
+        ("no middleware", None),
+        ("BaseHTTPMiddleware", BaseHTTPSecurityMiddleware),
+        ("pure ASGI", SecurityMiddleware),
+    ]:
+        rps = await requests_per_second(build_app(middleware))
+        print(f"{name:>18}: {rps:,.0f} req/s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""Encode time per WebSocket frame with stdlib json versus utils.serialization.
+
+Run from the repository root:
+    python benchmarks/serialization_benchmark.py
+"""
+from datetime import datetime
+import json
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from utils.serialization import dumps, JSON_SERIALIZER, orjson
+
+ITERATIONS = 50_000
+
+chat_frame = {
+    "type": "chat",
+    "room_id": str(uuid.uuid4()),
+    "user_id": str(uuid.uuid4()),
+    "username": "bench_user",
+    "message": "hello everyone, glad to be here " * 4,
+    "timestamp": "2024-01-01T00:00:00Z",
+    "seq": 1234,
+}
+
+signal_frame = {
+    "type": "webrtc_signal",
+    "from_user_id": str(uuid.uuid4()),
+    "signal_type": "offer",
+    "data": {"type": "offer", "sdp": "v=0\r\no=- 4611731400430051336 2 IN IP4 127.0.0.1\r\n" * 60},
+}
+
+now = datetime.utcnow()
+notifications = [
+    {"id": uuid.uuid4(), "title": None, "message": f"user_{i} is now following you!", "is_read": False, "created_at": now}
+    for i in range(50)
+]
+welcome_native = {"type": "unread_notifications", "data": {"notifications": notifications, "count": len(notifications)}}
+
+def stdlib_welcome() -> str:
+    # The stdlib path has to stringify UUIDs and datetimes before encoding
+    notifications_data = [dict(n, id=str(n["id"]), created_at=n["created_at"].isoformat()) for n in notifications]
+    return json.dumps({"type": "unread_notifications", "data": {"notifications": notifications_data, "count": len(notifications_data)}})
+
+def bench(label: str, baseline, candidate):
+    before = timeit.timeit(baseline, number=ITERATIONS) / ITERATIONS * 1e6
+    after = timeit.timeit(candidate, number=ITERATIONS) / ITERATIONS * 1e6
+    print(f"{label:<22} json.dumps {before:7.2f} µs   serializer {after:7.2f} µs   x{before / after:.1f}")
+
+if __name__ == "__main__":
+    backend = "orjson" if orjson is not None else "stdlib"
+    print(f"serializer backend: {backend} (JSON_SERIALIZER={JSON_SERIALIZER})")
+    bench("chat frame", lambda: json.dumps(chat_frame), lambda: dumps(chat_frame))
+    bench("webrtc offer frame", lambda: json.dumps(signal_frame), lambda: dumps(signal_frame))
+    bench("welcome (50 notifs)", stdlib_welcome, lambda: dumps(welcome_native))
@@ -0,0 +1,126 @@
+"""Requests per second on /healthz for the old single-process server and the server.py profile.
+
+Each profile runs the real main:app in its own process tree with the lifespan off, so no
+PostgreSQL or Redis is needed. Load comes from several client processes, each holding
+keep-alive connections and sending one request at a time per connection.
+
+Client and server share the machine, so give the server most of the cores: results are
+only meaningful relative to each other, and a 1-CPU box cannot show the worker gain
+(set WEB_CONCURRENCY to force a worker count).
+
+Run from the repository root (needs uvicorn[standard]):
+    python benchmarks/server_throughput_benchmark.py [--seconds 5] [--clients 2] [--connections 32]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+from server import WEB_CONCURRENCY
+
+HOST = "127.0.0.1"
+REQUEST = b"GET /healthz HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+# name -> build_config overrides, the first entry is the old `uvicorn main:app` command
+PROFILES = [
+    ("single process, asyncio/h11", dict(workers=1, loop="asyncio", http="h11")),
+    ("single process, uvloop/httptools", dict(workers=1)),
+]
+if WEB_CONCURRENCY > 1:
+    PROFILES.append((f"{WEB_CONCURRENCY} workers, uvloop/httptools", dict(workers=WEB_CONCURRENCY)))
+
+SERVER_SNIPPET = """
+import sys
+sys.path.insert(0, {app_dir!r})
+from server import build_config, serve
+serve(build_config(host={host!r}, port={port}, lifespan="off", log_level="warning", access_log=False, **{overrides!r}))
+"""
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"server on port {port} did not start")
+
+async def connection_loop(port: int, deadline: float) -> int:
+    reader, writer = await asyncio.open_connection(HOST, port)
+    completed = 0
+    try:
+        while time.monotonic() < deadline:
+            writer.write(REQUEST)
+            headers = await reader.readuntil(b"\r\n\r\n")
+            if not headers.startswith(b"HTTP/1.1 200"):
+                raise SystemExit(f"unexpected response: {headers[:64]!r}")
+            length = 0
+            for line in headers.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            completed += 1
+    finally:
+        writer.close()
+    return completed
+
+def client(port: int, connections: int, seconds: float, results):
+    async def run():
+        deadline = time.monotonic() + seconds
+        counts = await asyncio.gather(*(connection_loop(port, deadline) for _ in range(connections)))
+        return sum(counts)
+
+    results.put(asyncio.run(run()))
+
+def measure(overrides: dict, seconds: float, clients: int, connections: int) -> float:
+    port = free_port()
+    snippet = SERVER_SNIPPET.format(app_dir=APP_DIR, host=HOST, port=port, overrides=overrides)
+    server = subprocess.Popen([sys.executable, "-c", snippet], cwd=APP_DIR, stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        # Let every worker finish importing the app before timing
+        time.sleep(2)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=client, args=(port, connections, seconds, results))
+            for _ in range(clients)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        total = sum(results.get() for _ in processes)
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+        return total / elapsed
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--connections", type=int, default=32, help="keep-alive connections per client process")
+    args = parser.parse_args()
+
+    print(f"{len(os.sched_getaffinity(0))} CPU(s) available, {args.clients} client process(es) x {args.connections} connections")
+    for name, overrides in PROFILES:
+        rps = measure(overrides, args.seconds, args.clients, args.connections)
+        print(f"{name:>34}: {rps:,.0f} req/s")
+
+if __name__ == "__main__":
+    main()
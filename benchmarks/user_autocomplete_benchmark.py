@@ -0,0 +1,54 @@
+"""Load time and lookup latency of the in-process autocomplete index at 100k users.
+
+Run from the repository root:
+    python benchmarks/user_autocomplete_benchmark.py
+"""
+import os
+import random
+import string
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from utils.prefix_index import PrefixIndex
+
+USERS = 100_000
+LOOKUPS = 100_000
+LIMIT = 10
+
+def random_word(length: int) -> str:
+    return "".join(random.choices(string.ascii_lowercase, k=length))
+
+def main():
+    random.seed(42)
+    rows = [
+        (str(uuid.uuid4()), random_word(random.randint(5, 12)),
+         f"{random_word(random.randint(3, 8)).title()} {random_word(random.randint(4, 10)).title()}")
+        for _ in range(USERS)
+    ]
+
+    index = PrefixIndex()
+    start = time.perf_counter()
+    index.load(rows)
+    print(f"load: {USERS:,} users in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    for i in range(1_000):
+        index.add(str(uuid.uuid4()), random_word(8), "New User")
+    print(f"add: {(time.perf_counter() - start) / 1_000 * 1e6:.1f} us per registration")
+
+    prefixes = [random_word(random.randint(1, 4)) for _ in range(LOOKUPS)]
+    timings = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.search(prefix, LIMIT)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"search: p50 {p50:.1f} us, p99 {p99:.1f} us, max {timings[-1] * 1e6:.1f} us")
+
+if __name__ == "__main__":
+    main()